@@ -51,6 +51,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Prvi, da meri celotno zahtevo skupaj s poizvedbami sej in prijave
+    'checklist.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -84,10 +86,26 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite z WAL in čakanjem na zaklep (backend/sqlite/base.py); povezave se
+# ponovno uporabijo CONN_MAX_AGE sekund (0 = nova povezava za vsako zahtevo)
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'backend.sqlite',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': int(os.environ.get('CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'transaction_mode': os.environ.get('SQLITE_TRANSACTION_MODE', 'IMMEDIATE'),
+            'pragme': {
+                'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+                'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000')),
+                'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+                'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))),
+                # Negativna vrednost je velikost v KiB
+                'cache_size': -int(os.environ.get('SQLITE_CACHE_SIZE_KB', '65536')),
+                'temp_store': 'MEMORY',
+            },
+        },
     }
 }
 
@@ -133,6 +151,51 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Izvozi v ozadju (PDF/XLSX/arhiv). 'nit' izvaja posle v bazenu niti spletnega procesa
+# (začasna rešitev za en proces - ob ponovnem zagonu se posel v teku izgubi),
+# 'delavec' pusti posle v bazi za ločen proces `manage.py run_export_worker`.
+EXPORT_IZVAJALNIK = os.environ.get('EXPORT_IZVAJALNIK', 'nit')
+# Število hkratnih izvozov na proces
+EXPORT_WORKERS = int(os.environ.get('EXPORT_WORKERS', '2'))
+# Posel brez znaka življenja toliko sekund velja za osirotelega (proces je umrl)
+EXPORT_ZASTARELO_S = int(os.environ.get('EXPORT_ZASTARELO_S', '600'))
+
+# Vzporedni izris PDF - število procesov in serijskih številk na del (1 = en proces,
+# privzeto; več procesov pospeši velike izvoze, npr. PDF_WORKERS=4)
+PDF_WORKERS = int(os.environ.get('PDF_WORKERS', '1'))
+PDF_SERIJSKE_NA_DEL = int(os.environ.get('PDF_SERIJSKE_NA_DEL', '20'))
+# Izris tabel v PDF: 'natancno' (Paragraph v vsaki celici, dosedanja postavitev) ali
+# 'hitro' (navadni nizi z ročnim prelomom, vsi segmenti serijske v eni tabeli -
+# postavitev poročila se spremeni, zato ga je treba vklopiti izrecno)
+PDF_NACIN = os.environ.get('PDF_NACIN', 'natancno')
+
+# Predpomnilnik izvozov nespremenjenih projektov (najdlje neuporabljeni se brišejo prvi)
+EXPORT_CACHE_DIR = os.environ.get('EXPORT_CACHE_DIR', os.path.join(MEDIA_ROOT, 'export_cache'))
+EXPORT_CACHE_MAX_BYTES = int(os.environ.get('EXPORT_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+
+# Predpomnilnik predlog (Tip -> Segment -> Vprasanje). Ključi vsebujejo verzijo iz
+# baze, zato je lokalni pomnilnik vsakega procesa po spremembi takoj neveljaven;
+# TEMPLATE_CACHE_BACKEND=file deli naložena drevesa med procesi.
+TEMPLATE_CACHE_ALIAS = 'predloge'
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    TEMPLATE_CACHE_ALIAS: {
+        'BACKEND': {
+            'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+            'file': 'django.core.cache.backends.filebased.FileBasedCache',
+        }[os.environ.get('TEMPLATE_CACHE_BACKEND', 'locmem')],
+        'LOCATION': os.environ.get('TEMPLATE_CACHE_LOCATION', os.path.join(MEDIA_ROOT, 'template_cache')),
+        'TIMEOUT': int(os.environ.get('TEMPLATE_CACHE_TIMEOUT', '600')),
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
+}
+
+# Meritve zahtev (Server-Timing, dnevnik, /api/metrics/) in število hranjenih meritev na pot
+METRIKE_ZAHTEV = os.environ.get('METRIKE_ZAHTEV', 'true').lower() in ('1', 'true', 'yes')
+METRIKE_VELIKOST_VZORCA = int(os.environ.get('METRIKE_VELIKOST_VZORCA', '500'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -147,6 +210,9 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # Kazalčna paginacija na zahtevo (?page_size= ali ?cursor=); brez njiju seznami niso paginirani
+    'DEFAULT_PAGINATION_CLASS': 'checklist.pagination.KeysetPagination',
+    'PAGE_SIZE': int(os.environ.get('API_PAGE_SIZE', '100')),
 }
 
 # CORS settings
@@ -246,5 +312,12 @@ LOGGING = {
             'level': 'DEBUG',
             'propagate': True,
         },
+        # Meritve posameznih zahtev (DEBUG) le v checklist.log in le na zahtevo:
+        # METRIKE_DNEVNIK_RAVEN=DEBUG
+        'checklist.middleware': {
+            'handlers': ['checklist_file'],
+            'level': os.environ.get('METRIKE_DNEVNIK_RAVEN', 'INFO'),
+            'propagate': False,
+        },
     },
 }
@@ -0,0 +1,46 @@
+"""SQLite zaledje z nastavitvami za hkratno delo več kontrolorjev.
+
+Vsaki novi povezavi nastavi PRAGMA iz OPTIONS['pragme'] (WAL, busy_timeout,
+synchronous, mmap_size, cache_size ...). Transakcije začne z BEGIN IMMEDIATE,
+da pisalec zaklene bazo že ob začetku transakcije in ob zasedenosti počaka
+busy_timeout, namesto da bi ob nadgradnji bralnega zaklepa takoj dobil
+"database is locked".
+"""
+import sqlite3
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base, features
+from django.utils.functional import cached_property
+
+NACINI_TRANSAKCIJ = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseFeatures(features.DatabaseFeatures):
+    @cached_property
+    def max_query_params(self):
+        # Django privzeto predpostavlja 999, novejši SQLite jih dovoli 32766
+        self.connection.ensure_connection()
+        return self.connection.connection.getlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    features_class = DatabaseFeatures
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragme = params.pop('pragme', {})
+        self.nacin_transakcij = params.pop('transaction_mode', 'DEFERRED').upper()
+        if self.nacin_transakcij not in NACINI_TRANSAKCIJ:
+            raise ImproperlyConfigured(
+                f"transaction_mode mora biti eden od {', '.join(NACINI_TRANSAKCIJ)}"
+            )
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for ime, vrednost in self.pragme.items():
+            conn.execute(f'PRAGMA {ime} = {vrednost}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {self.nacin_transakcij}')
@@ -0,0 +1,115 @@
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .export_cache import invalidate_project
+from .models import Odgovor, Vprasanje, SerijskaStevilka
+from .progress import apply_answer_changes
+
+VELIKOST_KOSA = 400
+
+
+def _v_kosih(seznam, velikost=VELIKOST_KOSA):
+    for i in range(0, len(seznam), velikost):
+        yield seznam[i:i + velikost]
+
+
+def _obstojeci_ids(model, ids):
+    najdeni = set()
+    for kos in _v_kosih(ids):
+        najdeni.update(model.objects.filter(id__in=kos).values_list('id', flat=True))
+    return najdeni
+
+
+def validate_answers(podatki):
+    """Preveri paket odgovorov naenkrat in vrni slovar (vprasanje_id, serijska_id) -> odgovor.
+
+    Obstoj vprašanj in serijskih številk se preveri z eno poizvedbo na kos id-jev,
+    ne z eno na odgovor. Pri podvojenih parih v paketu velja zadnji.
+    """
+    if not isinstance(podatki, list):
+        raise ValidationError({'error': 'Pričakovan je seznam odgovorov'})
+
+    napake = {}
+    odgovori = {}
+    for i, element in enumerate(podatki):
+        if not isinstance(element, dict):
+            napake[i] = 'Odgovor mora biti objekt'
+            continue
+        try:
+            kljuc = (int(element['vprasanje']), int(element['serijska_stevilka']))
+        except (KeyError, TypeError, ValueError):
+            napake[i] = 'Polji vprasanje in serijska_stevilka sta obvezni in morata biti celi števili'
+            continue
+        if not isinstance(element.get('odgovor'), str):
+            napake[i] = 'Polje odgovor je obvezno in mora biti besedilo'
+            continue
+        odgovori[kljuc] = (i, element['odgovor'])
+
+    vprasanja = _obstojeci_ids(Vprasanje, sorted({v for v, _ in odgovori}))
+    serijske = _obstojeci_ids(SerijskaStevilka, sorted({s for _, s in odgovori}))
+    for (vprasanje_id, serijska_id), (i, _) in odgovori.items():
+        if vprasanje_id not in vprasanja:
+            napake[i] = f'Vprašanje {vprasanje_id} ne obstaja'
+        elif serijska_id not in serijske:
+            napake[i] = f'Serijska številka {serijska_id} ne obstaja'
+
+    if napake:
+        raise ValidationError({'error': 'Neveljavni odgovori', 'napake': napake})
+
+    return {kljuc: besedilo for kljuc, (_, besedilo) in odgovori.items()}
+
+
+def upsert_answers(odgovori):
+    """Vstavi nove in posodobi spremenjene odgovore s paketnimi poizvedbami.
+
+    ``odgovori`` je slovar (vprasanje_id, serijska_id) -> besedilo. Vrne število
+    vstavljenih, posodobljenih in nespremenjenih odgovorov.
+    """
+    zdaj = timezone.now()
+    vprasanja = sorted({v for v, _ in odgovori})
+    serijske = sorted({s for _, s in odgovori})
+
+    with transaction.atomic():
+        obstojeci = {}
+        for kos_serijskih in _v_kosih(serijske):
+            for kos_vprasanj in _v_kosih(vprasanja):
+                for odgovor in Odgovor.objects.filter(
+                    serijska_stevilka_id__in=kos_serijskih,
+                    vprasanje_id__in=kos_vprasanj
+                ).only('id', 'vprasanje_id', 'serijska_stevilka_id', 'odgovor'):
+                    obstojeci[odgovor.vprasanje_id, odgovor.serijska_stevilka_id] = odgovor
+
+        novi = []
+        spremenjeni = []
+        spremembe = []
+        for (vprasanje_id, serijska_id), besedilo in odgovori.items():
+            odgovor = obstojeci.get((vprasanje_id, serijska_id))
+            if odgovor is None:
+                novi.append(Odgovor(vprasanje_id=vprasanje_id, serijska_stevilka_id=serijska_id, odgovor=besedilo))
+                spremembe.append((vprasanje_id, serijska_id, None, besedilo))
+            elif odgovor.odgovor != besedilo:
+                spremembe.append((vprasanje_id, serijska_id, odgovor.odgovor, besedilo))
+                odgovor.odgovor = besedilo
+                odgovor.updated_at = zdaj
+                spremenjeni.append(odgovor)
+
+        # Vzporedno ustvarjen odgovor za isti par se posodobi namesto podvoji
+        Odgovor.objects.bulk_create(
+            novi,
+            update_conflicts=True,
+            unique_fields=['vprasanje', 'serijska_stevilka'],
+            update_fields=['odgovor', 'updated_at'],
+        )
+        Odgovor.objects.bulk_update(spremenjeni, ['odgovor', 'updated_at'])
+
+        # Paketni zapisi ne sprožijo signalov, zato števce napredka popravimo in izvoze zavržemo tu
+        if spremembe:
+            for projekt_id in apply_answer_changes(spremembe):
+                transaction.on_commit(lambda projekt_id=projekt_id: invalidate_project(projekt_id))
+
+    return {
+        'vstavljeni': len(novi),
+        'posodobljeni': len(spremenjeni),
+        'nespremenjeni': len(odgovori) - len(novi) - len(spremenjeni),
+    }
@@ -0,0 +1,401 @@
+import gzip
+import io
+import itertools
+import json
+import logging
+import textwrap
+import zipfile
+import zlib
+
+from django.utils import timezone
+
+from .models import Projekt, ProjektTip, SerijskaStevilka, Odgovor, LogSprememb
+from .template_cache import get_templates
+
+logger = logging.getLogger(__name__)
+
+
+class ArchiveError(Exception):
+    """Datoteke ni mogoče prebrati kot arhiv projekta."""
+
+ARHIV_VERZIJA = '1.0.0'
+# v2: gzip stisnjen NDJSON, en zapis na vrstico, prva vrstica je manifest
+ARHIV_VERZIJA_2 = '2.0.0'
+GZIP_GLAVA = b'\x1f\x8b'
+VELIKOST_KOSA = 500
+VELIKOST_BLOKA = 64 * 1024
+
+
+def _json(vrednost, zamik):
+    """Zapiši vrednost kot ``json.dumps(indent=2)``, zamaknjeno za ``zamik`` presledkov."""
+    besedilo = json.dumps(vrednost, indent=2, ensure_ascii=False)
+    return textwrap.indent(besedilo, ' ' * zamik).lstrip(' ')
+
+
+def _seznam(ime, elementi):
+    """Zapiši ključ s seznamom elementov, enega po enega."""
+    yield f'  "{ime}": ['
+    prazen = True
+    for element in elementi:
+        yield ('\n    ' if prazen else ',\n    ') + _json(element, 4)
+        prazen = False
+    yield ']' if prazen else '\n  ]'
+
+
+def _v_bloke(deli):
+    """Združi majhne dele izhoda v bloke velikosti ~VELIKOST_BLOKA."""
+    blok = []
+    velikost = 0
+    for del_ in deli:
+        blok.append(del_)
+        velikost += len(del_)
+        if velikost >= VELIKOST_BLOKA:
+            yield ''.join(blok)
+            blok = []
+            velikost = 0
+    if blok:
+        yield ''.join(blok)
+
+
+def _tipi(projekt_tipi):
+    for projekt_tip in projekt_tipi:
+        yield {
+            "id": projekt_tip.tip.id,
+            "naziv": projekt_tip.tip.naziv,
+            "stevilo_ponovitev": projekt_tip.stevilo_ponovitev,
+            "created_at": projekt_tip.created_at.isoformat(),
+        }
+
+
+def _segmenti(projekt_tipi):
+    # Segmente in vprašanja vseh tipov beremo iz predpomnilnika predlog
+    predloge = get_templates(projekt_tip.tip_id for projekt_tip in projekt_tipi)
+    for projekt_tip in projekt_tipi:
+        predloga = predloge[projekt_tip.tip_id]
+        for segment in predloga.segmenti:
+            yield {
+                "id": segment.id,
+                "naziv": segment.naziv,
+                "tip_id": segment.tip_id,
+                "vprasanja": [
+                    {
+                        "id": v.id,
+                        "vprasanje": v.vprasanje,
+                        "tip": v.tip,
+                        "obvezno": v.obvezno,
+                        "opis": v.opis,
+                        "moznosti": v.moznosti,
+                        "repeatability": v.repeatability,
+                    } for v in predloga.vprasanja_po_segmentu[segment.id]
+                ],
+            }
+
+
+def _serijske_stevilke(projekt):
+    for st in SerijskaStevilka.objects.filter(projekt=projekt).order_by('id').values(
+        'id', 'stevilka', 'projekt_tip__tip_id', 'created_at'
+    ).iterator(chunk_size=VELIKOST_KOSA):
+        yield {
+            "id": st['id'],
+            "stevilka": st['stevilka'],
+            "tip_id": st['projekt_tip__tip_id'],
+            "created_at": st['created_at'].isoformat(),
+        }
+
+
+def _zadnji_uporabniki(odgovor_ids):
+    """Vrni slovar id odgovora -> uporabnik zadnjega zapisa v LogSprememb za ta odgovor."""
+    uporabniki = {}
+    for log in LogSprememb.objects.filter(
+        entity_type='odgovor',
+        entity_id__in=[str(odgovor_id) for odgovor_id in odgovor_ids],
+    ).select_related('uporabnik').order_by('entity_id', '-cas'):
+        uporabniki.setdefault(int(log.entity_id), log.uporabnik)
+    return uporabniki
+
+
+def _odgovori(projekt):
+    odgovori = Odgovor.objects.filter(serijska_stevilka__projekt=projekt).order_by(
+        'serijska_stevilka_id', 'id'
+    ).values(
+        'id', 'vprasanje_id', 'serijska_stevilka_id', 'odgovor', 'created_at', 'updated_at'
+    ).iterator(chunk_size=VELIKOST_KOSA)
+
+    while True:
+        kos = list(itertools.islice(odgovori, VELIKOST_KOSA))
+        if not kos:
+            break
+        uporabniki = _zadnji_uporabniki([odgovor['id'] for odgovor in kos])
+        for odgovor in kos:
+            odgovor_data = {
+                "id": odgovor['id'],
+                "vprasanje_id": odgovor['vprasanje_id'],
+                "serijska_stevilka_id": odgovor['serijska_stevilka_id'],
+                "odgovor": odgovor['odgovor'],
+                "created_at": odgovor['created_at'].isoformat(),
+                "updated_at": odgovor['updated_at'].isoformat(),
+            }
+            uporabnik = uporabniki.get(odgovor['id'])
+            if uporabnik:
+                odgovor_data["uporabnik"] = {
+                    "osebna_stevilka": uporabnik.username,
+                    "ime": uporabnik.first_name,
+                    "priimek": uporabnik.last_name,
+                }
+            yield odgovor_data
+
+
+def _spremembe(projekt):
+    for log in LogSprememb.objects.filter(
+        projekt=projekt,
+        entity_type__in=['projekt', 'serijska_stevilka'],
+    ).select_related('uporabnik').order_by('id').iterator(chunk_size=VELIKOST_KOSA):
+        yield {
+            "id": log.id,
+            "cas": log.cas.isoformat(),
+            "sprememba": log.sprememba,
+            "stara_vrednost": log.stara_vrednost,
+            "nova_vrednost": log.nova_vrednost,
+            "uporabnik": log.uporabnik.username,
+        }
+
+
+def _deli_arhiva(projekt):
+    meta = {
+        "version": ARHIV_VERZIJA,
+        "export_date": timezone.now().isoformat(),
+        "application": "Kontrolni Seznam",
+    }
+    projekt_data = {
+        "id": projekt.id,
+        "osebna_stevilka": projekt.osebna_stevilka,
+        "datum": projekt.datum.isoformat(),
+        "created_at": projekt.created_at.isoformat(),
+        "updated_at": projekt.updated_at.isoformat(),
+    }
+    projekt_tipi = list(ProjektTip.objects.filter(projekt=projekt).select_related('tip').order_by('id'))
+
+    yield '{\n'
+    yield '  "meta": ' + _json(meta, 2) + ',\n'
+    yield '  "projekt": ' + _json(projekt_data, 2) + ',\n'
+    yield from _seznam('tipi', _tipi(projekt_tipi))
+    yield ',\n'
+    yield from _seznam('segmenti', _segmenti(projekt_tipi))
+    yield ',\n'
+    yield from _seznam('serijske_stevilke', _serijske_stevilke(projekt))
+    yield ',\n'
+    yield from _seznam('odgovori', _odgovori(projekt))
+    yield ',\n'
+    yield from _seznam('spremembe', _spremembe(projekt))
+    yield '\n}'
+
+
+def iter_archive_json(projekt):
+    """Sproti generiraj arhiv projekta v JSON formatu v1.0.0.
+
+    Izhod je enak ``json.dumps(arhiv, indent=2, ensure_ascii=False)``, le da se
+    podatki berejo po kosih in se nikoli ne zberejo v pomnilniku v celoti.
+    """
+    try:
+        yield from _v_bloke(_deli_arhiva(projekt))
+    except Exception:
+        logger.exception("Napaka pri pretočnem izvozu projekta %s", projekt.id)
+        raise
+
+
+def _zapisi_arhiva(projekt):
+    """Generiraj zapise arhiva v2 kot slovarje s ključem ``zapis``."""
+    projekt_tipi = list(ProjektTip.objects.filter(projekt=projekt).select_related('tip').order_by('id'))
+    yield {
+        "zapis": "manifest",
+        "version": ARHIV_VERZIJA_2,
+        "export_date": timezone.now().isoformat(),
+        "application": "Kontrolni Seznam",
+        "projekt_id": projekt.id,
+        "stevilo_serijskih": SerijskaStevilka.objects.filter(projekt=projekt).count(),
+        "stevilo_odgovorov": Odgovor.objects.filter(serijska_stevilka__projekt=projekt).count(),
+    }
+    yield {
+        "zapis": "projekt",
+        "id": projekt.id,
+        "osebna_stevilka": projekt.osebna_stevilka,
+        "datum": projekt.datum.isoformat(),
+        "created_at": projekt.created_at.isoformat(),
+        "updated_at": projekt.updated_at.isoformat(),
+    }
+    for vrsta, zapisi in (
+        ('tip', _tipi(projekt_tipi)),
+        ('segment', _segmenti(projekt_tipi)),
+        ('serijska_stevilka', _serijske_stevilke(projekt)),
+        ('odgovor', _odgovori(projekt)),
+        ('sprememba', _spremembe(projekt)),
+    ):
+        for zapis in zapisi:
+            yield {"zapis": vrsta, **zapis}
+
+
+def _brez_napredka(delez):
+    pass
+
+
+def iter_archive_ndjson_gz(projekt, progress=_brez_napredka):
+    """Sproti generiraj arhiv projekta v formatu v2 (gzip stisnjen NDJSON) v bajtih.
+
+    ``progress`` ob vsakem bloku dobi delež zapisanih serijskih številk in
+    odgovorov, ki ju našteje manifest.
+    """
+    kompresor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    stevec = {'zapisani': 0, 'vseh': 1}
+
+    def vrstice():
+        for zapis in _zapisi_arhiva(projekt):
+            if zapis['zapis'] == 'manifest':
+                stevec['vseh'] = 2 + zapis['stevilo_serijskih'] + zapis['stevilo_odgovorov']
+            stevec['zapisani'] += 1
+            yield json.dumps(zapis, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+    try:
+        progress(0.0)
+        for blok in _v_bloke(vrstice()):
+            stisnjeno = kompresor.compress(blok.encode('utf-8'))
+            if stisnjeno:
+                yield stisnjeno
+            # Tipi, segmenti in spremembe niso šteti, zato 100 % javimo šele na koncu
+            progress(min(stevec['zapisani'] / stevec['vseh'], 0.99))
+        yield kompresor.flush()
+        progress(1.0)
+    except Exception:
+        logger.exception("Napaka pri pretočnem izvozu projekta %s", projekt.id)
+        raise
+
+
+def write_archive(projekt, out, progress=_brez_napredka):
+    """Zapiši arhiv projekta v2 v datoteki podoben objekt ``out`` (v bajtih)."""
+    for blok in iter_archive_ndjson_gz(projekt, progress):
+        out.write(blok)
+
+
+class _PretocniIzhod:
+    """Izhod brez ``seek`` za ``zipfile``: zbira zapisane bajte, da jih sproti pošljemo."""
+
+    def __init__(self):
+        self._deli = []
+        self._pozicija = 0
+
+    def write(self, podatki):
+        self._deli.append(bytes(podatki))
+        self._pozicija += len(podatki)
+        return len(podatki)
+
+    def tell(self):
+        return self._pozicija
+
+    def flush(self):
+        pass
+
+    def izprazni(self):
+        podatki = b''.join(self._deli)
+        self._deli.clear()
+        return podatki
+
+
+def _unikatno_ime(ime, uporabljena):
+    """Vrni ``ime`` ali, če je že uporabljeno, ime s števcem pred končnico.
+
+    Različni id-ji projektov se lahko po čiščenju znakov v imenu ujemajo.
+    """
+    osnova, _, koncnica = ime.partition('.')
+    kandidat = ime
+    stevec = 1
+    while kandidat in uporabljena:
+        stevec += 1
+        kandidat = f'{osnova}_{stevec}.{koncnica}'
+    uporabljena.add(kandidat)
+    return kandidat
+
+
+def iter_archives_zip(projekt_ids):
+    """Sproti generiraj zip z arhivom v2 za vsak projekt iz ``projekt_ids``.
+
+    Projekti se nalagajo in izvažajo eden za drugim, zato poraba pomnilnika ni
+    odvisna od njihovega števila. Arhivi so že stisnjeni, zato se v zip shranijo
+    brez ponovnega stiskanja. Na koncu zip vsebuje še ``manifest.json``.
+    """
+    izhod = _PretocniIzhod()
+    vsebina = []
+    uporabljena = set()
+    with zipfile.ZipFile(izhod, 'w', compression=zipfile.ZIP_STORED) as zip_datoteka:
+        for projekt_id in projekt_ids:
+            projekt = Projekt.objects.filter(id=projekt_id).first()
+            if projekt is None:
+                continue
+            ime = _unikatno_ime(archive_filename(projekt), uporabljena)
+            with zip_datoteka.open(ime, 'w', force_zip64=True) as vnos:
+                for blok in iter_archive_ndjson_gz(projekt):
+                    vnos.write(blok)
+                    yield izhod.izprazni()
+            vsebina.append({"projekt_id": projekt.id, "datoteka": ime})
+            yield izhod.izprazni()
+
+        zip_datoteka.writestr('manifest.json', json.dumps({
+            "version": ARHIV_VERZIJA_2,
+            "export_date": timezone.now().isoformat(),
+            "application": "Kontrolni Seznam",
+            "projekti": vsebina,
+        }, indent=2, ensure_ascii=False))
+    yield izhod.izprazni()
+
+
+def _zapisi_v1(arhiv):
+    """Pretvori naložen arhiv v1 v zaporedje zapisov, kot jih ima v2."""
+    yield {"zapis": "manifest", **arhiv.get('meta', {})}
+    yield {"zapis": "projekt", **arhiv['projekt']}
+    for kljuc, vrsta in (
+        ('tipi', 'tip'),
+        ('segmenti', 'segment'),
+        ('serijske_stevilke', 'serijska_stevilka'),
+        ('odgovori', 'odgovor'),
+        ('spremembe', 'sprememba'),
+    ):
+        for zapis in arhiv.get(kljuc, []):
+            yield {"zapis": vrsta, **zapis}
+
+
+def read_archive(datoteka):
+    """Beri zapise arhiva iz binarne datoteke; prepozna v2 (gzip NDJSON) in v1 (JSON).
+
+    Arhiv v2 se bere vrstico za vrstico, zato poraba pomnilnika ni odvisna od
+    velikosti arhiva. Arhiv v1 je en JSON dokument in se naloži v celoti.
+    """
+    if datoteka.read(2) == GZIP_GLAVA:
+        datoteka.seek(0)
+        datoteka = gzip.GzipFile(fileobj=datoteka, mode='rb')
+    else:
+        datoteka.seek(0)
+    besedilo = io.TextIOWrapper(datoteka, encoding='utf-8')
+
+    prva = besedilo.readline()
+    try:
+        manifest = json.loads(prva)
+    except json.JSONDecodeError:
+        manifest = None
+
+    if isinstance(manifest, dict) and manifest.get('zapis') == 'manifest':
+        if manifest.get('version', '').split('.')[0] != ARHIV_VERZIJA_2.split('.')[0]:
+            raise ArchiveError(f"Nepodprta verzija arhiva: {manifest.get('version')}")
+        yield manifest
+        for vrstica in besedilo:
+            if vrstica.strip():
+                yield json.loads(vrstica)
+        return
+
+    arhiv = json.loads(prva + besedilo.read())
+    if 'projekt' not in arhiv:
+        raise ArchiveError('Datoteka ni arhiv projekta')
+    yield from _zapisi_v1(arhiv)
+
+
+def archive_filename(projekt, koncnica='ndjson.gz'):
+    """Vrni varno ime datoteke arhiva projekta."""
+    filename = f"Projekt_{projekt.id}_arhiv_{timezone.now().strftime('%Y%m%d_%H%M%S')}.{koncnica}"
+    return "".join(c for c in filename if c.isalnum() or c in (' ', '-', '_', '.'))
@@ -0,0 +1,148 @@
+import hashlib
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from .models import ProjektTip, Tip, Segment, Vprasanje, SerijskaStevilka, Odgovor
+
+logger = logging.getLogger(__name__)
+
+# Povečaj ob spremembi oblike izvozov, da se stari zapisi ne uporabijo več
+VERZIJA_IZVOZOV = '1'
+
+KONCNICE = {
+    'xlsx': 'xlsx',
+    'pdf': 'pdf',
+}
+
+
+def project_fingerprint(projekt):
+    """Vrni prstni odtis vsebine projekta za izvoze.
+
+    Sestavljen je iz zadnjega ``updated_at`` in števila vrstic odgovorov,
+    serijskih številk, tipov projekta ter predloge (tip, segmenti, vprašanja),
+    zato ga spremeni vsak vnos, sprememba ali izbris.
+    """
+    tipi = ProjektTip.objects.filter(projekt=projekt)
+    deli = [
+        VERZIJA_IZVOZOV,
+        projekt.updated_at.isoformat(),
+        tipi.aggregate(m=Max('updated_at'), n=Count('id')),
+        SerijskaStevilka.objects.filter(projekt=projekt).aggregate(m=Max('updated_at'), n=Count('id')),
+        Odgovor.objects.filter(serijska_stevilka__projekt=projekt).aggregate(m=Max('updated_at'), n=Count('id')),
+        Tip.objects.filter(projekttip__projekt=projekt).aggregate(m=Max('updated_at'), n=Count('id')),
+        Segment.objects.filter(tip__projekttip__projekt=projekt).aggregate(m=Max('updated_at'), n=Count('id')),
+        Vprasanje.objects.filter(segment__tip__projekttip__projekt=projekt).aggregate(
+            m=Max('updated_at'), n=Count('id')
+        ),
+    ]
+    return hashlib.sha256(repr(deli).encode('utf-8')).hexdigest()
+
+
+def _predpona_projekta(projekt_id):
+    varen_id = "".join(c for c in str(projekt_id) if c.isalnum() or c in ('-', '_'))
+    return f"{varen_id}-{hashlib.sha1(str(projekt_id).encode('utf-8')).hexdigest()[:8]}-"
+
+
+def _pot(format, projekt, fingerprint, varianta=''):
+    oznaka = f"{format}-{varianta}" if varianta else format
+    ime = f"{_predpona_projekta(projekt.id)}{oznaka}-{fingerprint}.{KONCNICE[format]}"
+    return os.path.join(settings.EXPORT_CACHE_DIR, ime)
+
+
+def _odpri_shranjeno(format, projekt, fingerprint, varianta):
+    """Odpri shranjen izvoz ali vrni None. Zadetek osveži čas zadnje uporabe."""
+    pot = _pot(format, projekt, fingerprint, varianta)
+    try:
+        datoteka = open(pot, 'rb')
+    except FileNotFoundError:
+        return None
+    try:
+        os.utime(pot)
+    except FileNotFoundError:
+        pass
+    return datoteka
+
+
+def _shrani(format, projekt, fingerprint, varianta, zapisi):
+    pot = _pot(format, projekt, fingerprint, varianta)
+    os.makedirs(settings.EXPORT_CACHE_DIR, exist_ok=True)
+    zacasna = f"{pot}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        zapisi(zacasna)
+        os.replace(zacasna, pot)
+    except BaseException:
+        if os.path.exists(zacasna):
+            os.remove(zacasna)
+        raise
+    # Datoteko odpremo pred čiščenjem, da je izrinjenje ne more odstraniti izpod nas
+    datoteka = open(pot, 'rb')
+    _evict()
+    return datoteka
+
+
+def open_export(format, projekt, render, progress=None, varianta=''):
+    """Vrni odprto datoteko izvoza projekta iz predpomnilnika.
+
+    Ob zgrešitvi izvoz ustvari ``render(projekt, out, progress)`` in ga shrani.
+    ``varianta`` loči različne izrise istega formata (npr. način izrisa PDF).
+    Vrnjena datoteka je odprta, zato ostane berljiva, tudi če jo medtem izbriše
+    čiščenje predpomnilnika.
+    """
+    fingerprint = project_fingerprint(projekt)
+    datoteka = _odpri_shranjeno(format, projekt, fingerprint, varianta)
+    if datoteka is None:
+        logger.info("Izvoz %s projekta %s ni v predpomnilniku", format, projekt.id)
+
+        def zapisi(zacasna):
+            with open(zacasna, 'wb') as out:
+                if progress is None:
+                    render(projekt, out)
+                else:
+                    render(projekt, out, progress)
+        return _shrani(format, projekt, fingerprint, varianta, zapisi)
+    if progress is not None:
+        progress(1.0)
+    return datoteka
+
+
+def _evict():
+    """Briši najdlje neuporabljene zapise, dokler velikost ne pade pod EXPORT_CACHE_MAX_BYTES."""
+    zapisi = []
+    with os.scandir(settings.EXPORT_CACHE_DIR) as vnosi:
+        for vnos in vnosi:
+            if vnos.is_file() and not vnos.name.endswith('.tmp'):
+                stat = vnos.stat()
+                zapisi.append((stat.st_mtime, stat.st_size, vnos.path))
+
+    skupaj = sum(velikost for _, velikost, _ in zapisi)
+    for _, velikost, pot in sorted(zapisi):
+        if skupaj <= settings.EXPORT_CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(pot)
+        except FileNotFoundError:
+            pass
+        skupaj -= velikost
+
+
+def invalidate_project(projekt_id):
+    """Odstrani vse shranjene izvoze projekta.
+
+    Prstni odtis že sam prepreči vračanje zastarelih izvozov; brisanje le
+    takoj sprosti prostor, ki bi ga sicer zasedali do izrinjenja.
+    """
+    predpona = _predpona_projekta(projekt_id)
+    try:
+        vnosi = list(os.scandir(settings.EXPORT_CACHE_DIR))
+    except FileNotFoundError:
+        return
+    for vnos in vnosi:
+        if vnos.name.startswith(predpona):
+            try:
+                os.remove(vnos.path)
+            except FileNotFoundError:
+                pass
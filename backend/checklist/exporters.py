@@ -0,0 +1,223 @@
+import io
+
+import openpyxl.styles
+import pandas as pd
+from django.conf import settings
+
+from .matrix import load_answer_matrix
+from .pdf_render import render_report
+from .registry import ExportError
+
+
+def _brez_napredka(delez):
+    pass
+
+
+def _nalozi_projekt(projekt):
+    """Vrni (projekt_tip, matrika) za prvi tip projekta ali sproži ExportError."""
+    projekt_tip = projekt.projekt_tipi.select_related('tip').order_by('id').first()
+    if not projekt_tip:
+        raise ExportError('Projekt nima določenega tipa')
+
+    matrika = load_answer_matrix(projekt, tip_ids=[projekt_tip.tip_id])
+    if not matrika.serijske_stevilke:
+        raise ExportError('Projekt nima serijskih številk')
+    if not matrika.segmenti:
+        raise ExportError('Ni najdenih segmentov za ta tip projekta')
+    return projekt_tip, matrika
+
+
+def write_template_xlsx(out):
+    """Zapiši vzorčno XLSX predlogo za uvoz vprašanj v ``out``."""
+    # Ustvarimo vzorčne podatke
+    data = {
+        'segment': ['Pokrov igralnega mesta', 'Pokrov igralnega mesta', 'Maska sistema', 'Maska sistema'],
+        'question': [
+            'Ali je monitor brez poškodb?', 
+            'Pravilno zapiranje nastavljen zaklep', 
+            'BA ustnik pritjen',
+            'Serijska številka (PT projekta)'
+        ],
+        'type': ['boolean', 'boolean', 'boolean', 'text'],
+        'required': ['true', 'true', 'true', 'true'],
+        'description': [
+            'Preveri stanje monitorja', 
+            'Preveri delovanje zaklepa', 
+            'Preveri pritrditev ustnika',
+            'Vnesi serijsko številko PT projekta'
+        ],
+        'options': ['', '', '', ''],
+        'repeatable': ['true', 'true', 'false', 'false']  # Dodano polje za ponovljivost
+    }
+
+    # Ustvarimo DataFrame
+    df = pd.DataFrame(data)
+
+
+    # Dodamo list z navodili
+    with pd.ExcelWriter(out, engine='openpyxl') as writer:
+        df.to_excel(writer, index=False, sheet_name='Vzorec')
+
+        # Dodamo list z navodili
+        navodila = pd.DataFrame({
+            'Polje': ['segment', 'question', 'type', 'required', 'description', 'options', 'repeatable'],
+            'Opis': [
+                'Ime segmenta vprašanj',
+                'Besedilo vprašanja',
+                'Tip vprašanja (boolean, text, number, multiple_choice)',
+                'Ali je odgovor obvezen (true/false)',
+                'Dodatni opis vprašanja',
+                'Možni odgovori za multiple_choice tip (ločeni z vejico)',
+                'Ali se vprašanje lahko ponovi (true/false)'
+            ],
+            'Primer': [
+                'Pokrov igralnega mesta',
+                'Ali je monitor brez poškodb?',
+                'boolean',
+                'true',
+                'Preveri stanje monitorja',
+                'Da,Ne,n/a',
+                'true'
+            ]
+        })
+        navodila.to_excel(writer, index=False, sheet_name='Navodila')
+
+
+def render_xlsx(projekt, progress=_brez_napredka):
+    """Izvozi odgovore projekta v XLSX in vrni vsebino datoteke."""
+    # 1. Naloži serijske številke, segmente, vprašanja in odgovore naenkrat
+    projekt_tip, matrika = _nalozi_projekt(projekt)
+
+    # 2. Ustvari Excel datoteko
+    excel_file = io.BytesIO()
+    writer = pd.ExcelWriter(excel_file, engine='openpyxl')
+
+    # 3. Pripravi podatke za glavo
+    header_data = [
+        ['Kontrolni seznam', '', '', '', ''],
+        ['', '', '', '', ''],
+        ['Projekt', f"{projekt.id} - {projekt_tip.tip.naziv}", '', '', ''],
+        ['Osebna številka', projekt.osebna_stevilka, '', 'Ime in priimek', ''],
+        ['Datum', projekt.datum.strftime('%Y-%m-%d'), '', 'Podpis', ''],
+        ['Število ponovitev', projekt_tip.stevilo_ponovitev, '', '', ''],
+        ['', '', '', '', '']
+    ]
+
+    # 4. Pripravi podatke za vsako serijsko številko
+    data = []
+    vrstice_serijskih = []  # Excel vrstice z naslovi sekcij serijskih številk
+    segmenti = matrika.segmenti_z_vprasanji()
+    st_serijskih = len(matrika.serijske_stevilke)
+
+    # Za vsako serijsko številko
+    for n, st in enumerate(matrika.serijske_stevilke):
+        # Dodaj serijsko številko kot naslov sekcije
+        data.append(['', '', '', '', ''])
+        vrstice_serijskih.append(len(header_data) + len(data) + 1)
+        data.append([f'Serijska številka: {st.stevilka}', '', '', '', ''])
+        data.append(['Segment', 'Vprašanje', 'Odgovor', 'Datum odgovora', ''])
+
+        # Za vsak segment in vsako vprašanje v segmentu
+        for segment, vprasanja in segmenti:
+            for i, vprasanje in enumerate(vprasanja):
+                odgovor = matrika[st.id, vprasanje.id]
+
+                # Dodaj segment samo prvič ko se pojavi
+                data.append([
+                    segment.naziv if i == 0 else '',
+                    vprasanje.vprasanje,
+                    odgovor.odgovor if odgovor else '',
+                    odgovor.created_at.strftime('%Y-%m-%d %H:%M:%S') if odgovor else '',
+                    ''
+                ])
+        progress(0.8 * (n + 1) / st_serijskih)
+
+    # 5. Ustvari DataFrame in zapiši v Excel
+    header_df = pd.DataFrame(header_data)
+    data_df = pd.DataFrame(data)
+
+    # Zapiši podatke v Excel
+    header_df.to_excel(writer, sheet_name='Kontrolni seznam', index=False, header=False)
+    data_df.to_excel(writer, sheet_name='Kontrolni seznam', startrow=len(header_data), index=False, header=False)
+
+    # 6. Oblikovanje
+    worksheet = writer.sheets['Kontrolni seznam']
+
+    # Nastavi širino stolpcev
+    worksheet.column_dimensions['A'].width = 25  # Segment
+    worksheet.column_dimensions['B'].width = 40  # Vprašanje
+    worksheet.column_dimensions['C'].width = 15  # Odgovor
+    worksheet.column_dimensions['D'].width = 20  # Datum odgovora
+    worksheet.column_dimensions['E'].width = 15  # Dodatni stolpec
+
+    # Oblikuj naslov
+    cell = worksheet['A1']
+    cell.font = openpyxl.styles.Font(size=14, bold=True)
+
+    # Oblikuj glavo
+    for row in range(3, 7):
+        for col in ['A', 'B', 'D']:
+            cell = worksheet[f'{col}{row}']
+            cell.font = openpyxl.styles.Font(bold=True)
+
+    # Oblikuj sekcije serijskih številk (vrstice so znane, zato lista ne preiskujemo)
+    krepko = openpyxl.styles.Font(bold=True)
+    ozadje = openpyxl.styles.PatternFill(start_color='E0E0E0', end_color='E0E0E0', fill_type='solid')
+    for row_num in vrstice_serijskih:
+        for col in ['A', 'B', 'C', 'D']:
+            cell = worksheet[f'{col}{row_num}']
+            cell.font = krepko
+            cell.fill = ozadje
+
+    # Shrani Excel
+    writer.close()
+    progress(1.0)
+    return excel_file.getvalue()
+
+
+def write_xlsx(projekt, out, progress=_brez_napredka):
+    """Izvozi odgovore projekta v XLSX in ga zapiši v datoteki podoben objekt ``out``."""
+    out.write(render_xlsx(projekt, progress))
+
+
+def render_pdf(projekt, out, progress=_brez_napredka, nacin=None):
+    """Izvozi odgovore projekta v PDF in ga zapiši v datoteki podoben objekt ``out``.
+
+    ``nacin`` izbere izris tabel (``hitro`` ali ``natancno``), privzeto PDF_NACIN.
+    """
+    # 1. Naloži serijske številke, segmente, vprašanja in odgovore naenkrat
+    projekt_tip, matrika = _nalozi_projekt(projekt)
+
+    # 2. Pripravi navadne podatke, ki jih lahko izrišejo tudi ločeni procesi
+    glava = {
+        'projekt': f'{projekt.id} - {projekt_tip.tip.naziv}',
+        'osebna_stevilka': projekt.osebna_stevilka,
+        'datum': projekt.datum.strftime("%d.%m.%Y"),
+        'stevilo_ponovitev': str(projekt_tip.stevilo_ponovitev),
+    }
+    segmenti = matrika.segmenti_z_vprasanji()
+    sekcije = []
+    for st in matrika.serijske_stevilke:
+        vrstice_segmentov = []
+        for segment, vprasanja in segmenti:
+            vrstice = []
+            for vprasanje in vprasanja:
+                odgovor = matrika[st.id, vprasanje.id]
+                vrstice.append((
+                    vprasanje.vprasanje,
+                    odgovor.odgovor if odgovor else '',
+                    odgovor.created_at.strftime('%d.%m.%Y %H:%M') if odgovor else ''
+                ))
+            vrstice_segmentov.append((segment.naziv, vrstice))
+        sekcije.append((st.stevilka, vrstice_segmentov))
+
+    # 3. Generiraj PDF
+    render_report(
+        glava,
+        sekcije,
+        out,
+        nacin=nacin or settings.PDF_NACIN,
+        workers=settings.PDF_WORKERS,
+        velikost_dela=settings.PDF_SERIJSKE_NA_DEL,
+        progress=progress
+    )
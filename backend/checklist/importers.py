@@ -0,0 +1,344 @@
+import logging
+import time
+from collections import defaultdict, deque
+
+import openpyxl
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .archive import ArchiveError, read_archive
+from .models import Tip, Projekt, ProjektTip, Segment, Vprasanje, SerijskaStevilka, Odgovor, LogSprememb
+from .progress import recompute_on_commit, recompute_progress
+from .signals import paketna_sprememba_predloge
+from .template_cache import get_templates, invalidate_template
+
+logger = logging.getLogger(__name__)
+
+STOLPCI_PREDLOGE = ('segment', 'question', 'type', 'required', 'description', 'options', 'repeatable')
+POLJA_VPRASANJA = ('tip', 'obvezno', 'opis', 'moznosti', 'repeatability')
+VELIKOST_KOSA_UVOZA = 1000
+
+
+def _besedilo(vrednost):
+    if vrednost is None:
+        return ''
+    return vrednost if isinstance(vrednost, str) else str(vrednost)
+
+
+def read_template_rows(xlsx_file):
+    """Preberi vrstice predloge vprašanj iz prvega lista XLSX datoteke.
+
+    Vrne seznam slovarjev s ključi, ki ustrezajo poljem modela ``Vprasanje``
+    (in ``segment`` z nazivom segmenta). Povsem prazne vrstice se preskočijo.
+    """
+    workbook = openpyxl.load_workbook(xlsx_file, read_only=True, data_only=True)
+    try:
+        vrstice = workbook.worksheets[0].iter_rows(values_only=True)
+        glava = [_besedilo(ime).strip() for ime in next(vrstice, ())]
+        manjkajoci = [ime for ime in ('segment', 'question', 'type') if ime not in glava]
+        if manjkajoci:
+            raise ValueError(f"Manjkajoči stolpci: {', '.join(manjkajoci)}")
+        indeksi = {ime: glava.index(ime) for ime in STOLPCI_PREDLOGE if ime in glava}
+
+        def vrednost(vrstica, ime):
+            i = indeksi.get(ime)
+            return _besedilo(vrstica[i]) if i is not None and i < len(vrstica) else ''
+
+        rezultat = []
+        for vrstica in vrstice:
+            if all(celica is None or celica == '' for celica in vrstica):
+                continue
+            rezultat.append({
+                'segment': vrednost(vrstica, 'segment'),
+                'vprasanje': vrednost(vrstica, 'question'),
+                'tip': vrednost(vrstica, 'type'),
+                'obvezno': vrednost(vrstica, 'required').lower() == 'true' if 'required' in indeksi else True,
+                'opis': vrednost(vrstica, 'description'),
+                'moznosti': vrednost(vrstica, 'options'),
+                'repeatability': vrednost(vrstica, 'repeatable').lower() == 'true',
+            })
+        return rezultat
+    finally:
+        workbook.close()
+
+
+def import_template(tip, vrstice):
+    """Uskladi segmente in vprašanja tipa z vrsticami predloge.
+
+    Segmenti se ujemajo po nazivu, vprašanja po (segment, besedilo vprašanja);
+    podvojena vprašanja se ujemajo po vrstnem redu. Spremenijo se le dodane,
+    posodobljene in odstranjene vrstice, zato odgovori na nespremenjena
+    vprašanja ostanejo ohranjeni. Nova vprašanja se dodajo na konec segmenta.
+
+    Vrne povzetek sprememb.
+    """
+    zdaj = timezone.now()
+    povzetek = {
+        'segmenti': {'dodani': 0, 'izbrisani': 0, 'nespremenjeni': 0},
+        'vprasanja': {'dodana': 0, 'posodobljena': 0, 'izbrisana': 0, 'nespremenjena': 0},
+    }
+
+    with transaction.atomic():
+        # Segmenti
+        segmenti = {}
+        odvecni_segmenti = []
+        for segment in Segment.objects.filter(tip=tip).order_by('id'):
+            if segment.naziv in segmenti:
+                odvecni_segmenti.append(segment.id)
+            else:
+                segmenti[segment.naziv] = segment
+
+        nazivi = list(dict.fromkeys(vrstica['segment'] for vrstica in vrstice))
+        novi_segmenti = Segment.objects.bulk_create([
+            Segment(tip=tip, naziv=naziv) for naziv in nazivi if naziv not in segmenti
+        ])
+        zahtevani = set(nazivi)
+        odvecni_segmenti += [s.id for naziv, s in segmenti.items() if naziv not in zahtevani]
+        for segment in novi_segmenti:
+            segmenti[segment.naziv] = segment
+
+        povzetek['segmenti']['dodani'] = len(novi_segmenti)
+        povzetek['segmenti']['izbrisani'] = len(odvecni_segmenti)
+        povzetek['segmenti']['nespremenjeni'] = len(zahtevani) - len(novi_segmenti)
+
+        # Vprašanja
+        obstojeca = defaultdict(deque)
+        for vprasanje in Vprasanje.objects.filter(segment__tip=tip).order_by('id'):
+            obstojeca[vprasanje.segment_id, vprasanje.vprasanje].append(vprasanje)
+
+        nova = []
+        posodobljena = []
+        for vrstica in vrstice:
+            segment = segmenti[vrstica['segment']]
+            kandidati = obstojeca.get((segment.id, vrstica['vprasanje']))
+            if not kandidati:
+                nova.append(Vprasanje(
+                    segment=segment,
+                    vprasanje=vrstica['vprasanje'],
+                    **{polje: vrstica[polje] for polje in POLJA_VPRASANJA}
+                ))
+                continue
+
+            vprasanje = kandidati.popleft()
+            if any(getattr(vprasanje, polje) != vrstica[polje] for polje in POLJA_VPRASANJA):
+                for polje in POLJA_VPRASANJA:
+                    setattr(vprasanje, polje, vrstica[polje])
+                vprasanje.updated_at = zdaj
+                posodobljena.append(vprasanje)
+            else:
+                povzetek['vprasanja']['nespremenjena'] += 1
+
+        odvecna = [vprasanje.id for kandidati in obstojeca.values() for vprasanje in kandidati]
+
+        with paketna_sprememba_predloge():
+            if odvecna:
+                Vprasanje.objects.filter(id__in=odvecna).delete()
+            if odvecni_segmenti:
+                Segment.objects.filter(id__in=odvecni_segmenti).delete()
+        Vprasanje.objects.bulk_create(nova)
+        Vprasanje.objects.bulk_update(posodobljena, list(POLJA_VPRASANJA) + ['updated_at'])
+
+        # Paketni zapisi in utišani izbrisi ne sprožijo signalov, zato predlogo
+        # zavržemo in števce napredka izračunamo sami
+        invalidate_template(tip.id)
+        recompute_on_commit(tip_id=tip.id)
+
+        povzetek['vprasanja']['dodana'] = len(nova)
+        povzetek['vprasanja']['posodobljena'] = len(posodobljena)
+        povzetek['vprasanja']['izbrisana'] = len(odvecna)
+
+    return povzetek
+
+
+def import_template_file(tip, xlsx_file):
+    """Preberi predlogo iz XLSX datoteke in jo uvozi v tip.
+
+    Vrne (število prebranih vrstic, povzetek sprememb iz ``import_template``).
+    """
+    vrstice = read_template_rows(xlsx_file)
+    return len(vrstice), import_template(tip, vrstice)
+
+
+class _Casi:
+    """Sešteva čas po fazah uvoza; vsak klic ``faza`` pripiše čas od prejšnjega klica."""
+
+    def __init__(self):
+        self.casi = defaultdict(float)
+        self._zadnji = time.perf_counter()
+
+    def faza(self, ime):
+        zdaj = time.perf_counter()
+        self.casi[ime] += zdaj - self._zadnji
+        self._zadnji = zdaj
+
+    def povzetek(self):
+        return {ime: round(cas, 3) for ime, cas in self.casi.items()}
+
+
+def _novejsi_odgovor(zapis, prejsnji):
+    """Ali zapis odgovora iz arhiva nadomesti prejšnji zapis za isti par."""
+    return (parse_datetime(zapis['updated_at']), zapis['id']) > (parse_datetime(prejsnji['updated_at']), prejsnji['id'])
+
+
+def import_archive(zapisi, uporabnik):
+    """Uvozi projekt iz zaporedja zapisov arhiva, kot jih vrne ``read_archive``.
+
+    Zapisi se obdelajo v enem prehodu. Serijske številke in odgovori se
+    vstavljajo v kosih po VELIKOST_KOSA_UVOZA, id-ji serijskih številk iz
+    arhiva pa se v pomnilniku preslikajo v nove. Segmenti in vprašanja se ne
+    uvažajo; vsak odgovor se mora sklicevati na vprašanje tipa svoje serijske
+    številke v tej bazi.
+
+    Vrne (projekt, števci uvoženih zapisov, časi faz v sekundah).
+    """
+    casi = _Casi()
+    stevci = {'tipi': 0, 'serijske_stevilke': 0, 'odgovori': 0}
+    projekt = None
+    projekt_tipi = {}
+    # id serijske v arhivu -> (nov id, tip_id)
+    serijske = {}
+    vprasanja_tipov = None
+    kos_serijskih = []
+    kos_odgovorov = []
+    # Odgovori trenutne serijske številke po vprašanju. Arhivi izpred unikatnega
+    # para (vprasanje, serijska) imajo lahko isti par večkrat; kot migracija 0003
+    # obdržimo najnovejši updated_at, nato najvišji id.
+    odgovori_serijske = {}
+    trenutna_serijska = None
+
+    def shrani_serijske():
+        casi.faza('priprava')
+        nove = SerijskaStevilka.objects.bulk_create([serijska for _, serijska in kos_serijskih])
+        for (stari_id, _), serijska in zip(kos_serijskih, nove):
+            serijske[stari_id] = (serijska.id, serijska.projekt_tip.tip_id)
+        stevci['serijske_stevilke'] += len(nove)
+        kos_serijskih.clear()
+        casi.faza('serijske_stevilke')
+
+    def shrani_odgovore():
+        casi.faza('priprava')
+        # Ponovljen par iz razpršenih odgovorov ene serijske prepiše prejšnjega
+        Odgovor.objects.bulk_create(
+            kos_odgovorov,
+            update_conflicts=True,
+            unique_fields=['vprasanje', 'serijska_stevilka'],
+            update_fields=['odgovor', 'created_at', 'updated_at']
+        )
+        stevci['odgovori'] += len(kos_odgovorov)
+        kos_odgovorov.clear()
+        casi.faza('odgovori')
+
+    def zakljuci_serijsko():
+        kos_odgovorov.extend(odgovor for _, odgovor in odgovori_serijske.values())
+        odgovori_serijske.clear()
+        if len(kos_odgovorov) >= VELIKOST_KOSA_UVOZA:
+            shrani_odgovore()
+
+    with transaction.atomic():
+        zapisi = iter(zapisi)
+        while True:
+            zapis = next(zapisi, None)
+            casi.faza('branje')
+            if zapis is None:
+                break
+
+            vrsta = zapis['zapis']
+            if vrsta == 'projekt':
+                if Projekt.objects.filter(id=zapis['id']).exists():
+                    raise ArchiveError(f'Projekt {zapis["id"]} že obstaja')
+                # Ustvarimo projekt z originalnimi časovnimi žigi
+                projekt = Projekt.objects.create(
+                    id=zapis['id'],
+                    osebna_stevilka=zapis['osebna_stevilka'],
+                    datum=zapis['datum'].split('T')[0],  # Vzamemo samo datum
+                    created_at=zapis['created_at'],
+                    updated_at=zapis['updated_at']
+                )
+                casi.faza('projekt')
+            elif vrsta in ('tip', 'serijska_stevilka', 'odgovor') and projekt is None:
+                raise ArchiveError('Arhiv nima zapisa projekta pred podatki projekta')
+            elif vrsta == 'tip':
+                if not Tip.objects.filter(id=zapis['id']).exists():
+                    raise ArchiveError(f'Tip {zapis["id"]} ({zapis.get("naziv", "")}) v tej bazi ne obstaja')
+                projekt_tipi[zapis['id']] = ProjektTip.objects.create(
+                    projekt=projekt,
+                    tip_id=zapis['id'],
+                    stevilo_ponovitev=zapis['stevilo_ponovitev'],
+                    created_at=zapis['created_at']
+                )
+                stevci['tipi'] += 1
+                casi.faza('projekt')
+            elif vrsta == 'serijska_stevilka':
+                if zapis['tip_id'] not in projekt_tipi:
+                    raise ArchiveError(f'Serijska številka {zapis["stevilka"]} ima neznan tip {zapis["tip_id"]}')
+                kos_serijskih.append((zapis['id'], SerijskaStevilka(
+                    projekt=projekt,
+                    projekt_tip=projekt_tipi[zapis['tip_id']],
+                    stevilka=zapis['stevilka'],
+                    created_at=zapis['created_at']
+                )))
+                if len(kos_serijskih) >= VELIKOST_KOSA_UVOZA:
+                    shrani_serijske()
+            elif vrsta == 'odgovor':
+                if kos_serijskih:
+                    shrani_serijske()
+                if vprasanja_tipov is None:
+                    # Veljavna vprašanja vseh tipov projekta enkrat iz predpomnilnika predlog
+                    vprasanja_tipov = {
+                        tip_id: {vprasanje.id for vprasanje in predloga.vprasanja}
+                        for tip_id, predloga in get_templates(projekt_tipi).items()
+                    }
+                if zapis['serijska_stevilka_id'] not in serijske:
+                    raise ArchiveError(
+                        f'Odgovor {zapis["id"]} se sklicuje na neznano serijsko številko {zapis["serijska_stevilka_id"]}'
+                    )
+                serijska_id, tip_id = serijske[zapis['serijska_stevilka_id']]
+                if zapis['vprasanje_id'] not in vprasanja_tipov[tip_id]:
+                    raise ArchiveError(
+                        f'Odgovor {zapis["id"]} se sklicuje na vprašanje {zapis["vprasanje_id"]}, ki ga tip {tip_id} nima'
+                    )
+                if serijska_id != trenutna_serijska:
+                    zakljuci_serijsko()
+                    trenutna_serijska = serijska_id
+                prejsnji = odgovori_serijske.get(zapis['vprasanje_id'])
+                if prejsnji is None or _novejsi_odgovor(zapis, prejsnji[0]):
+                    odgovori_serijske[zapis['vprasanje_id']] = (zapis, Odgovor(
+                        vprasanje_id=zapis['vprasanje_id'],
+                        odgovor=zapis['odgovor'],
+                        serijska_stevilka_id=serijska_id,
+                        created_at=zapis['created_at'],
+                        updated_at=zapis['updated_at']
+                    ))
+            casi.faza('priprava')
+
+        if projekt is None:
+            raise ArchiveError('Arhiv nima zapisa projekta')
+        if kos_serijskih:
+            shrani_serijske()
+        zakljuci_serijsko()
+        if kos_odgovorov:
+            shrani_odgovore()
+        recompute_progress(projekt_ids=[projekt.id])
+        casi.faza('napredek')
+
+        # Dodamo zapis v LogSprememb o uvozu
+        LogSprememb.objects.create(
+            uporabnik=uporabnik,
+            sprememba=f"projekt_{projekt.id}_uvoz",
+            entity_type='projekt',
+            entity_id=projekt.id,
+            projekt=projekt,
+            stara_vrednost="",
+            nova_vrednost=f"Uvoženo iz arhiva {timezone.now().isoformat()}"
+        )
+        casi.faza('projekt')
+    casi.faza('potrditev')
+
+    logger.info("Uvožen projekt %s: %s, časi %s", projekt.id, stevci, casi.povzetek())
+    return projekt, stevci, casi.povzetek()
+
+
+def import_archive_file(datoteka, uporabnik):
+    """Preberi arhiv projekta (v2 ali v1) iz naložene datoteke in ga uvozi."""
+    return import_archive(read_archive(datoteka), uporabnik)
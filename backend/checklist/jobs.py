@@ -0,0 +1,160 @@
+"""
+Izvozni posli v ozadju.
+
+Posel je vrstica IzvozniPosel; stanje 'cakajoc' pomeni, da čaka na izvajalca.
+Z EXPORT_IZVAJALNIK='nit' posle izvaja bazen niti v spletnem procesu. To je
+začasna rešitev za namestitve z enim procesom: posel živi le v pomnilniku tega
+procesa, zato ga ponovni zagon prekine. Z EXPORT_IZVAJALNIK='delavec' jih
+izvaja ločen proces `manage.py run_export_worker`, ki bazo uporablja kot vrsto.
+
+Posli, ki se EXPORT_ZASTARELO_S sekund niso premaknili, veljajo za osirotele:
+obnovi_osirotele_posle() prekinjene posle v teku označi z napako, čakajoče pa
+vrne, da jih izvajalec ponovno vzame.
+"""
+import logging
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from .export_cache import KONCNICE as PREDPOMNJENI_FORMATI, open_export
+from .registry import IMENA_DATOTEK, get_exporter
+from .models import IzvozniPosel
+
+logger = logging.getLogger(__name__)
+
+# Napredek se zapiše vsaj tako pogosto, da posel v teku ne zastari
+UTRIP_S = 30
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            return _executor
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.EXPORT_WORKERS,
+            thread_name_prefix='izvoz'
+        )
+    # Prvi posel v tem procesu: poberi posle, ki jih je pustil prejšnji proces
+    for posel_id in obnovi_osirotele_posle():
+        _executor.submit(_izvedi_v_niti, posel_id)
+    return _executor
+
+
+def obnovi_osirotele_posle():
+    """
+    Označi posle v teku brez znaka življenja kot prekinjene in vrni id-je
+    zastarelih čakajočih poslov, ki jih mora izvajalec ponovno vzeti.
+    """
+    meja = timezone.now() - timedelta(seconds=settings.EXPORT_ZASTARELO_S)
+    zdaj = timezone.now()
+    prekinjeni = IzvozniPosel.objects.filter(status='v_teku', updated_at__lt=meja).update(
+        status='napaka',
+        napaka='Izvoz je bil prekinjen, ker se je proces ustavil. Zaženi ga znova.',
+        koncano_at=zdaj,
+        updated_at=zdaj
+    )
+    if prekinjeni:
+        logger.warning("Označenih %s prekinjenih izvoznih poslov", prekinjeni)
+    return list(
+        IzvozniPosel.objects.filter(status='cakajoc', updated_at__lt=meja)
+        .order_by('id').values_list('id', flat=True)
+    )
+
+
+class _Napredek:
+    """
+    Zapisuje napredek posla v bazo ob spremembi za vsaj 5 odstotkov, sicer pa
+    vsaj vsakih UTRIP_S sekund, da posel ne velja za osirotelega.
+    """
+
+    def __init__(self, posel_id):
+        self.posel_id = posel_id
+        self.zadnji = 0
+        self.zapisano = time.monotonic()
+
+    def __call__(self, delez):
+        odstotek = min(int(delez * 100), 100)
+        if odstotek >= self.zadnji + 5 or time.monotonic() - self.zapisano >= UTRIP_S:
+            self.zadnji = max(self.zadnji, odstotek)
+            self.zapisano = time.monotonic()
+            IzvozniPosel.objects.filter(id=self.posel_id).update(napredek=self.zadnji, updated_at=timezone.now())
+
+
+def run_export(posel_id):
+    """
+    Izvedi izvozni posel in shrani datoteko pod MEDIA_ROOT/izvozi/.
+
+    Posel se najprej prevzame (cakajoc -> v_teku); če ga je že vzel drug
+    izvajalec, vrne False in ne naredi ničesar.
+    """
+    prevzet = IzvozniPosel.objects.filter(id=posel_id, status='cakajoc').update(
+        status='v_teku', updated_at=timezone.now()
+    )
+    if not prevzet:
+        return False
+    try:
+        posel = IzvozniPosel.objects.select_related('projekt').get(id=posel_id)
+
+        zapisi = get_exporter(posel.format)
+        ime_datoteke = IMENA_DATOTEK[posel.format](posel.projekt)
+        relativna_pot = os.path.join('izvozi', str(posel.id), ime_datoteke)
+        pot = os.path.join(settings.MEDIA_ROOT, relativna_pot)
+        os.makedirs(os.path.dirname(pot), exist_ok=True)
+
+        # Pišemo v začasno datoteko, da prenos nikoli ne vidi delnega izvoza
+        with open(pot + '.tmp', 'wb') as out:
+            if posel.format in PREDPOMNJENI_FORMATI:
+                varianta = settings.PDF_NACIN if posel.format == 'pdf' else ''
+                with open_export(posel.format, posel.projekt, zapisi, _Napredek(posel_id), varianta) as izvoz:
+                    shutil.copyfileobj(izvoz, out)
+            else:
+                zapisi(posel.projekt, out, _Napredek(posel_id))
+        os.replace(pot + '.tmp', pot)
+
+        zdaj = timezone.now()
+        IzvozniPosel.objects.filter(id=posel_id).update(
+            status='koncan',
+            napredek=100,
+            datoteka=relativna_pot,
+            ime_datoteke=ime_datoteke,
+            koncano_at=zdaj,
+            updated_at=zdaj
+        )
+    except Exception as e:
+        logger.exception("Napaka pri izvoznem poslu %s", posel_id)
+        zdaj = timezone.now()
+        IzvozniPosel.objects.filter(id=posel_id).update(
+            status='napaka',
+            napaka=str(e),
+            koncano_at=zdaj,
+            updated_at=zdaj
+        )
+    return True
+
+
+def _izvedi_v_niti(posel_id):
+    close_old_connections()
+    try:
+        run_export(posel_id)
+    finally:
+        connection.close()
+
+
+def submit_export(posel):
+    """
+    Pošlji posel v lokalni bazen niti, ko je njegov zapis potrjen v bazi.
+    Pri izvajalcu 'delavec' posel ostane v bazi, kjer ga pobere run_export_worker.
+    """
+    if settings.EXPORT_IZVAJALNIK == 'nit':
+        transaction.on_commit(lambda: _get_executor().submit(_izvedi_v_niti, posel.id))
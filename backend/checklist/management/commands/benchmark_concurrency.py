@@ -0,0 +1,143 @@
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+
+from checklist.models import Vprasanje, SerijskaStevilka
+
+
+def _percentil(casi, p):
+    if not casi:
+        return None
+    urejeni = sorted(casi)
+    return round(urejeni[min(len(urejeni) - 1, int(len(urejeni) * p / 100))], 2)
+
+
+class Command(BaseCommand):
+    help = ('Izmeri pretok shranjevanja odgovorov in zakasnitev branja, '
+            'ko več kontrolorjev hkrati shranjuje v isto bazo')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pisalci', type=int, default=4, help='Število hkratnih pisalcev (privzeto 4)')
+        parser.add_argument('--bralci', type=int, default=2, help='Število hkratnih bralcev (privzeto 2)')
+        parser.add_argument('--trajanje', type=float, default=10, help='Trajanje meritve v sekundah (privzeto 10)')
+        parser.add_argument('--paket', type=int, default=20, help='Odgovorov v enem shranjevanju (privzeto 20)')
+        parser.add_argument('--json', action='store_true', help='Izpiši rezultat kot JSON')
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            raise CommandError('Meritev potrebuje bazo v datoteki, ne v pomnilniku')
+
+        # Vsak pisalec dobi svojo serijsko številko, da meri tekmovanje za zaklep baze, ne za iste vrstice
+        serijske = list(
+            SerijskaStevilka.objects.select_related('projekt_tip').order_by('id')[:options['pisalci'] + options['bralci']]
+        )
+        if len(serijske) < options['pisalci'] + options['bralci']:
+            raise CommandError('Premalo serijskih številk; najprej zaženi generate_synthetic_data')
+
+        uporabnik, _ = User.objects.get_or_create(username='benchmark', defaults={'is_staff': True})
+        host = (settings.ALLOWED_HOSTS or ['localhost'])[0]
+
+        konec = time.perf_counter() + options['trajanje']
+        rezultati = {'pisanje': [], 'branje': [], 'napake': []}
+        lock = threading.Lock()
+
+        def klient():
+            c = Client(HTTP_HOST=host)
+            c.force_login(uporabnik)
+            return c
+
+        def pisalec(serijska):
+            c = klient()
+            vprasanja = list(
+                Vprasanje.objects.filter(segment__tip_id=serijska.projekt_tip.tip_id, tip='boolean')
+                .order_by('id').values_list('id', flat=True)[:options['paket']]
+            )
+            i = 0
+            while time.perf_counter() < konec:
+                # Izmenično Da/Ne, da vsako shranjevanje res spremeni vrstice
+                paket = [
+                    {'vprasanje': v, 'serijska_stevilka': serijska.id, 'odgovor': ('Da', 'Ne')[i % 2]}
+                    for v in vprasanja
+                ]
+                zacetek = time.perf_counter()
+                response = c.post('/api/odgovori/batch/', json.dumps(paket), content_type='application/json')
+                cas = (time.perf_counter() - zacetek) * 1000
+                with lock:
+                    if response.status_code == 200:
+                        rezultati['pisanje'].append(cas)
+                    else:
+                        rezultati['napake'].append(response.json().get('error', response.status_code))
+                i += 1
+
+        def bralec(serijska):
+            c = klient()
+            url = f'/api/projekti/{serijska.projekt_id}/snapshot/?serijska={serijska.id}'
+            while time.perf_counter() < konec:
+                zacetek = time.perf_counter()
+                response = c.get(url)
+                cas = (time.perf_counter() - zacetek) * 1000
+                with lock:
+                    if response.status_code == 200:
+                        rezultati['branje'].append(cas)
+                    else:
+                        rezultati['napake'].append(response.status_code)
+
+        def nit(funkcija, serijska):
+            try:
+                funkcija(serijska)
+            finally:
+                connection.close()
+
+        niti = [
+            threading.Thread(target=nit, args=(pisalec, s)) for s in serijske[:options['pisalci']]
+        ] + [
+            threading.Thread(target=nit, args=(bralec, s)) for s in serijske[options['pisalci']:]
+        ]
+        zacetek = time.perf_counter()
+        for t in niti:
+            t.start()
+        for t in niti:
+            t.join()
+        trajanje = time.perf_counter() - zacetek
+
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            journal_mode = cursor.fetchone()[0]
+
+        porocilo = {
+            'baza': {
+                'journal_mode': journal_mode,
+                'conn_max_age': settings.DATABASES['default'].get('CONN_MAX_AGE', 0),
+                'pragme': settings.DATABASES['default'].get('OPTIONS', {}).get('pragme', {}),
+            },
+            'pisalci': options['pisalci'],
+            'bralci': options['bralci'],
+            'trajanje_s': round(trajanje, 2),
+            'shranjevanja': len(rezultati['pisanje']),
+            'shranjevanja_na_s': round(len(rezultati['pisanje']) / trajanje, 1),
+            'odgovori_na_s': round(len(rezultati['pisanje']) * options['paket'] / trajanje, 1),
+            'pisanje_p50_ms': _percentil(rezultati['pisanje'], 50),
+            'pisanje_p95_ms': _percentil(rezultati['pisanje'], 95),
+            'branja': len(rezultati['branje']),
+            'branje_p50_ms': _percentil(rezultati['branje'], 50),
+            'branje_p95_ms': _percentil(rezultati['branje'], 95),
+            'branje_max_ms': round(max(rezultati['branje']), 2) if rezultati['branje'] else None,
+            'napake': len(rezultati['napake']),
+            'primeri_napak': sorted({str(n) for n in rezultati['napake']})[:5],
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(porocilo, indent=2, ensure_ascii=False))
+            return
+        for kljuc, vrednost in porocilo.items():
+            self.stdout.write(f'{kljuc:<20} {vrednost}')
+        if porocilo['napake']:
+            self.stdout.write(self.style.WARNING(f"{porocilo['napake']} neuspešnih zahtev"))
+        else:
+            self.stdout.write(self.style.SUCCESS('Brez napak'))
@@ -0,0 +1,204 @@
+import json
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from checklist.models import Projekt, Tip, Segment, Vprasanje, SerijskaStevilka, Odgovor, LogSprememb
+
+
+def koncne_tocke(projekt, serijska, tip_id, segment_id, vprasanje_id, paket):
+    """Vrni seznam (ime, metoda, url, telo, hladno) za merjenje.
+
+    ``hladno`` pomeni, da se pred vsako ponovitvijo izprazni predpomnilnik izvozov.
+    """
+    p, s = projekt.id, serijska.id
+    return [
+        ('auth csrf', 'GET', '/api/auth/csrf/', None, False),
+        ('projekti', 'GET', '/api/projekti/', None, False),
+        ('projekti nepaginirano', 'GET', '/api/projekti/?paginate=false', None, False),
+        ('projekt', 'GET', f'/api/projekti/{p}/', None, False),
+        ('projekt tipi', 'GET', f'/api/projekti/{p}/tipi/', None, False),
+        ('projekt snapshot', 'GET', f'/api/projekti/{p}/snapshot/', None, False),
+        ('projekt snapshot serijske', 'GET', f'/api/projekti/{p}/snapshot/?serijska={s}', None, False),
+        ('tipi', 'GET', '/api/tipi/', None, False),
+        ('segmenti tipa', 'GET', f'/api/segmenti/?tip_id={tip_id}&paginate=false', None, False),
+        ('segmenti projekta', 'GET', f'/api/segmenti/?projekt_id={p}&paginate=false', None, False),
+        ('vprasanja tipa', 'GET', f'/api/vprasanja/?tip_id={tip_id}&paginate=false', None, False),
+        ('vprasanja segmenta', 'GET', f'/api/segmenti/{segment_id}/vprasanja/', None, False),
+        ('odgovori vprasanja', 'GET', f'/api/vprasanja/{vprasanje_id}/odgovori/?projekt_id={p}', None, False),
+        ('serijske projekta', 'GET', f'/api/serijske-stevilke/?projekt={p}&paginate=false', None, False),
+        ('odgovori serijske', 'GET', f'/api/serijske-stevilke/{s}/odgovori/', None, False),
+        ('odgovori seznam', 'GET', f'/api/odgovori/?serijska_stevilka={s}&paginate=false', None, False),
+        ('odgovori batch', 'POST', '/api/odgovori/batch/', paket, False),
+        ('logi', 'GET', '/api/logi/', None, False),
+        ('export xlsx', 'GET', f'/api/projekti/{p}/export-xlsx/', None, True),
+        ('export xlsx predpomnjen', 'GET', f'/api/projekti/{p}/export-xlsx/', None, False),
+        ('export pdf', 'GET', f'/api/projekti/{p}/export-pdf/', None, True),
+        ('export archive', 'GET', f'/api/projekti/{p}/export-archive/?verzija=2', None, False),
+        ('export json', 'GET', '/api/projekti/export-json/', None, False),
+    ]
+
+
+def _vsebina(response):
+    if response.streaming:
+        return sum(len(kos) for kos in response.streaming_content)
+    return len(response.content)
+
+
+class Command(BaseCommand):
+    help = 'Izmeri čas, število poizvedb in porabo pomnilnika vseh API končnih točk in izvozov'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--projekt', help='Id projekta za meritve (privzeto projekt z največ odgovori)')
+        parser.add_argument('--ponovitve', type=int, default=3, help='Število meritev časa na točko (privzeto 3)')
+        parser.add_argument('--samo', action='append', default=[],
+                            help='Meri samo točke, katerih ime vsebuje ta niz (lahko večkrat)')
+        parser.add_argument('--brez-izvozov', action='store_true', help='Izpusti izvoze (xlsx, pdf, arhiv)')
+        parser.add_argument('--izhod', help='Pot do JSON poročila (privzeto standardni izhod)')
+
+    def handle(self, *args, **options):
+        projekt = self.izberi_projekt(options['projekt'])
+        serijska = SerijskaStevilka.objects.filter(projekt=projekt).select_related('projekt_tip').order_by('id').first()
+        if serijska is None:
+            raise CommandError(f'Projekt {projekt.id} nima serijskih številk')
+        tip_id = serijska.projekt_tip.tip_id
+        segment = Segment.objects.filter(tip_id=tip_id).order_by('id').first()
+        vprasanje = Vprasanje.objects.filter(segment__tip_id=tip_id).order_by('id').first()
+        if segment is None or vprasanje is None:
+            raise CommandError(f'Tip {tip_id} nima segmentov ali vprašanj')
+
+        # Paket z obstoječimi odgovori ene serijske številke ne spremeni podatkov
+        paket = [
+            {'vprasanje': v, 'serijska_stevilka': serijska.id, 'odgovor': o}
+            for v, o in Odgovor.objects.filter(serijska_stevilka=serijska).values_list('vprasanje_id', 'odgovor')
+        ]
+
+        tocke = koncne_tocke(projekt, serijska, tip_id, segment.id, vprasanje.id, paket)
+        if options['samo']:
+            tocke = [t for t in tocke if any(niz in t[0] for niz in options['samo'])]
+        if options['brez_izvozov']:
+            tocke = [t for t in tocke if not t[0].startswith('export')]
+
+        uporabnik, _ = User.objects.get_or_create(username='benchmark', defaults={'is_staff': True})
+        client = Client(HTTP_HOST=(settings.ALLOWED_HOSTS or ['localhost'])[0])
+        client.force_login(uporabnik)
+
+        cache_dir = tempfile.mkdtemp(prefix='benchmark_izvozi_')
+        try:
+            with override_settings(EXPORT_CACHE_DIR=cache_dir):
+                rezultati = [
+                    self.izmeri(client, cache_dir, options['ponovitve'], *tocka)
+                    for tocka in tocke
+                ]
+        finally:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+        porocilo = {
+            'cas': timezone.now().isoformat(),
+            'commit': self.commit(),
+            'baza': connection.vendor,
+            'podatki': {
+                'projekt': projekt.id,
+                'projekti': Projekt.objects.count(),
+                'tipi': Tip.objects.count(),
+                'vprasanja': Vprasanje.objects.count(),
+                'serijske_stevilke': SerijskaStevilka.objects.count(),
+                'serijske_stevilke_projekta': SerijskaStevilka.objects.filter(projekt=projekt).count(),
+                'odgovori': Odgovor.objects.count(),
+                'logi': LogSprememb.objects.count(),
+            },
+            'ponovitve': options['ponovitve'],
+            'koncne_tocke': rezultati,
+        }
+
+        besedilo = json.dumps(porocilo, indent=2, ensure_ascii=False)
+        if options['izhod']:
+            with open(options['izhod'], 'w', encoding='utf-8') as f:
+                f.write(besedilo)
+            for r in rezultati:
+                self.stdout.write(
+                    f"{r['ime']:<28} {r['status']:>4} {r['cas_mediana_ms']:>10.1f} ms "
+                    f"{r['poizvedbe']:>6} poizvedb {r['pomnilnik_mb']:>8.2f} MB"
+                )
+            self.stdout.write(self.style.SUCCESS(f"Poročilo zapisano v {options['izhod']}"))
+        else:
+            self.stdout.write(besedilo)
+
+    def izberi_projekt(self, projekt_id):
+        if projekt_id:
+            try:
+                return Projekt.objects.get(id=projekt_id)
+            except Projekt.DoesNotExist:
+                raise CommandError(f'Projekt {projekt_id} ne obstaja')
+        projekt = Projekt.objects.annotate(
+            st_odgovorov=Count('serijske_stevilke__odgovori')
+        ).order_by('-st_odgovorov').first()
+        if projekt is None:
+            raise CommandError('V bazi ni projektov; najprej zaženi generate_synthetic_data')
+        return projekt
+
+    def izvedi(self, client, metoda, url, telo):
+        if metoda == 'POST':
+            response = client.post(url, json.dumps(telo), content_type='application/json')
+        else:
+            response = client.get(url)
+        return response, _vsebina(response)
+
+    def izmeri(self, client, cache_dir, ponovitve, ime, metoda, url, telo, hladno):
+        def izprazni():
+            if hladno:
+                shutil.rmtree(cache_dir, ignore_errors=True)
+
+        # Čas merimo brez tracemalloc, ker ta izvajanje močno upočasni
+        casi = []
+        for _ in range(ponovitve):
+            izprazni()
+            # Dnevnik poizvedb ima omejeno dolžino, zato ga pred vsako meritvijo izpraznimo
+            reset_queries()
+            with CaptureQueriesContext(connection) as poizvedbe:
+                zacetek = time.perf_counter()
+                response, velikost = self.izvedi(client, metoda, url, telo)
+                casi.append((time.perf_counter() - zacetek) * 1000)
+            st_poizvedb = len(poizvedbe)
+
+        # Vršna poraba pomnilnika v ločeni izvedbi
+        izprazni()
+        tracemalloc.start()
+        try:
+            self.izvedi(client, metoda, url, telo)
+            _, vrh = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'ime': ime,
+            'metoda': metoda,
+            'url': url,
+            'status': response.status_code,
+            'cas_mediana_ms': round(statistics.median(casi), 2),
+            'cas_min_ms': round(min(casi), 2),
+            'poizvedbe': st_poizvedb,
+            'pomnilnik_mb': round(vrh / (1024 * 1024), 2),
+            'velikost_odgovora': velikost,
+        }
+
+    def commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                cwd=settings.BASE_DIR, capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,137 @@
+import datetime
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from checklist.models import Tip, Projekt, ProjektTip, Segment, Vprasanje, SerijskaStevilka, Odgovor
+from checklist.progress import recompute_progress
+
+BESEDE = (
+    'ohišje', 'vijak', 'monitor', 'kabel', 'priključek', 'zaklep', 'nalepka', 'ustnik',
+    'pokrov', 'tesnilo', 'napajanje', 'ventilator', 'plošča', 'stikalo', 'maska', 'nosilec',
+)
+ODGOVORI_DA_NE = ('Da', 'Ne', 'n/a')
+KOS_SERIJSKIH = 200
+
+
+class Command(BaseCommand):
+    help = 'Ustvari sintetične tipe, projekte, serijske številke in odgovore za merjenje zmogljivosti'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tipi', type=int, default=3, help='Število tipov (privzeto 3)')
+        parser.add_argument('--segmenti', type=int, default=10, help='Segmentov na tip (privzeto 10)')
+        parser.add_argument('--vprasanja', type=int, default=20, help='Vprašanj na segment (privzeto 20)')
+        parser.add_argument('--projekti', type=int, default=5, help='Število projektov (privzeto 5)')
+        parser.add_argument('--tipi-na-projekt', type=int, default=1, help='Tipov na projekt (privzeto 1)')
+        parser.add_argument('--serijske', type=int, default=1000,
+                            help='Serijskih številk na tip projekta (privzeto 1000)')
+        parser.add_argument('--pokritost', type=float, default=1.0,
+                            help='Delež vprašanj z odgovorom na serijsko številko, 0-1 (privzeto 1)')
+        parser.add_argument('--predpona', default='SYN', help='Predpona id-jev projektov in nazivov tipov')
+        parser.add_argument('--seed', type=int, default=42, help='Seme naključnih vrednosti')
+        parser.add_argument('--pobrisi', action='store_true',
+                            help='Najprej pobriši podatke, ustvarjene z isto predpono')
+
+    def handle(self, *args, **options):
+        if not 0 <= options['pokritost'] <= 1:
+            raise CommandError('--pokritost mora biti med 0 in 1')
+        if options['tipi_na_projekt'] > options['tipi']:
+            raise CommandError('--tipi-na-projekt ne sme biti večje od --tipi')
+
+        predpona = options['predpona']
+        rnd = random.Random(options['seed'])
+        zacetek = time.perf_counter()
+
+        if options['pobrisi']:
+            self.pobrisi(predpona)
+        elif Projekt.objects.filter(id__startswith=f'{predpona}-').exists():
+            raise CommandError(f'Podatki s predpono {predpona} že obstajajo; uporabi --pobrisi ali drugo --predpona')
+
+        tipi = self.ustvari_tipe(predpona, options['tipi'], options['segmenti'], options['vprasanja'], rnd)
+        vprasanja_po_tipu = {
+            tip.id: list(Vprasanje.objects.filter(segment__tip=tip).order_by('id').values_list('id', 'tip', 'moznosti'))
+            for tip in tipi
+        }
+
+        st_odgovorov = 0
+        for i in range(options['projekti']):
+            with transaction.atomic():
+                projekt = Projekt.objects.create(
+                    id=f'{predpona}-{i + 1:04d}',
+                    osebna_stevilka=str(rnd.randint(10000, 99999)),
+                    datum=datetime.date.today() - datetime.timedelta(days=rnd.randint(0, 365))
+                )
+                izbrani = [tipi[(i + n) % len(tipi)] for n in range(options['tipi_na_projekt'])]
+                for tip in izbrani:
+                    st_odgovorov += self.ustvari_serijske(
+                        projekt, tip, options['serijske'], vprasanja_po_tipu[tip.id], options['pokritost'], rnd
+                    )
+                recompute_progress(projekt_ids=[projekt.id])
+            self.stdout.write(f'Projekt {projekt.id} ustvarjen')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Ustvarjeno: {len(tipi)} tipov, {options['projekti']} projektov, "
+            f"{options['projekti'] * options['tipi_na_projekt'] * options['serijske']} serijskih številk, "
+            f"{st_odgovorov} odgovorov v {time.perf_counter() - zacetek:.1f} s"
+        ))
+
+    def pobrisi(self, predpona):
+        projekti = Projekt.objects.filter(id__startswith=f'{predpona}-')
+        st_projektov = projekti.count()
+        projekti.delete()
+        # Tipi so zaščiteni, dokler jih uporablja kak projekt, zato jih brišemo za projekti
+        Tip.objects.filter(naziv__startswith=f'{predpona} tip ').delete()
+        self.stdout.write(f'Pobrisanih {st_projektov} projektov s predpono {predpona}')
+
+    def ustvari_tipe(self, predpona, st_tipov, st_segmentov, st_vprasanj, rnd):
+        tipi = []
+        with transaction.atomic():
+            for t in range(st_tipov):
+                tip = Tip.objects.create(naziv=f'{predpona} tip {t + 1}')
+                segmenti = Segment.objects.bulk_create([
+                    Segment(tip=tip, naziv=f'Segment {s + 1} {rnd.choice(BESEDE)}')
+                    for s in range(st_segmentov)
+                ])
+                vprasanja = []
+                for segment in segmenti:
+                    for v in range(st_vprasanj):
+                        tip_vprasanja = rnd.choices(['boolean', 'multiple_choice', 'textual'], [8, 1, 1])[0]
+                        vprasanja.append(Vprasanje(
+                            segment=segment,
+                            vprasanje=f'Ali je {rnd.choice(BESEDE)} pravilno nameščen in brez poškodb ({v + 1})?',
+                            tip=tip_vprasanja,
+                            repeatability=rnd.random() < 0.5,
+                            moznosti='A,B,C,D' if tip_vprasanja == 'multiple_choice' else ''
+                        ))
+                Vprasanje.objects.bulk_create(vprasanja)
+                tipi.append(tip)
+        return tipi
+
+    def ustvari_serijske(self, projekt, tip, st_serijskih, vprasanja, pokritost, rnd):
+        projekt_tip = ProjektTip.objects.create(projekt=projekt, tip=tip, stevilo_ponovitev=st_serijskih)
+        serijske = SerijskaStevilka.objects.bulk_create([
+            SerijskaStevilka(projekt=projekt, projekt_tip=projekt_tip, stevilka=f'{projekt.id}-{tip.id}-{i + 1}')
+            for i in range(st_serijskih)
+        ])
+
+        # Odgovori po kosih serijskih številk, da ostane poraba pomnilnika omejena
+        st_odgovorov = 0
+        for k in range(0, len(serijske), KOS_SERIJSKIH):
+            odgovori = [
+                Odgovor(vprasanje_id=vprasanje_id, serijska_stevilka=st, odgovor=self.odgovor(tip_vprasanja, moznosti, rnd))
+                for st in serijske[k:k + KOS_SERIJSKIH]
+                for vprasanje_id, tip_vprasanja, moznosti in vprasanja
+                if pokritost >= 1 or rnd.random() < pokritost
+            ]
+            Odgovor.objects.bulk_create(odgovori)
+            st_odgovorov += len(odgovori)
+        return st_odgovorov
+
+    def odgovor(self, tip_vprasanja, moznosti, rnd):
+        if tip_vprasanja == 'multiple_choice':
+            return rnd.choice(moznosti.split(','))
+        if tip_vprasanja == 'textual':
+            return ' '.join(rnd.choices(BESEDE, k=rnd.randint(1, 6)))
+        return rnd.choice(ODGOVORI_DA_NE)
@@ -0,0 +1,16 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from checklist.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Zgradi iskalni indeks FTS5 znova iz projektov, serijskih številk, vprašanj in odgovorov'
+
+    def handle(self, *args, **options):
+        zacetek = time.perf_counter()
+        stevilo = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(
+            f'Iskalni indeks ima {stevilo} vrstic ({time.perf_counter() - zacetek:.1f} s)'
+        ))
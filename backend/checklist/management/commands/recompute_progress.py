@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from checklist.progress import recompute_progress
+
+
+class Command(BaseCommand):
+    help = 'Izračunaj števce izpolnjenosti serijskih številk in projektov znova iz odgovorov'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--projekt', action='append', help='Samo ta projekt (lahko večkrat)')
+        parser.add_argument('--tip', type=int, action='append', help='Samo serijske številke tega tipa (lahko večkrat)')
+
+    def handle(self, *args, **options):
+        zacetek = time.perf_counter()
+        stevilo = recompute_progress(projekt_ids=options['projekt'], tip_ids=options['tip'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Izračunan napredek {stevilo} serijskih številk v {time.perf_counter() - zacetek:.1f} s'
+        ))
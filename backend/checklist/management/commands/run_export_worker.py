@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from checklist.jobs import obnovi_osirotele_posle, run_export
+from checklist.models import IzvozniPosel
+
+
+class Command(BaseCommand):
+    help = 'Izvajaj izvozne posle iz baze v ločenem procesu (EXPORT_IZVAJALNIK=delavec)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--enkrat', action='store_true', help='Izvedi vse čakajoče posle in končaj')
+        parser.add_argument('--presledek', type=float, default=2.0, help='Sekunde med preverjanji prazne vrste')
+
+    def handle(self, *args, **options):
+        izvedeni = 0
+        while True:
+            close_old_connections()
+            obnovi_osirotele_posle()
+            posel_id = (
+                IzvozniPosel.objects.filter(status='cakajoc')
+                .order_by('id').values_list('id', flat=True).first()
+            )
+            if posel_id is None:
+                if options['enkrat']:
+                    break
+                time.sleep(options['presledek'])
+                continue
+            if run_export(posel_id):
+                izvedeni += 1
+        self.stdout.write(self.style.SUCCESS(f'Izvedenih {izvedeni} izvoznih poslov'))
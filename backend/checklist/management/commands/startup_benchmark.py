@@ -0,0 +1,70 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Skripta se izvede v svežem procesu, tako kot ob zagonu WSGI delavca
+SKRIPTA = '''
+import json, resource, sys, time
+zacetek = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+from django.urls import resolve
+resolve({pot!r})
+cas = time.perf_counter() - zacetek
+print(json.dumps({{
+    'cas_s': cas,
+    'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'tezki_moduli': [m for m in {moduli!r} if m in sys.modules],
+}}))
+'''
+
+TEZKI_MODULI = ('pandas', 'numpy', 'openpyxl', 'reportlab', 'pypdf')
+
+
+class Command(BaseCommand):
+    help = 'Izmeri čas uvoza in porabo pomnilnika (RSS) ob hladnem zagonu delavca'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ponovitve', type=int, default=5, help='Število zagonov (privzeto 5)')
+        parser.add_argument('--pot', default='/api/auth/csrf/', help='URL, ki ga delavec razreši ob zagonu')
+        parser.add_argument('--json', action='store_true', help='Izpiši rezultat kot JSON')
+
+    def handle(self, *args, **options):
+        skripta = SKRIPTA.format(pot=options['pot'], moduli=TEZKI_MODULI)
+        okolje = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'backend.settings'))
+
+        meritve = []
+        for _ in range(options['ponovitve']):
+            izvedba = subprocess.run(
+                [sys.executable, '-c', skripta],
+                cwd=settings.BASE_DIR,
+                env=okolje,
+                capture_output=True,
+                text=True
+            )
+            if izvedba.returncode != 0:
+                raise CommandError(f'Zagon ni uspel:\n{izvedba.stderr}')
+            meritve.append(json.loads(izvedba.stdout.strip().splitlines()[-1]))
+
+        casi = [m['cas_s'] for m in meritve]
+        rezultat = {
+            'ponovitve': len(meritve),
+            'cas_mediana_s': round(statistics.median(casi), 3),
+            'cas_min_s': round(min(casi), 3),
+            'rss_mb': round(max(m['rss_mb'] for m in meritve), 1),
+            'tezki_moduli': meritve[-1]['tezki_moduli'],
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(rezultat, indent=2))
+            return
+
+        self.stdout.write(f"Zagonov: {rezultat['ponovitve']}")
+        self.stdout.write(f"Čas uvoza: mediana {rezultat['cas_mediana_s']} s, najmanj {rezultat['cas_min_s']} s")
+        self.stdout.write(f"RSS: {rezultat['rss_mb']} MB")
+        self.stdout.write(f"Naloženi težki moduli: {', '.join(rezultat['tezki_moduli']) or 'nobeden'}")
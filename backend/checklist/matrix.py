@@ -0,0 +1,86 @@
+from .models import SerijskaStevilka, Odgovor, ProjektTip
+from .template_cache import get_templates
+
+
+class AnswerMatrix:
+    """Gosta matrika odgovorov projekta: vrstice so serijske številke, stolpci vprašanja.
+
+    Celica je ``None`` ali objekt ``Odgovor``. Do celice dostopamo z
+    ``matrika[serijska_id, vprasanje_id]``.
+    """
+
+    def __init__(self, serijske_stevilke, segmenti, vprasanja, odgovori):
+        self.serijske_stevilke = serijske_stevilke
+        self.segmenti = segmenti
+        self.vprasanja = vprasanja
+
+        self.vprasanja_po_segmentu = {segment.id: [] for segment in segmenti}
+        for vprasanje in vprasanja:
+            self.vprasanja_po_segmentu.setdefault(vprasanje.segment_id, []).append(vprasanje)
+
+        self._vrstice = {st.id: i for i, st in enumerate(serijske_stevilke)}
+        self._stolpci = {vprasanje.id: j for j, vprasanje in enumerate(vprasanja)}
+        self._celice = [[None] * len(vprasanja) for _ in serijske_stevilke]
+
+        for odgovor in odgovori:
+            i = self._vrstice.get(odgovor.serijska_stevilka_id)
+            j = self._stolpci.get(odgovor.vprasanje_id)
+            if i is not None and j is not None:
+                self._celice[i][j] = odgovor
+
+    def __getitem__(self, key):
+        serijska_id, vprasanje_id = key
+        return self._celice[self._vrstice[serijska_id]][self._stolpci[vprasanje_id]]
+
+    def vrstica(self, serijska_id):
+        """Vrni odgovore ene serijske številke v vrstnem redu ``self.vprasanja``."""
+        return self._celice[self._vrstice[serijska_id]]
+
+    def odgovori(self):
+        """Vrni vse obstoječe odgovore po vrsticah in stolpcih matrike."""
+        return [odgovor for vrstica in self._celice for odgovor in vrstica if odgovor is not None]
+
+    def segmenti_z_vprasanji(self):
+        """Vrni pare (segment, vprašanja) za segmente, ki imajo vsaj eno vprašanje."""
+        return [
+            (segment, self.vprasanja_po_segmentu[segment.id])
+            for segment in self.segmenti
+            if self.vprasanja_po_segmentu.get(segment.id)
+        ]
+
+
+def load_answer_matrix(projekt, tip_ids=None, serijske_ids=None, serijske_po_tipu=False):
+    """Naloži predlogo in odgovore projekta s konstantnim številom poizvedb.
+
+    Segmenti in vprašanja se berejo iz predpomnilnika predlog.
+
+    ``tip_ids`` omeji predlogo na podane tipe (privzeto vsi tipi projekta),
+    ``serijske_ids`` pa vrstice na podane serijske številke (privzeto vse).
+    Z ``serijske_po_tipu`` se vrstice omejijo na serijske številke podanih tipov.
+    """
+    if tip_ids is None:
+        tip_ids = list(
+            ProjektTip.objects.filter(projekt=projekt).order_by('id').values_list('tip_id', flat=True)
+        )
+
+    serijske_stevilke = SerijskaStevilka.objects.filter(projekt=projekt).order_by('id')
+    odgovori = Odgovor.objects.filter(
+        serijska_stevilka__projekt=projekt,
+        vprasanje__segment__tip_id__in=tip_ids,
+    )
+    if serijske_po_tipu:
+        serijske_stevilke = serijske_stevilke.filter(projekt_tip__tip_id__in=tip_ids)
+    if serijske_ids is not None:
+        serijske_stevilke = serijske_stevilke.filter(id__in=serijske_ids)
+        odgovori = odgovori.filter(serijska_stevilka_id__in=serijske_ids)
+
+    predloge = get_templates(tip_ids).values()
+    segmenti = sorted((s for predloga in predloge for s in predloga.segmenti), key=lambda s: s.id)
+    vprasanja = sorted(
+        (v for predloga in predloge for v in predloga.vprasanja), key=lambda v: (v.segment_id, v.id)
+    )
+    odgovori = odgovori.only(
+        'id', 'vprasanje_id', 'serijska_stevilka_id', 'odgovor', 'created_at', 'updated_at'
+    )
+
+    return AnswerMatrix(list(serijske_stevilke), segmenti, vprasanja, odgovori.iterator(chunk_size=2000))
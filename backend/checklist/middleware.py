@@ -0,0 +1,131 @@
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_vzorci = defaultdict(lambda: deque(maxlen=settings.METRIKE_VELIKOST_VZORCA))
+_vzorci_lock = threading.Lock()
+
+PERCENTILI = (50, 90, 95, 99)
+
+
+class _Poizvedbe:
+    """Ovoj izvajanja poizvedb, ki šteje poizvedbe in sešteva njihov čas."""
+
+    def __init__(self):
+        self.stevilo = 0
+        self.cas = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        zacetek = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.stevilo += 1
+            self.cas += time.perf_counter() - zacetek
+
+
+def _kljuc(request):
+    """Vrni ime poti za združevanje meritev, npr. ``GET projekt-snapshot``."""
+    match = getattr(request, 'resolver_match', None)
+    ime = (match.view_name or match.route) if match else '(ni ujemanja)'
+    return f'{request.method} {ime}'
+
+
+def zabelezi(kljuc, meritev):
+    with _vzorci_lock:
+        _vzorci[kljuc].append(meritev)
+
+
+def _percentil(urejene, p):
+    """Percentil po metodi najbližjega ranga nad urejenim seznamom."""
+    indeks = max(0, -(-p * len(urejene) // 100) - 1)
+    return urejene[indeks]
+
+
+def povzetek_metrik():
+    """Vrni percentile časov in število poizvedb za vsako pot v tem procesu."""
+    with _vzorci_lock:
+        posnetek = {kljuc: list(vzorci) for kljuc, vzorci in _vzorci.items()}
+
+    povzetek = {}
+    for kljuc, vzorci in sorted(posnetek.items()):
+        povzetek[kljuc] = {'stevilo': len(vzorci)}
+        for polje in ('cas_ms', 'db_ms', 'render_ms', 'poizvedbe'):
+            urejene = sorted(v[polje] for v in vzorci)
+            povzetek[kljuc][polje] = {
+                **{f'p{p}': round(_percentil(urejene, p), 2) for p in PERCENTILI},
+                'max': round(urejene[-1], 2),
+            }
+    return povzetek
+
+
+def ponastavi_metrike():
+    with _vzorci_lock:
+        _vzorci.clear()
+
+
+class PerformanceMiddleware:
+    """Meri čas zahteve, čas in število poizvedb ter čas izrisa odgovora.
+
+    Meritve doda v glavo ``Server-Timing``, jih zapiše v dnevnik ``checklist``
+    in hrani zadnjih METRIKE_VELIKOST_VZORCA meritev na pot za ``/api/metrics/``.
+    Pri pretočnih odgovorih se šteje le delo do začetka pošiljanja.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.METRIKE_ZAHTEV:
+            return self.get_response(request)
+
+        zacetek = time.perf_counter()
+        poizvedbe = _Poizvedbe()
+        request._cas_izrisa = 0.0
+        with ExitStack() as sklad:
+            for alias in connections:
+                sklad.enter_context(connections[alias].execute_wrapper(poizvedbe))
+            response = self.get_response(request)
+        skupaj = time.perf_counter() - zacetek
+
+        meritev = {
+            'cas_ms': skupaj * 1000,
+            'db_ms': poizvedbe.cas * 1000,
+            'render_ms': request._cas_izrisa * 1000,
+            'poizvedbe': poizvedbe.stevilo,
+        }
+        response['Server-Timing'] = (
+            f'db;dur={meritev["db_ms"]:.1f};desc="{poizvedbe.stevilo} poizvedb", '
+            f'render;dur={meritev["render_ms"]:.1f}, '
+            f'total;dur={meritev["cas_ms"]:.1f}'
+        )
+
+        kljuc = _kljuc(request)
+        zabelezi(kljuc, meritev)
+        logger.debug('metrika %s', json.dumps({
+            'pot': kljuc,
+            'url': request.path,
+            'status': response.status_code,
+            **{polje: round(vrednost, 2) for polje, vrednost in meritev.items()},
+        }, ensure_ascii=False))
+        return response
+
+    def process_template_response(self, request, response):
+        if not settings.METRIKE_ZAHTEV:
+            return response
+        # DRF Response se serializira ob izrisu, ki sledi takoj po tem klicu
+        zacetek = time.perf_counter()
+
+        def konec_izrisa(izrisan):
+            request._cas_izrisa += time.perf_counter() - zacetek
+
+        response.add_post_render_callback(konec_izrisa)
+        return response
@@ -0,0 +1,102 @@
+# Generated by Django 5.0.3 on 2026-10-18 06:32
+
+import re
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+VELIKOST_KOSA = 500
+
+
+def razcleni_spremembo(sprememba):
+    # Kopija checklist.models.razcleni_spremembo ob času te migracije
+    for entity_type in ('serijska_stevilka', 'odgovor', 'projekt'):
+        predpona = f'{entity_type}_'
+        if not sprememba.startswith(predpona):
+            continue
+        ostanek = sprememba[len(predpona):]
+        if entity_type == 'projekt':
+            if ostanek.endswith('_uvoz'):
+                ostanek = ostanek[:-len('_uvoz')]
+            return entity_type, ostanek
+        stevilka = re.match(r'\d+', ostanek)
+        if stevilka:
+            return entity_type, stevilka.group()
+    return '', ''
+
+
+def napolni_entitete(apps, schema_editor):
+    LogSprememb = apps.get_model('checklist', 'LogSprememb')
+    Projekt = apps.get_model('checklist', 'Projekt')
+    SerijskaStevilka = apps.get_model('checklist', 'SerijskaStevilka')
+    Odgovor = apps.get_model('checklist', 'Odgovor')
+
+    zadnji_id = 0
+    while True:
+        kos = list(LogSprememb.objects.filter(id__gt=zadnji_id).order_by('id')[:VELIKOST_KOSA])
+        if not kos:
+            break
+        zadnji_id = kos[-1].id
+
+        po_tipih = {'projekt': set(), 'serijska_stevilka': set(), 'odgovor': set()}
+        for log in kos:
+            log.entity_type, log.entity_id = razcleni_spremembo(log.sprememba)
+            if log.entity_type:
+                po_tipih[log.entity_type].add(log.entity_id)
+
+        projekti = {
+            'projekt': {
+                p: p for p in Projekt.objects.filter(id__in=po_tipih['projekt']).values_list('id', flat=True)
+            },
+            'serijska_stevilka': {
+                str(st_id): projekt_id for st_id, projekt_id in SerijskaStevilka.objects.filter(
+                    id__in=po_tipih['serijska_stevilka']
+                ).values_list('id', 'projekt_id')
+            },
+            'odgovor': {
+                str(o_id): projekt_id for o_id, projekt_id in Odgovor.objects.filter(
+                    id__in=po_tipih['odgovor']
+                ).values_list('id', 'serijska_stevilka__projekt_id')
+            },
+        }
+        for log in kos:
+            if log.entity_type:
+                log.projekt_id = projekti[log.entity_type].get(log.entity_id)
+
+        LogSprememb.objects.bulk_update(kos, ['entity_type', 'entity_id', 'projekt'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('checklist', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logsprememb',
+            name='entity_id',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='logsprememb',
+            name='entity_type',
+            field=models.CharField(blank=True, choices=[('projekt', 'Projekt'), ('serijska_stevilka', 'Serijska številka'), ('odgovor', 'Odgovor')], default='', max_length=30),
+        ),
+        migrations.AddField(
+            model_name='logsprememb',
+            name='projekt',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='spremembe', to='checklist.projekt'),
+        ),
+        migrations.AddIndex(
+            model_name='logsprememb',
+            index=models.Index(fields=['entity_type', 'entity_id', 'cas'], name='log_entiteta_cas_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='logsprememb',
+            index=models.Index(fields=['projekt', 'entity_type', 'cas'], name='log_projekt_cas_idx'),
+        ),
+        migrations.RunPython(napolni_entitete, migrations.RunPython.noop),
+    ]
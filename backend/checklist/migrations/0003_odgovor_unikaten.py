@@ -0,0 +1,43 @@
+# Generated by Django 5.0.3 on 2026-10-18 06:35
+
+from django.db import migrations
+from django.db.models import Count
+
+VELIKOST_KOSA = 500
+
+
+def odstrani_podvojene_odgovore(apps, schema_editor):
+    # Za vsak par (vprašanje, serijska številka) obdržimo nazadnje posodobljen odgovor
+    Odgovor = apps.get_model('checklist', 'Odgovor')
+
+    podvojeni = (
+        Odgovor.objects.values('vprasanje_id', 'serijska_stevilka_id')
+        .annotate(stevilo=Count('id'))
+        .filter(stevilo__gt=1)
+        .values_list('vprasanje_id', 'serijska_stevilka_id')
+    )
+    odvecni = []
+    for vprasanje_id, serijska_stevilka_id in podvojeni.iterator():
+        ids = Odgovor.objects.filter(
+            vprasanje_id=vprasanje_id,
+            serijska_stevilka_id=serijska_stevilka_id
+        ).order_by('-updated_at', '-id').values_list('id', flat=True)
+        odvecni.extend(list(ids)[1:])
+
+    for i in range(0, len(odvecni), VELIKOST_KOSA):
+        Odgovor.objects.filter(id__in=odvecni[i:i + VELIKOST_KOSA]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('checklist', '0002_logsprememb_entiteta'),
+    ]
+
+    operations = [
+        migrations.RunPython(odstrani_podvojene_odgovore, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='odgovor',
+            unique_together={('vprasanje', 'serijska_stevilka')},
+        ),
+    ]
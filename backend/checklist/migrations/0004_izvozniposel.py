@@ -0,0 +1,33 @@
+# Generated by Django 5.0.3 on 2026-10-18 06:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('checklist', '0003_odgovor_unikaten'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IzvozniPosel',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('format', models.CharField(choices=[('xlsx', 'XLSX'), ('pdf', 'PDF'), ('archive', 'Arhiv JSON')], max_length=20)),
+                ('status', models.CharField(choices=[('cakajoc', 'Čaka'), ('v_teku', 'V teku'), ('koncan', 'Končan'), ('napaka', 'Napaka')], default='cakajoc', max_length=20)),
+                ('napredek', models.PositiveSmallIntegerField(default=0)),
+                ('datoteka', models.FileField(blank=True, upload_to='izvozi/')),
+                ('ime_datoteke', models.CharField(blank=True, max_length=255)),
+                ('napaka', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('koncano_at', models.DateTimeField(blank=True, null=True)),
+                ('projekt', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='izvozi', to='checklist.projekt')),
+                ('uporabnik', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,105 @@
+# Generated by Django 5.0.3 on 2026-10-18 07:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Max, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+VELIKOST_KOSA = 400
+
+
+def napolni_napredek(apps, schema_editor):
+    # Poenostavljena kopija checklist.progress.recompute_progress ob času te migracije
+    Projekt = apps.get_model('checklist', 'Projekt')
+    SerijskaStevilka = apps.get_model('checklist', 'SerijskaStevilka')
+    Vprasanje = apps.get_model('checklist', 'Vprasanje')
+    Odgovor = apps.get_model('checklist', 'Odgovor')
+    NapredekSerijske = apps.get_model('checklist', 'NapredekSerijske')
+    NapredekProjekta = apps.get_model('checklist', 'NapredekProjekta')
+
+    zdaj = timezone.now()
+    obvezna = dict(
+        Vprasanje.objects.filter(obvezno=True).order_by().values('segment__tip_id')
+        .annotate(st=Count('id')).values_list('segment__tip_id', 'st')
+    )
+    odgovorjen = ~Q(odgovor='') & Q(vprasanje__segment__tip_id=F('serijska_stevilka__projekt_tip__tip_id'))
+
+    zadnji_id = 0
+    while True:
+        kos = list(
+            SerijskaStevilka.objects.filter(id__gt=zadnji_id).order_by('id')
+            .values_list('id', 'projekt_id', 'projekt_tip__tip_id')[:VELIKOST_KOSA]
+        )
+        if not kos:
+            break
+        zadnji_id = kos[-1][0]
+        agregati = {
+            vrstica['serijska_stevilka_id']: vrstica
+            for vrstica in Odgovor.objects.filter(serijska_stevilka_id__in=[s for s, _, _ in kos])
+            .order_by().values('serijska_stevilka_id').annotate(
+                odgovorjeni=Count('id', filter=odgovorjen),
+                odgovorjeni_obvezni=Count('id', filter=odgovorjen & Q(vprasanje__obvezno=True)),
+                zadnja_aktivnost=Max('updated_at'),
+            )
+        }
+        NapredekSerijske.objects.bulk_create([
+            NapredekSerijske(
+                serijska_stevilka_id=serijska_id,
+                projekt_id=projekt_id,
+                odgovorjeni=agregati.get(serijska_id, {}).get('odgovorjeni', 0),
+                odgovorjeni_obvezni=agregati.get(serijska_id, {}).get('odgovorjeni_obvezni', 0),
+                vsa_obvezna=obvezna.get(tip_id, 0),
+                zadnja_aktivnost=agregati.get(serijska_id, {}).get('zadnja_aktivnost'),
+                updated_at=zdaj,
+            )
+            for serijska_id, projekt_id, tip_id in kos
+        ])
+
+    polja = ('odgovorjeni', 'odgovorjeni_obvezni', 'vsa_obvezna')
+    NapredekProjekta.objects.bulk_create(
+        [
+            NapredekProjekta(projekt_id=vsota.pop('id'), updated_at=zdaj, **vsota)
+            for vsota in Projekt.objects.values('id').annotate(
+                serijske_stevilke=Count('napredek_serijskih'),
+                zadnja_aktivnost=Max('napredek_serijskih__zadnja_aktivnost'),
+                **{polje: Coalesce(Sum(f'napredek_serijskih__{polje}'), 0) for polje in polja},
+            )
+        ],
+        batch_size=VELIKOST_KOSA,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('checklist', '0004_izvozniposel'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NapredekProjekta',
+            fields=[
+                ('projekt', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='napredek', serialize=False, to='checklist.projekt')),
+                ('serijske_stevilke', models.PositiveIntegerField(default=0)),
+                ('odgovorjeni', models.PositiveIntegerField(default=0)),
+                ('odgovorjeni_obvezni', models.PositiveIntegerField(default=0)),
+                ('vsa_obvezna', models.PositiveIntegerField(default=0)),
+                ('zadnja_aktivnost', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='NapredekSerijske',
+            fields=[
+                ('serijska_stevilka', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='napredek', serialize=False, to='checklist.serijskastevilka')),
+                ('odgovorjeni', models.PositiveIntegerField(default=0)),
+                ('odgovorjeni_obvezni', models.PositiveIntegerField(default=0)),
+                ('vsa_obvezna', models.PositiveIntegerField(default=0)),
+                ('zadnja_aktivnost', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('projekt', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='napredek_serijskih', to='checklist.projekt')),
+            ],
+        ),
+        migrations.RunPython(napolni_napredek, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,94 @@
+from django.db import migrations
+
+TABELA = 'checklist_iskanje'
+
+# Vrsta entitete je ostanek rowid % 4: odgovor 0, vprašanje 1, serijska številka 2, projekt 3.
+# Stolpec kljuci ima besedi 'v<vrsta>' in 'p' || hex(projekt_id), po katerih se filtrira v indeksu.
+USTVARI = [
+    f"""CREATE VIRTUAL TABLE {TABELA} USING fts5(
+        besedilo, kljuci,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )""",
+    # Relevantnost šteje le besedilo
+    f"INSERT INTO {TABELA}({TABELA}, rank) VALUES('rank', 'bm25(1.0, 0.0)')",
+
+    f"""CREATE TRIGGER {TABELA}_odgovor_ai AFTER INSERT ON checklist_odgovor WHEN NEW.odgovor <> '' BEGIN
+        INSERT INTO {TABELA}(rowid, besedilo, kljuci)
+        SELECT NEW.id * 4, NEW.odgovor, 'v0 p' || hex(projekt_id) FROM checklist_serijskastevilka WHERE id = NEW.serijska_stevilka_id;
+    END""",
+    f"""CREATE TRIGGER {TABELA}_odgovor_au AFTER UPDATE OF odgovor, serijska_stevilka_id ON checklist_odgovor BEGIN
+        DELETE FROM {TABELA} WHERE rowid = OLD.id * 4;
+        INSERT INTO {TABELA}(rowid, besedilo, kljuci)
+        SELECT NEW.id * 4, NEW.odgovor, 'v0 p' || hex(projekt_id) FROM checklist_serijskastevilka
+        WHERE id = NEW.serijska_stevilka_id AND NEW.odgovor <> '';
+    END""",
+    f"""CREATE TRIGGER {TABELA}_odgovor_ad AFTER DELETE ON checklist_odgovor BEGIN
+        DELETE FROM {TABELA} WHERE rowid = OLD.id * 4;
+    END""",
+
+    f"""CREATE TRIGGER {TABELA}_vprasanje_ai AFTER INSERT ON checklist_vprasanje BEGIN
+        INSERT INTO {TABELA}(rowid, besedilo, kljuci) VALUES (NEW.id * 4 + 1, NEW.vprasanje || ' ' || NEW.opis, 'v1');
+    END""",
+    f"""CREATE TRIGGER {TABELA}_vprasanje_au AFTER UPDATE OF vprasanje, opis ON checklist_vprasanje BEGIN
+        DELETE FROM {TABELA} WHERE rowid = OLD.id * 4 + 1;
+        INSERT INTO {TABELA}(rowid, besedilo, kljuci) VALUES (NEW.id * 4 + 1, NEW.vprasanje || ' ' || NEW.opis, 'v1');
+    END""",
+    f"""CREATE TRIGGER {TABELA}_vprasanje_ad AFTER DELETE ON checklist_vprasanje BEGIN
+        DELETE FROM {TABELA} WHERE rowid = OLD.id * 4 + 1;
+    END""",
+
+    f"""CREATE TRIGGER {TABELA}_serijska_ai AFTER INSERT ON checklist_serijskastevilka BEGIN
+        INSERT INTO {TABELA}(rowid, besedilo, kljuci) VALUES (NEW.id * 4 + 2, NEW.stevilka, 'v2 p' || hex(NEW.projekt_id));
+    END""",
+    f"""CREATE TRIGGER {TABELA}_serijska_au AFTER UPDATE OF stevilka, projekt_id ON checklist_serijskastevilka BEGIN
+        DELETE FROM {TABELA} WHERE rowid = OLD.id * 4 + 2;
+        INSERT INTO {TABELA}(rowid, besedilo, kljuci) VALUES (NEW.id * 4 + 2, NEW.stevilka, 'v2 p' || hex(NEW.projekt_id));
+    END""",
+    f"""CREATE TRIGGER {TABELA}_serijska_ad AFTER DELETE ON checklist_serijskastevilka BEGIN
+        DELETE FROM {TABELA} WHERE rowid = OLD.id * 4 + 2;
+    END""",
+
+    # Projekt ima besedilni primarni ključ, zato v indeksu nosi rowid vrstice projekta
+    f"""CREATE TRIGGER {TABELA}_projekt_ai AFTER INSERT ON checklist_projekt BEGIN
+        INSERT INTO {TABELA}(rowid, besedilo, kljuci) VALUES (NEW.rowid * 4 + 3, NEW.id || ' ' || NEW.osebna_stevilka, 'v3 p' || hex(NEW.id));
+    END""",
+    f"""CREATE TRIGGER {TABELA}_projekt_au AFTER UPDATE OF id, osebna_stevilka ON checklist_projekt BEGIN
+        DELETE FROM {TABELA} WHERE rowid = OLD.rowid * 4 + 3;
+        INSERT INTO {TABELA}(rowid, besedilo, kljuci) VALUES (NEW.rowid * 4 + 3, NEW.id || ' ' || NEW.osebna_stevilka, 'v3 p' || hex(NEW.id));
+    END""",
+    f"""CREATE TRIGGER {TABELA}_projekt_ad AFTER DELETE ON checklist_projekt BEGIN
+        DELETE FROM {TABELA} WHERE rowid = OLD.rowid * 4 + 3;
+    END""",
+]
+
+# Kopija checklist.search.SQL_GRADNJE ob času te migracije
+NAPOLNI = [
+    f"""INSERT INTO {TABELA}(rowid, besedilo, kljuci)
+        SELECT o.id * 4, o.odgovor, 'v0 p' || hex(s.projekt_id)
+        FROM checklist_odgovor o JOIN checklist_serijskastevilka s ON s.id = o.serijska_stevilka_id
+        WHERE o.odgovor <> ''""",
+    f"""INSERT INTO {TABELA}(rowid, besedilo, kljuci)
+        SELECT id * 4 + 1, vprasanje || ' ' || opis, 'v1' FROM checklist_vprasanje""",
+    f"""INSERT INTO {TABELA}(rowid, besedilo, kljuci)
+        SELECT id * 4 + 2, stevilka, 'v2 p' || hex(projekt_id) FROM checklist_serijskastevilka""",
+    f"""INSERT INTO {TABELA}(rowid, besedilo, kljuci)
+        SELECT rowid * 4 + 3, id || ' ' || osebna_stevilka, 'v3 p' || hex(id) FROM checklist_projekt""",
+    f"INSERT INTO {TABELA}({TABELA}) VALUES('optimize')",
+]
+
+ODSTRANI = [
+    f'DROP TRIGGER IF EXISTS {TABELA}_{entiteta}_{dogodek}'
+    for entiteta in ('odgovor', 'vprasanje', 'serijska', 'projekt')
+    for dogodek in ('ai', 'au', 'ad')
+] + [f'DROP TABLE IF EXISTS {TABELA}']
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('checklist', '0005_napredek'),
+    ]
+
+    operations = [
+        migrations.RunSQL(USTVARI + NAPOLNI, reverse_sql=ODSTRANI),
+    ]
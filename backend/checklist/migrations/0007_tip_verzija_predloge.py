@@ -0,0 +1,19 @@
+# Generated by Django 5.0.3 on 2026-10-18 08:11
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('checklist', '0006_iskanje'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tip',
+            name='verzija_predloge',
+            field=models.UUIDField(default=uuid.uuid4, editable=False),
+        ),
+    ]
@@ -0,0 +1,83 @@
+import hashlib
+import json
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .optimization import apply_plan, serializer_plan
+
+
+class ConditionalListMixin:
+    """Seznam z ``ETag`` in ``Last-Modified``; ob ``If-None-Match`` vrne 304.
+
+    Podpis seznama je število vrstic in največji ``updated_at`` filtriranega
+    querysetu, izračunan z eno agregatno poizvedbo brez serializacije. Vgnezdene
+    podatke iz povezanih modelov naštejemo v ``etag_povezave`` (npr.
+    ``('projekt_tipi', 'projekt_tipi__tip')``), da tudi njihove spremembe
+    spremenijo podpis.
+    """
+    etag_povezave = ()
+
+    def list_signature(self):
+        """Vrni (podpis, zadnja sprememba) za trenutni seznam."""
+        queryset = self.filter_queryset(self.get_queryset()).order_by()
+        agregati = {'st': Count('pk', distinct=bool(self.etag_povezave)), 'zadnja': Max('updated_at')}
+        for i, pot in enumerate(self.etag_povezave):
+            agregati[f'st_{i}'] = Count(pot, distinct=True)
+            agregati[f'zadnja_{i}'] = Max(f'{pot}__updated_at')
+        podpis = queryset.aggregate(**agregati)
+        zadnje = [v for k, v in podpis.items() if k.startswith('zadnja') and v is not None]
+        return podpis, max(zadnje, default=None)
+
+    def conditional_response(self, request, izdelaj, podpis, zadnja_sprememba):
+        """Vrni 304, če ima odjemalec veljavno kopijo, sicer odgovor iz ``izdelaj()``."""
+        # Isti podpis pri drugem URL-ju (filtri, stran) ali formatu ni isti odgovor
+        etag = '"%s"' % hashlib.md5(json.dumps(
+            [request.get_full_path(), request.accepted_renderer.format, podpis],
+            default=str, sort_keys=True
+        ).encode()).hexdigest()
+        last_modified = int(zadnja_sprememba.timestamp()) if zadnja_sprememba else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = izdelaj()
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        # Brskalnik sme hraniti kopijo, a jo mora pred uporabo preveriti
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        podpis, zadnja_sprememba = self.list_signature()
+        return self.conditional_response(
+            request, lambda: super(ConditionalListMixin, self).list(request, *args, **kwargs),
+            podpis, zadnja_sprememba
+        )
+
+
+class OptimizedQuerysetMixin:
+    """Uporabi select_related/prefetch_related/only() glede na akcijo.
+
+    Za ``list`` in ``retrieve`` se načrt izpelje iz serializerja akcije (glej
+    ``optimization.serializer_plan``), zato vgnezdeni serializerji ne izvajajo
+    poizvedb po vrsticah. Druge akcije, ki berejo povezane objekte, načrt
+    navedejo v ``optimizacija``, npr.
+    ``{'destroy': {'select_related': ('serijska_stevilka',)}}``; naveden načrt
+    ima prednost tudi pred izpeljanim. ViewSet v ``get_queryset`` le filtrira,
+    načrt se doda v ``filter_queryset``, ki ga uporabljata seznam in
+    ``get_object``.
+    """
+    optimizacija = {}
+    akcije_iz_serializerja = ('list', 'retrieve')
+
+    def optimize_queryset(self, queryset):
+        if self.action in self.optimizacija:
+            return apply_plan(queryset, self.optimizacija[self.action])
+        if self.action in self.akcije_iz_serializerja:
+            return apply_plan(queryset, serializer_plan(self.get_serializer_class()))
+        return queryset
+
+    def filter_queryset(self, queryset):
+        return self.optimize_queryset(super().filter_queryset(queryset))
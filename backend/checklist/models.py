@@ -1,3 +1,6 @@
+import re
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User
 
@@ -6,6 +9,8 @@ from django.contrib.auth.models import User
 class Tip(models.Model):
     naziv = models.CharField(max_length=100)
     nastavitve_segmentov = models.JSONField(default=dict, blank=True)
+    # Žeton verzije predloge (segmenti in vprašanja), glej template_cache
+    verzija_predloge = models.UUIDField(default=uuid.uuid4, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -91,6 +96,42 @@ class Odgovor(models.Model):
     def __str__(self):
         return f"{self.vprasanje.vprasanje[:50]}... - {self.odgovor[:50]}..."
 
+    class Meta:
+        unique_together = ('vprasanje', 'serijska_stevilka')
+
+class NapredekSerijske(models.Model):
+    """Števci izpolnjenosti kontrolnega seznama ene serijske številke.
+
+    Šteje le odgovore z nepraznim besedilom na vprašanja tipa serijske
+    številke. Vzdržuje jih ``checklist.progress`` ob zapisu odgovorov,
+    ``recompute_progress`` jih izračuna znova.
+    """
+    serijska_stevilka = models.OneToOneField(
+        SerijskaStevilka, related_name='napredek', primary_key=True, on_delete=models.CASCADE
+    )
+    projekt = models.ForeignKey(Projekt, related_name='napredek_serijskih', on_delete=models.CASCADE)
+    odgovorjeni = models.PositiveIntegerField(default=0)
+    odgovorjeni_obvezni = models.PositiveIntegerField(default=0)
+    vsa_obvezna = models.PositiveIntegerField(default=0)
+    zadnja_aktivnost = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.serijska_stevilka_id}: {self.odgovorjeni_obvezni}/{self.vsa_obvezna}"
+
+class NapredekProjekta(models.Model):
+    """Vsota števcev NapredekSerijske vseh serijskih številk projekta."""
+    projekt = models.OneToOneField(Projekt, related_name='napredek', primary_key=True, on_delete=models.CASCADE)
+    serijske_stevilke = models.PositiveIntegerField(default=0)
+    odgovorjeni = models.PositiveIntegerField(default=0)
+    odgovorjeni_obvezni = models.PositiveIntegerField(default=0)
+    vsa_obvezna = models.PositiveIntegerField(default=0)
+    zadnja_aktivnost = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.projekt_id}: {self.odgovorjeni_obvezni}/{self.vsa_obvezna}"
+
 class Nastavitev(models.Model):
     TIPI_NASTAVITEV = [
         ('tema', 'Tema'),
@@ -118,6 +159,47 @@ class Profil(models.Model):
     def __str__(self):
         return self.naziv
 
+ENTITETE_SPREMEMB = [
+    ('projekt', 'Projekt'),
+    ('serijska_stevilka', 'Serijska številka'),
+    ('odgovor', 'Odgovor'),
+]
+
+# Znane pripone dejanj v nizih sprememb, npr. "projekt_{id}_uvoz"
+AKCIJE_SPREMEMB = ('uvoz',)
+
+
+def razcleni_spremembo(sprememba):
+    """Iz niza spremembe (npr. 'projekt_P1_uvoz', 'odgovor_12') razberi (entity_type, entity_id)."""
+    for entity_type, _ in sorted(ENTITETE_SPREMEMB, key=lambda e: -len(e[0])):
+        predpona = f'{entity_type}_'
+        if not sprememba.startswith(predpona):
+            continue
+        ostanek = sprememba[len(predpona):]
+        if entity_type == 'projekt':
+            for akcija in AKCIJE_SPREMEMB:
+                if ostanek.endswith(f'_{akcija}'):
+                    ostanek = ostanek[:-len(akcija) - 1]
+            return entity_type, ostanek
+        stevilka = re.match(r'\d+', ostanek)
+        if stevilka:
+            return entity_type, stevilka.group()
+    return '', ''
+
+
+def projekt_entitete(entity_type, entity_id):
+    """Vrni projekt, ki mu pripada entiteta spremembe, ali None (ena poizvedba)."""
+    if entity_type == 'projekt':
+        return Projekt.objects.filter(id=entity_id).first()
+    if not str(entity_id).isdigit():
+        return None
+    if entity_type == 'serijska_stevilka':
+        return Projekt.objects.filter(serijske_stevilke__id=entity_id).first()
+    if entity_type == 'odgovor':
+        return Projekt.objects.filter(serijske_stevilke__odgovori__id=entity_id).first()
+    return None
+
+
 class LogSprememb(models.Model):
     id = models.AutoField(primary_key=True)
     cas = models.DateTimeField(auto_now_add=True)
@@ -125,6 +207,54 @@ class LogSprememb(models.Model):
     sprememba = models.CharField(max_length=200)
     stara_vrednost = models.TextField(blank=True, null=True)
     nova_vrednost = models.TextField(blank=True, null=True)
+    entity_type = models.CharField(max_length=30, choices=ENTITETE_SPREMEMB, blank=True, default='')
+    entity_id = models.CharField(max_length=50, blank=True, default='')
+    projekt = models.ForeignKey(
+        Projekt, related_name='spremembe', null=True, blank=True,
+        on_delete=models.SET_NULL, db_index=False
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['entity_type', 'entity_id', 'cas'], name='log_entiteta_cas_idx'),
+            models.Index(fields=['projekt', 'entity_type', 'cas'], name='log_projekt_cas_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Strukturirana polja izpolnimo iz niza spremembe, če jih klicatelj ni podal;
+        # projekt poda klicatelj, ki ga že ima (glej projekt_entitete)
+        if not self.entity_type:
+            self.entity_type, self.entity_id = razcleni_spremembo(self.sprememba)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.cas} - {self.uporabnik.username} - {self.sprememba}"
+
+class IzvozniPosel(models.Model):
+    FORMATI = [
+        ('xlsx', 'XLSX'),
+        ('pdf', 'PDF'),
+        ('archive', 'Arhiv JSON'),
+    ]
+    STATUSI = [
+        ('cakajoc', 'Čaka'),
+        ('v_teku', 'V teku'),
+        ('koncan', 'Končan'),
+        ('napaka', 'Napaka'),
+    ]
+
+    id = models.AutoField(primary_key=True)
+    projekt = models.ForeignKey(Projekt, related_name='izvozi', on_delete=models.CASCADE)
+    uporabnik = models.ForeignKey(User, on_delete=models.CASCADE)
+    format = models.CharField(max_length=20, choices=FORMATI)
+    status = models.CharField(max_length=20, choices=STATUSI, default='cakajoc')
+    napredek = models.PositiveSmallIntegerField(default=0)  # v odstotkih
+    datoteka = models.FileField(upload_to='izvozi/', blank=True)
+    ime_datoteke = models.CharField(max_length=255, blank=True)
+    napaka = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    koncano_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.projekt_id} - {self.format} ({self.status})"
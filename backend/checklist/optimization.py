@@ -0,0 +1,129 @@
+"""Optimizacija querysetov iz drevesa serializerja.
+
+Iz polj ModelSerializerja izpeljemo načrt: ``select_related`` za poti skozi
+tuje ključe (npr. ``source='tip.naziv'``) in vgnezdene serializerje enega
+povezanega objekta, ``Prefetch`` z že optimiziranim querysetom za vgnezdene
+serializerje z ``many=True`` in ``only()`` s stolpci, ki jih serializer
+dejansko bere. Tako serializacija seznama ali posameznega
+objekta izvede stalno število poizvedb, ne glede na število vrstic.
+
+Načrt je slovar s ključi ``select_related``, ``prefetch_related`` in ``only``
+(``None`` pomeni vse stolpce). Enako obliko uporablja ``optimizacija`` na
+ViewSetih za akcije, ki jih serializer ne opiše.
+"""
+import copy
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+def _polje_modela(model, ime):
+    try:
+        return model._meta.get_field(ime)
+    except FieldDoesNotExist:
+        return None
+
+
+def _pot_skozi_kljuce(model, pot, nacrt):
+    """Dodaj select_related in only za ``pot`` (npr. ``['tip', 'naziv']``).
+
+    Vrne False, če pot ne gre le skozi tuje ključe do stolpca modela.
+    """
+    relacije = []
+    for i, ime in enumerate(pot):
+        polje = _polje_modela(model, ime)
+        if polje is None:
+            return False
+        if i == len(pot) - 1:
+            if not polje.concrete:
+                return False
+            stolpec = '__'.join(relacije + [ime])
+            if polje.is_relation and i > 0:
+                # Serializer bo bral povezan objekt, zato ga naložimo cel
+                nacrt['select_related'].append(stolpec)
+                nacrt['only'] = None
+            elif nacrt['only'] is not None:
+                nacrt['only'].add(stolpec)
+            break
+        if not (polje.many_to_one or polje.one_to_one) or not polje.concrete:
+            return False
+        if nacrt['only'] is not None:
+            # Ključ, po katerem se spusti select_related, ne sme biti odložen
+            nacrt['only'].add('__'.join(relacije + [ime]))
+        relacije.append(ime)
+        model = polje.related_model
+    if relacije:
+        nacrt['select_related'].append('__'.join(relacije))
+    return True
+
+
+def serializer_plan(serializer):
+    """Vrni načrt optimizacije za razred ali primerek ModelSerializerja."""
+    if isinstance(serializer, type):
+        serializer = serializer()
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    model = serializer.Meta.model
+    nacrt = {'select_related': [], 'prefetch_related': [], 'only': {model._meta.pk.name}}
+
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if field.source == '*' or isinstance(field, serializers.SerializerMethodField):
+            # Polje dobi cel objekt, zato ne vemo, katere stolpce bere
+            nacrt['only'] = None
+            continue
+
+        pot = field.source.split('.')
+        if isinstance(field, serializers.ListSerializer) and isinstance(field.child, serializers.ModelSerializer):
+            relacija = _polje_modela(model, pot[0])
+            if len(pot) == 1 and relacija is not None and relacija.one_to_many:
+                otrok = serializer_plan(field.child)
+                if otrok['only'] is not None:
+                    # Po tem ključu se naložene vrstice razdelijo med starše
+                    otrok['only'].add(relacija.field.name)
+                nacrt['prefetch_related'].append(Prefetch(
+                    field.source, queryset=apply_plan(relacija.related_model._default_manager.all(), otrok)
+                ))
+                continue
+        elif isinstance(field, serializers.ModelSerializer):
+            relacija = _polje_modela(model, pot[0])
+            if len(pot) == 1 and relacija is not None and (relacija.many_to_one or relacija.one_to_one):
+                otrok = serializer_plan(field)
+                if not otrok['prefetch_related']:
+                    # En povezan objekt se naloži s stikom v isti poizvedbi
+                    nacrt['select_related'] += [field.source] + [
+                        f'{field.source}__{pot_otroka}' for pot_otroka in otrok['select_related']
+                    ]
+                    if otrok['only'] is None:
+                        nacrt['only'] = None
+                    elif nacrt['only'] is not None:
+                        if relacija.concrete:
+                            nacrt['only'].add(field.source)
+                        nacrt['only'].update(f'{field.source}__{stolpec}' for stolpec in otrok['only'])
+                    continue
+        elif isinstance(field, serializers.ManyRelatedField):
+            relacija = _polje_modela(model, pot[0])
+            if len(pot) == 1 and relacija is not None and relacija.is_relation:
+                nacrt['prefetch_related'].append(field.source)
+                continue
+        elif not isinstance(field, serializers.BaseSerializer) and _pot_skozi_kljuce(model, pot, nacrt):
+            continue
+
+        # Oblike, ki je ne znamo opisati, serializer bere iz celega objekta
+        nacrt['only'] = None
+    return nacrt
+
+
+def apply_plan(queryset, nacrt):
+    """Uporabi načrt optimizacije na querysetu."""
+    if nacrt.get('select_related'):
+        queryset = queryset.select_related(*nacrt['select_related'])
+    if nacrt.get('prefetch_related'):
+        # Django med prefetchom spreminja queryset v Prefetch (namigi za usmerjevalnik),
+        # zato načrtov, navedenih na razredu, ne delimo med zahtevami
+        queryset = queryset.prefetch_related(*copy.deepcopy(nacrt['prefetch_related']))
+    if nacrt.get('only') is not None:
+        queryset = queryset.only(*sorted(nacrt['only']))
+    return queryset
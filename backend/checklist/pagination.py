@@ -0,0 +1,41 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+def is_unpaginated(request):
+    """Ali odjemalec zahteva celoten seznam.
+
+    Paginacija je na zahtevo: seznam se paginira le, če odjemalec poda
+    ``?page_size=`` ali ``?cursor=``; ``?paginate=false`` vedno vrne celoten seznam.
+    """
+    if request.query_params.get('paginate', '').lower() in ('false', '0'):
+        return True
+    return 'page_size' not in request.query_params and 'cursor' not in request.query_params
+
+
+class KeysetPagination(CursorPagination):
+    """Kazalčna (keyset) paginacija po indeksiranem stolpcu.
+
+    Vrstni red določa atribut ``pagination_ordering`` ViewSet-a (privzeto ``id``),
+    velikost strani pa ``?page_size=`` do ``max_page_size``. Brez ``?page_size=``
+    in ``?cursor=`` odjemalec dobi celoten nepaginiran seznam kot doslej.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    ordering = 'id'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if is_unpaginated(request):
+            return None
+        self.ordering = getattr(view, 'pagination_ordering', self.ordering)
+        return super().paginate_queryset(queryset, request, view)
+
+
+class SearchPagination(PageNumberPagination):
+    """Paginacija zadetkov iskanja po številki strani.
+
+    Zadetki so razvrščeni po relevantnosti, ki nima stabilnega ključa za
+    kazalec, zato se strani berejo z LIMIT/OFFSET (``?page=`` in ``?page_size=``).
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
@@ -0,0 +1,312 @@
+"""Izris PDF poročila kontrolnega seznama.
+
+Modul ne uvaža Djanga, zato ga lahko uporabljajo tudi procesi v bazenu, ki
+vzporedno izrisujejo dele poročila. Podatki prihajajo kot navadni seznami:
+
+- ``glava``: slovar s ključi ``projekt``, ``osebna_stevilka``, ``datum`` in
+  ``stevilo_ponovitev``,
+- ``sekcije``: seznam ``(serijska_stevilka, [(segment, [(vprasanje, odgovor, datum), ...]), ...])``.
+"""
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:  # brez pypdf se poročilo vedno izriše v enem procesu
+    PdfReader = PdfWriter = None
+
+logger = logging.getLogger(__name__)
+
+SIRINE_STOLPCEV = [100, 220, 80, 100]
+ODMIK_CELICE = 5
+
+# Registracija pisave DejaVu, ki podpira slovenske znake
+FONT_PATH = os.path.join(os.path.dirname(__file__), 'fonts', 'DejaVuSans.ttf')
+
+_bazen = None
+_bazen_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def registriraj_pisavo():
+    """Registriraj pisavo DejaVu enkrat na proces (branje TTF datoteke je drago)."""
+    pdfmetrics.registerFont(TTFont('DejaVu', FONT_PATH))
+
+
+@lru_cache(maxsize=None)
+def _stili():
+    """Pripravi stile odstavkov in tabel enkrat na proces."""
+    registriraj_pisavo()
+
+    styles = getSampleStyleSheet()
+    styles.add(ParagraphStyle(
+        name='NaslovSlovenski',
+        fontName='DejaVu',
+        fontSize=16,
+        spaceAfter=20,
+        alignment=1,  # Center
+        leading=20
+    ))
+    styles.add(ParagraphStyle(
+        name='PodnaslovSlovenski',
+        fontName='DejaVu',
+        fontSize=12,
+        spaceAfter=10,
+        alignment=1,  # Center
+        leading=16
+    ))
+    styles.add(ParagraphStyle(
+        name='NormalSlovenski',
+        fontName='DejaVu',
+        fontSize=10,
+        spaceAfter=5,
+        leading=14
+    ))
+    styles.add(ParagraphStyle(
+        name='TabelaGlava',
+        fontName='DejaVu',
+        fontSize=9,
+        textColor=colors.white,
+        alignment=1,  # Center
+        leading=12
+    ))
+    styles.add(ParagraphStyle(
+        name='TabelaVsebina',
+        fontName='DejaVu',
+        fontSize=9,
+        alignment=0,  # Left
+        leading=12
+    ))
+
+    stil_podatkov = TableStyle([
+        ('FONT', (0, 0), (-1, -1), 'DejaVu'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('TOPPADDING', (0, 0), (-1, -1), 5),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
+    ])
+    stil_tabele = TableStyle([
+        ('FONT', (0, 0), (-1, -1), 'DejaVu'),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+        ('BOX', (0, 0), (-1, -1), 1, colors.black),
+        ('TOPPADDING', (0, 0), (-1, -1), 5),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
+        ('LEFTPADDING', (0, 0), (-1, -1), 5),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 5),
+    ])
+    # Navadni nizi nimajo sloga odstavka, zato razmik vrstic in poravnavo glave
+    # nastavimo v tabeli, da je izpis enak kot s Paragraph
+    stil_hitre_tabele = TableStyle(stil_tabele.getCommands() + [
+        ('LEADING', (0, 0), (-1, -1), 12),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+    ])
+    return styles, stil_podatkov, stil_tabele, stil_hitre_tabele
+
+
+def _elementi_glave(glava):
+    styles, stil_podatkov, _, _ = _stili()
+    elements = [
+        Paragraph('Kontrolni seznam', styles['NaslovSlovenski']),
+        Paragraph(f"Projekt: {glava['projekt']}", styles['PodnaslovSlovenski']),
+    ]
+
+    # Podatki o projektu v tabeli
+    podatki_projekta = [
+        ['Osebna številka:', glava['osebna_stevilka'], 'Datum:', glava['datum']],
+        ['Število ponovitev:', glava['stevilo_ponovitev'], 'Ime in priimek:', '_' * 20],
+        ['', '', 'Podpis:', '_' * 20]
+    ]
+    t_podatki = Table(podatki_projekta, colWidths=[100, 150, 100, 150])
+    t_podatki.setStyle(stil_podatkov)
+    elements.append(t_podatki)
+    elements.append(Spacer(1, 20))
+    return elements
+
+
+def _elementi_sekcije(stevilka, segmenti):
+    styles, _, stil_tabele, _ = _stili()
+    glava, vsebina = styles['TabelaGlava'], styles['TabelaVsebina']
+    elements = [Paragraph(f'Serijska številka: {stevilka}', styles['PodnaslovSlovenski'])]
+
+    # Za vsak segment
+    for segment, vrstice in segmenti:
+        table_data = [[
+            Paragraph('Segment', glava),
+            Paragraph('Vprašanje', glava),
+            Paragraph('Odgovor', glava),
+            Paragraph('Datum odgovora', glava)
+        ]]
+        for i, (vprasanje, odgovor, datum) in enumerate(vrstice):
+            # Dodaj segment samo prvič ko se pojavi
+            table_data.append([
+                Paragraph(segment if i == 0 else '', vsebina),
+                Paragraph(vprasanje, vsebina),
+                Paragraph(odgovor, vsebina),
+                Paragraph(datum, vsebina)
+            ])
+
+        t = Table(table_data, colWidths=SIRINE_STOLPCEV)
+        t.setStyle(stil_tabele)
+        elements.append(t)
+        elements.append(Spacer(1, 15))
+
+    elements.append(Spacer(1, 20))
+    return elements
+
+
+@lru_cache(maxsize=20000)
+def _prelomi(besedilo, stolpec):
+    """Prelomi besedilo v vrstice za dani stolpec tabele.
+
+    Predpomnjeno, ker se ista vprašanja in odgovori ponovijo pri vsaki serijski
+    številki. Kratko besedilo ostane nespremenjeno.
+    """
+    sirina = SIRINE_STOLPCEV[stolpec] - 2 * ODMIK_CELICE
+    if pdfmetrics.stringWidth(besedilo, 'DejaVu', 9) <= sirina:
+        return besedilo
+    return '\n'.join(simpleSplit(besedilo, 'DejaVu', 9, sirina))
+
+
+def _elementi_sekcije_hitro(stevilka, segmenti):
+    styles, _, _, stil_hitre_tabele = _stili()
+    elements = [Paragraph(f'Serijska številka: {stevilka}', styles['PodnaslovSlovenski'])]
+
+    # Vsi segmenti serijske številke v eni tabeli, ločeni z debelejšo črto
+    table_data = [['Segment', 'Vprašanje', 'Odgovor', 'Datum odgovora']]
+    meje_segmentov = []
+    for segment, vrstice in segmenti:
+        if len(table_data) > 1 and vrstice:
+            meje_segmentov.append(('LINEABOVE', (0, len(table_data)), (-1, len(table_data)), 1, colors.black))
+        for i, (vprasanje, odgovor, datum) in enumerate(vrstice):
+            table_data.append([
+                _prelomi(segment, 0) if i == 0 else '',
+                _prelomi(vprasanje, 1),
+                _prelomi(odgovor, 2),
+                datum
+            ])
+
+    t = Table(table_data, colWidths=SIRINE_STOLPCEV, repeatRows=1)
+    t.setStyle(stil_hitre_tabele)
+    if meje_segmentov:
+        t.setStyle(TableStyle(meje_segmentov))
+    elements.append(t)
+    elements.append(Spacer(1, 20))
+    return elements
+
+
+def _elementi_serijske(nacin, stevilka, segmenti):
+    if nacin == 'hitro':
+        return _elementi_sekcije_hitro(stevilka, segmenti)
+    return _elementi_sekcije(stevilka, segmenti)
+
+
+def _zgradi(out, elements):
+    doc = SimpleDocTemplate(
+        out,
+        pagesize=A4,
+        rightMargin=30,
+        leftMargin=30,
+        topMargin=30,
+        bottomMargin=30
+    )
+    doc.build(elements)
+
+
+def render_part(glava, sekcije, nacin='natancno'):
+    """Izriši del poročila (glavo le v prvem delu) in vrni vsebino PDF."""
+    elements = _elementi_glave(glava) if glava is not None else []
+    for stevilka, segmenti in sekcije:
+        elements.extend(_elementi_serijske(nacin, stevilka, segmenti))
+    out = io.BytesIO()
+    _zgradi(out, elements)
+    return out.getvalue()
+
+
+def _get_bazen(workers):
+    global _bazen
+    with _bazen_lock:
+        if _bazen is None:
+            # spawn: delavci ne podedujejo povezav na bazo ali niti strežnika
+            _bazen = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_stili
+            )
+    return _bazen
+
+
+def _ponastavi_bazen():
+    global _bazen
+    with _bazen_lock:
+        if _bazen is not None:
+            _bazen.shutdown(wait=False, cancel_futures=True)
+            _bazen = None
+
+
+def _izrisi_vzporedno(glava, sekcije, nacin, workers, velikost_dela, progress):
+    deli = [sekcije[i:i + velikost_dela] for i in range(0, len(sekcije), velikost_dela)]
+    bazen = _get_bazen(workers)
+    futures = {
+        bazen.submit(render_part, glava if i == 0 else None, del_, nacin): i
+        for i, del_ in enumerate(deli)
+    }
+    izrisani = [None] * len(deli)
+    for n, future in enumerate(as_completed(futures)):
+        izrisani[futures[future]] = future.result()
+        progress(0.9 * (n + 1) / len(deli))
+
+    # Združi strani delov v en dokument v prvotnem vrstnem redu
+    writer = PdfWriter()
+    for vsebina in izrisani:
+        writer.append(PdfReader(io.BytesIO(vsebina)))
+    return writer
+
+
+def render_report(glava, sekcije, out, nacin='natancno', workers=1, velikost_dela=20, progress=None):
+    """Izriši celotno poročilo v ``out`` v načinu ``hitro`` ali ``natancno``.
+
+    Pri več kot enem delavcu se serijske številke razdelijo na dele po
+    ``velikost_dela``, ki jih vzporedno izrišejo procesi v bazenu, strani pa
+    se nato združijo. Vsak del se začne na novi strani.
+    """
+    progress = progress or (lambda delez: None)
+
+    if workers > 1 and PdfWriter is not None and len(sekcije) > velikost_dela:
+        try:
+            writer = _izrisi_vzporedno(glava, sekcije, nacin, workers, velikost_dela, progress)
+        except BrokenProcessPool:
+            logger.exception("Bazen za izris PDF se je sesul, izrišem v enem procesu")
+            _ponastavi_bazen()
+        else:
+            writer.write(out)
+            progress(1.0)
+            return
+
+    elements = _elementi_glave(glava)
+    for n, (stevilka, segmenti) in enumerate(sekcije):
+        elements.extend(_elementi_serijske(nacin, stevilka, segmenti))
+        progress(0.3 * (n + 1) / len(sekcije))
+    _zgradi(out, elements)
+    progress(1.0)
@@ -0,0 +1,199 @@
+"""Števci izpolnjenosti po serijskih številkah in projektih.
+
+NapredekSerijske hrani število odgovorov z nepraznim besedilom na vprašanja
+tipa serijske številke, koliko od teh je na obvezna vprašanja, koliko
+obveznih vprašanj ima tip in čas zadnje spremembe odgovora. NapredekProjekta
+je vsota vrstic serijskih številk projekta, zato seznam projektov izpolnjenost
+prebere z enim stikom po primarnem ključu.
+
+Poti zapisa odgovorov kličejo ``apply_answer_changes`` v isti transakciji kot
+zapis; ta števce popravi za razliko in ne šteje odgovorov znova. Spremembe
+predloge, serijskih številk in uvozi kličejo ``recompute_progress``, ki števce
+izračuna iz odgovorov (tudi ukaz ``recompute_progress``).
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import NapredekProjekta, NapredekSerijske, Odgovor, Projekt, SerijskaStevilka
+from .template_cache import get_templates
+
+VELIKOST_KOSA = 400
+
+POLJA_STEVCEV = ('odgovorjeni', 'odgovorjeni_obvezni', 'vsa_obvezna')
+
+
+def _v_kosih(seznam, velikost=VELIKOST_KOSA):
+    for i in range(0, len(seznam), velikost):
+        yield seznam[i:i + velikost]
+
+
+def _vprasanja_tipov(tip_ids):
+    """Vrni tip_id -> (id-ji vseh vprašanj, id-ji obveznih vprašanj) iz predpomnilnika predlog."""
+    return {
+        tip_id: (
+            {vprasanje.id for vprasanje in predloga.vprasanja},
+            {vprasanje.id for vprasanje in predloga.vprasanja if vprasanje.obvezno},
+        )
+        for tip_id, predloga in get_templates(tip_ids).items()
+    }
+
+
+def _izracunaj_serijske(serijske, zdaj):
+    """Izračunaj in shrani števce za seznam (id, projekt_id, tip_id) serijskih številk."""
+    vprasanja = _vprasanja_tipov({tip_id for _, _, tip_id in serijske})
+    odgovorjen = ~Q(odgovor='') & Q(vprasanje__segment__tip_id=F('serijska_stevilka__projekt_tip__tip_id'))
+    agregati = {
+        vrstica['serijska_stevilka_id']: vrstica
+        for vrstica in Odgovor.objects.filter(
+            serijska_stevilka_id__in=[serijska_id for serijska_id, _, _ in serijske]
+        ).order_by().values('serijska_stevilka_id').annotate(
+            odgovorjeni=Count('id', filter=odgovorjen),
+            odgovorjeni_obvezni=Count('id', filter=odgovorjen & Q(vprasanje__obvezno=True)),
+            zadnja_aktivnost=Max('updated_at'),
+        )
+    }
+    vrstice = []
+    for serijska_id, projekt_id, tip_id in serijske:
+        agregat = agregati.get(serijska_id, {})
+        vrstice.append(NapredekSerijske(
+            serijska_stevilka_id=serijska_id,
+            projekt_id=projekt_id,
+            odgovorjeni=agregat.get('odgovorjeni', 0),
+            odgovorjeni_obvezni=agregat.get('odgovorjeni_obvezni', 0),
+            vsa_obvezna=len(vprasanja[tip_id][1]),
+            zadnja_aktivnost=agregat.get('zadnja_aktivnost'),
+            updated_at=zdaj,
+        ))
+    NapredekSerijske.objects.bulk_create(
+        vrstice,
+        update_conflicts=True,
+        unique_fields=['serijska_stevilka'],
+        update_fields=['projekt', *POLJA_STEVCEV, 'zadnja_aktivnost', 'updated_at'],
+    )
+
+
+def _zdruzi_projekte(projekt_ids, zdaj):
+    """Seštej vrstice serijskih številk v NapredekProjekta za podane projekte."""
+    for kos in _v_kosih(sorted(projekt_ids)):
+        vsote = Projekt.objects.filter(id__in=kos).values('id').annotate(
+            serijske_stevilke=Count('napredek_serijskih'),
+            zadnja_aktivnost=Max('napredek_serijskih__zadnja_aktivnost'),
+            **{polje: Coalesce(Sum(f'napredek_serijskih__{polje}'), 0) for polje in POLJA_STEVCEV},
+        )
+        NapredekProjekta.objects.bulk_create(
+            [
+                NapredekProjekta(projekt_id=vsota.pop('id'), updated_at=zdaj, **vsota)
+                for vsota in vsote
+            ],
+            update_conflicts=True,
+            unique_fields=['projekt'],
+            update_fields=['serijske_stevilke', *POLJA_STEVCEV, 'zadnja_aktivnost', 'updated_at'],
+        )
+
+
+def recompute_progress(projekt_ids=None, tip_ids=None, serijske_ids=None):
+    """Izračunaj števce izbranih serijskih številk iz odgovorov in jih seštej po projektih.
+
+    Brez filtrov se izračunajo vse. Vrne število izračunanih serijskih številk.
+    """
+    serijske = SerijskaStevilka.objects.order_by('id')
+    if projekt_ids is not None:
+        serijske = serijske.filter(projekt_id__in=projekt_ids)
+    if tip_ids is not None:
+        serijske = serijske.filter(projekt_tip__tip_id__in=tip_ids)
+    if serijske_ids is not None:
+        serijske = serijske.filter(id__in=serijske_ids)
+    serijske = serijske.values_list('id', 'projekt_id', 'projekt_tip__tip_id')
+
+    zdaj = timezone.now()
+    stevilo = 0
+    projekti = set(projekt_ids or ())
+    with transaction.atomic():
+        zadnji_id = 0
+        while True:
+            kos = list(serijske.filter(id__gt=zadnji_id)[:VELIKOST_KOSA])
+            if not kos:
+                break
+            zadnji_id = kos[-1][0]
+            _izracunaj_serijske(kos, zdaj)
+            projekti.update(projekt_id for _, projekt_id, _ in kos)
+            stevilo += len(kos)
+        if projekt_ids is None and tip_ids is None and serijske_ids is None:
+            projekti = Projekt.objects.values_list('id', flat=True)
+        _zdruzi_projekte(projekti, zdaj)
+    return stevilo
+
+
+def recompute_on_commit(projekt_id=None, tip_id=None):
+    """Ob potrditvi transakcije izračunaj števce projekta ali vseh serijskih številk tipa.
+
+    Ista zahteva se v eni transakciji izvede le enkrat, tudi če jo signali
+    sprožijo za vsako izbrisano vprašanje posebej.
+    """
+    kljuc = (projekt_id, tip_id)
+    povezava = transaction.get_connection()
+    if any(getattr(funkcija, 'napredek', None) == kljuc for _, funkcija, _ in povezava.run_on_commit):
+        return
+
+    def izracunaj():
+        recompute_progress(
+            projekt_ids=[projekt_id] if projekt_id is not None else None,
+            tip_ids=[tip_id] if tip_id is not None else None,
+        )
+
+    izracunaj.napredek = kljuc
+    transaction.on_commit(izracunaj)
+
+
+def apply_answer_changes(spremembe):
+    """Popravi števce za razliko, ki jo naredijo spremembe odgovorov.
+
+    ``spremembe`` so četverice (vprasanje_id, serijska_id, staro besedilo, novo
+    besedilo); None pomeni, da odgovora prej ni bilo oz. ga ni več. Klicati v
+    transakciji zapisa, po zapisu. Vrne množico id-jev projektov spremenjenih
+    serijskih številk.
+    """
+    zdaj = timezone.now()
+    serijske = {}
+    for kos in _v_kosih(sorted({serijska_id for _, serijska_id, _, _ in spremembe})):
+        for serijska_id, projekt_id, tip_id in SerijskaStevilka.objects.filter(id__in=kos).values_list(
+            'id', 'projekt_id', 'projekt_tip__tip_id'
+        ):
+            serijske[serijska_id] = (projekt_id, tip_id)
+    vprasanja = _vprasanja_tipov({tip_id for _, tip_id in serijske.values()})
+
+    razlike = defaultdict(lambda: [0, 0])
+    for vprasanje_id, serijska_id, staro, novo in spremembe:
+        if serijska_id not in serijske:
+            continue
+        vsa, obvezna = vprasanja[serijske[serijska_id][1]]
+        razlika = razlike[serijska_id]
+        if vprasanje_id in vsa:
+            razlika[0] += bool(novo) - bool(staro)
+            if vprasanje_id in obvezna:
+                razlika[1] += bool(novo) - bool(staro)
+
+    vrstice = {}
+    for kos in _v_kosih(sorted(razlike)):
+        vrstice.update((n.pk, n) for n in NapredekSerijske.objects.filter(pk__in=kos))
+    for serijska_id, vrstica in vrstice.items():
+        vrstica.odgovorjeni += razlike[serijska_id][0]
+        vrstica.odgovorjeni_obvezni += razlike[serijska_id][1]
+        vrstica.zadnja_aktivnost = zdaj
+        vrstica.updated_at = zdaj
+    NapredekSerijske.objects.bulk_update(
+        vrstice.values(), ['odgovorjeni', 'odgovorjeni_obvezni', 'zadnja_aktivnost', 'updated_at']
+    )
+
+    # Serijske številke brez vrstice (npr. pred prvim izračunom) preštejemo v celoti
+    manjkajoce = [(s, *serijske[s]) for s in sorted(razlike) if s not in vrstice]
+    for kos in _v_kosih(manjkajoce):
+        _izracunaj_serijske(kos, zdaj)
+
+    projekti = {serijske[serijska_id][0] for serijska_id in razlike}
+    _zdruzi_projekte(projekti, zdaj)
+    return projekti
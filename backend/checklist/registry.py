@@ -0,0 +1,68 @@
+"""Register izvoznikov in uvoznikov.
+
+Izvozniki in uvozniki potrebujejo težke knjižnice (pandas, openpyxl, reportlab),
+zato so tu navedeni le s potjo do funkcije in se uvozijo šele ob prvi uporabi.
+Delavec tako ob zagonu ne plača njihovega uvoza, dokler ne izvaža ali uvaža.
+"""
+from django.utils.module_loading import import_string
+
+from .archive import archive_filename
+
+# Izvozni format -> funkcija, ki zapiše izvoz v datoteki podoben objekt
+# s podpisom (projekt, out, progress)
+IZVOZNIKI = {
+    'xlsx': 'checklist.exporters.write_xlsx',
+    'pdf': 'checklist.exporters.render_pdf',
+    'archive': 'checklist.archive.write_archive',
+}
+
+# Uvozni format -> funkcija, ki uvozi datoteko
+UVOZNIKI = {
+    'predloga': 'checklist.importers.import_template_file',
+    'arhiv': 'checklist.importers.import_archive_file',
+}
+
+# Vzorčna predloga vprašanj za prenos, s podpisom (out)
+PREDLOGA = 'checklist.exporters.write_template_xlsx'
+
+# Načina izrisa tabel v PDF: 'hitro' (navadni nizi, ena tabela na serijsko
+# številko) in 'natancno' (Paragraph v vsaki celici)
+PDF_NACINI = ('hitro', 'natancno')
+
+
+class ExportError(Exception):
+    """Projekta ni mogoče izvoziti (npr. nima tipa ali serijskih številk)."""
+
+
+def get_exporter(format):
+    """Vrni funkcijo izvoznika za format; njen modul se uvozi ob prvem klicu."""
+    return import_string(IZVOZNIKI[format])
+
+
+def get_importer(format):
+    """Vrni funkcijo uvoznika za format; njen modul se uvozi ob prvem klicu."""
+    return import_string(UVOZNIKI[format])
+
+
+def get_template_writer():
+    """Vrni funkcijo, ki zapiše vzorčno predlogo vprašanj."""
+    return import_string(PREDLOGA)
+
+
+def _safe_filename(filename):
+    return "".join(c for c in filename if c.isalnum() or c in (' ', '-', '_', '.'))
+
+
+def xlsx_filename(projekt):
+    return _safe_filename(f"projekt_{projekt.id}_odgovori.xlsx")
+
+
+def pdf_filename(projekt):
+    return _safe_filename(f"projekt_{projekt.id}_odgovori.pdf")
+
+
+IMENA_DATOTEK = {
+    'xlsx': xlsx_filename,
+    'pdf': pdf_filename,
+    'archive': archive_filename,
+}
@@ -0,0 +1,165 @@
+"""Iskanje po besedilu projektov, serijskih številk, vprašanj in odgovorov.
+
+Indeks je virtualna tabela SQLite FTS5 ``checklist_iskanje`` s stolpcema
+``besedilo`` in ``kljuci``. Razčlenjevalnik ``unicode61 remove_diacritics 2``
+odstrani strešice, zato "poskodba" najde "poškodba" in obratno. Stolpec
+``kljuci`` ima besedi ``v<vrsta>`` in ``'p' || hex(projekt_id)``, zato filtra
+po vrsti in projektu tečeta po indeksu in ne bereta vsebine zadetkov, tudi
+pri pogostih besedah. Vrsto in id entitete nosi tudi rowid:
+``id * 4 + vrsta`` (za projekt se uporabi rowid vrstice projekta, ker je
+njegov ključ besedilo). Indeks vzdržujejo prožilci v bazi (migracija 0006),
+zato zajame tudi paketne zapise in kaskadna brisanja; ``rebuild_search_index``
+ga zgradi znova. VACUUM lahko preštevilči rowid projektov, zato po njem
+indeks zgradi znova.
+"""
+import re
+
+from django.db import connection, transaction
+from django.db.models import F
+
+from .models import Odgovor, Projekt, SerijskaStevilka, Vprasanje
+
+TABELA = 'checklist_iskanje'
+
+# Indeks v seznamu je ostanek rowid % 4
+VRSTE = ('odgovor', 'vprasanje', 'serijska_stevilka', 'projekt')
+
+# Nad toliko zadetki se bm25 ne računa za vse; strani so urejene od najnovejših
+MEJA_RANGIRANJA = 10000
+
+SQL_GRADNJE = [
+    f'DELETE FROM {TABELA}',
+    f"""INSERT INTO {TABELA}(rowid, besedilo, kljuci)
+        SELECT o.id * 4, o.odgovor, 'v0 p' || hex(s.projekt_id)
+        FROM checklist_odgovor o JOIN checklist_serijskastevilka s ON s.id = o.serijska_stevilka_id
+        WHERE o.odgovor <> ''""",
+    f"""INSERT INTO {TABELA}(rowid, besedilo, kljuci)
+        SELECT id * 4 + 1, vprasanje || ' ' || opis, 'v1' FROM checklist_vprasanje""",
+    f"""INSERT INTO {TABELA}(rowid, besedilo, kljuci)
+        SELECT id * 4 + 2, stevilka, 'v2 p' || hex(projekt_id) FROM checklist_serijskastevilka""",
+    f"""INSERT INTO {TABELA}(rowid, besedilo, kljuci)
+        SELECT rowid * 4 + 3, id || ' ' || osebna_stevilka, 'v3 p' || hex(id) FROM checklist_projekt""",
+    f"INSERT INTO {TABELA}({TABELA}) VALUES('optimize')",
+]
+
+
+def rebuild_search_index():
+    """Zgradi iskalni indeks znova iz tabel in ga strni. Vrne število vrstic indeksa."""
+    with transaction.atomic(), connection.cursor() as cursor:
+        for sql in SQL_GRADNJE:
+            cursor.execute(sql)
+        cursor.execute(f'SELECT count(*) FROM {TABELA}')
+        return cursor.fetchone()[0]
+
+
+def fts_query(besedilo):
+    """Pretvori vnos uporabnika v poizvedbo FTS5: vse besede, zadnja kot predpona.
+
+    Vsaka beseda je v narekovajih, zato operatorji in ločila iz vnosa ne morejo
+    pokvariti sintakse. Vrne None, če vnos nima nobene besede.
+    """
+    besede = re.findall(r'\w+', besedilo)
+    if not besede:
+        return None
+    return ' '.join(f'"{beseda}"' for beseda in besede) + '*'
+
+
+def _projekt_iz_kljucev(kljuci):
+    for beseda in kljuci.split():
+        if beseda.startswith('p'):
+            return bytes.fromhex(beseda[1:]).decode()
+    return None
+
+
+class SearchResults:
+    """Leni seznam zadetkov za Djangov Paginator.
+
+    ``count()`` prešteje zadetke, rezina pa prebere eno stran z LIMIT/OFFSET
+    in jo dopolni s podatki entitet (ena poizvedba na vrsto). Zadetki so
+    razvrščeni po bm25; pri več kot ``MEJA_RANGIRANJA`` zadetkih (pogoste
+    besede, npr. "da") pa od najnovejših, ker bi rangiranje prebralo vse.
+    """
+
+    def __init__(self, poizvedba, vrste=None, projekt_id=None):
+        izraz = f'besedilo : ({poizvedba})'
+        if vrste:
+            izraz += ' AND kljuci : (' + ' OR '.join(f'"v{VRSTE.index(vrsta)}"' for vrsta in vrste) + ')'
+        if projekt_id is not None:
+            izraz += f' AND kljuci : "p{projekt_id.encode().hex()}"'
+        self.izraz = izraz
+        self._stevilo = None
+
+    def count(self):
+        if self._stevilo is None:
+            with connection.cursor() as cursor:
+                cursor.execute(f'SELECT count(*) FROM {TABELA} WHERE {TABELA} MATCH %s', [self.izraz])
+                self._stevilo = cursor.fetchone()[0]
+        return self._stevilo
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, kos):
+        if not isinstance(kos, slice):
+            raise TypeError('SearchResults podpira le rezine')
+        zacetek = kos.start or 0
+        razvrstitev = 'rank' if self.count() <= MEJA_RANGIRANJA else 'rowid DESC'
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""SELECT rowid, kljuci, rank, snippet({TABELA}, 0, '«', '»', '…', 12)
+                    FROM {TABELA} WHERE {TABELA} MATCH %s ORDER BY {razvrstitev} LIMIT %s OFFSET %s""",
+                [self.izraz, kos.stop - zacetek, zacetek]
+            )
+            vrstice = cursor.fetchall()
+
+        zadetki = []
+        for rowid, kljuci, rang, izsek in vrstice:
+            projekt_id = _projekt_iz_kljucev(kljuci)
+            zadetki.append({
+                'vrsta': VRSTE[rowid % 4],
+                'id': projekt_id if rowid % 4 == 3 else rowid // 4,
+                'projekt_id': projekt_id,
+                'rang': round(-rang, 4),
+                'izsek': izsek,
+            })
+        _dopolni(zadetki)
+        return zadetki
+
+
+def _dopolni(zadetki):
+    """Dodaj zadetkom podatke, po katerih jih uporabnik prepozna."""
+    po_vrstah = {}
+    for zadetek in zadetki:
+        po_vrstah.setdefault(zadetek['vrsta'], []).append(zadetek)
+
+    if 'odgovor' in po_vrstah:
+        podatki = {o['id']: o for o in Odgovor.objects.filter(
+            id__in=[z['id'] for z in po_vrstah['odgovor']]
+        ).values('id', 'serijska_stevilka_id', 'vprasanje_id', stevilka=F('serijska_stevilka__stevilka'),
+                 besedilo_vprasanja=F('vprasanje__vprasanje'))}
+        for zadetek in po_vrstah['odgovor']:
+            o = podatki.get(zadetek['id'], {})
+            zadetek.update({
+                'serijska_stevilka_id': o.get('serijska_stevilka_id'),
+                'serijska_stevilka': o.get('stevilka'),
+                'vprasanje_id': o.get('vprasanje_id'),
+                'vprasanje': o.get('besedilo_vprasanja'),
+            })
+    if 'vprasanje' in po_vrstah:
+        podatki = dict(Vprasanje.objects.filter(
+            id__in=[z['id'] for z in po_vrstah['vprasanje']]
+        ).values_list('id', 'segment__tip_id'))
+        for zadetek in po_vrstah['vprasanje']:
+            zadetek['tip_id'] = podatki.get(zadetek['id'])
+    if 'serijska_stevilka' in po_vrstah:
+        podatki = dict(SerijskaStevilka.objects.filter(
+            id__in=[z['id'] for z in po_vrstah['serijska_stevilka']]
+        ).values_list('id', 'projekt_tip__tip_id'))
+        for zadetek in po_vrstah['serijska_stevilka']:
+            zadetek['tip_id'] = podatki.get(zadetek['id'])
+    if 'projekt' in po_vrstah:
+        podatki = dict(Projekt.objects.filter(
+            id__in=[z['id'] for z in po_vrstah['projekt']]
+        ).values_list('id', 'osebna_stevilka'))
+        for zadetek in po_vrstah['projekt']:
+            zadetek['osebna_stevilka'] = podatki.get(zadetek['id'])
@@ -1,14 +1,14 @@
 from rest_framework import serializers
 from .models import (
     Tip, Projekt, ProjektTip, Segment, Vprasanje, SerijskaStevilka,
-    Odgovor, Nastavitev, Profil, LogSprememb
+    Odgovor, Nastavitev, Profil, LogSprememb, IzvozniPosel, NapredekSerijske, NapredekProjekta
 )
 from django.contrib.auth.models import User
 
 class TipSerializer(serializers.ModelSerializer):
     class Meta:
         model = Tip
-        fields = '__all__'
+        exclude = ['verzija_predloge']
 
 class ProjektTipSerializer(serializers.ModelSerializer):
     tip_naziv = serializers.CharField(source='tip.naziv', read_only=True)
@@ -17,12 +17,49 @@ class ProjektTipSerializer(serializers.ModelSerializer):
         model = ProjektTip
         fields = ['id', 'projekt', 'tip', 'tip_naziv', 'stevilo_ponovitev', 'created_at', 'updated_at']
 
+class NapredekProjektaSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = NapredekProjekta
+        fields = [
+            'serijske_stevilke', 'odgovorjeni', 'odgovorjeni_obvezni', 'vsa_obvezna', 'zadnja_aktivnost'
+        ]
+
+class NapredekSerijskeSerializer(serializers.ModelSerializer):
+    stevilka = serializers.CharField(source='serijska_stevilka.stevilka', read_only=True)
+
+    class Meta:
+        model = NapredekSerijske
+        fields = [
+            'serijska_stevilka', 'stevilka', 'odgovorjeni', 'odgovorjeni_obvezni', 'vsa_obvezna',
+            'zadnja_aktivnost'
+        ]
+
 class ProjektSerializer(serializers.ModelSerializer):
     projekt_tipi = ProjektTipSerializer(many=True, read_only=True)
+    napredek = NapredekProjektaSerializer(read_only=True)
     
     class Meta:
         model = Projekt
-        fields = ['id', 'osebna_stevilka', 'datum', 'projekt_tipi', 'created_at', 'updated_at']
+        fields = ['id', 'osebna_stevilka', 'datum', 'projekt_tipi', 'napredek', 'created_at', 'updated_at']
+
+class TipVnosaSerializer(serializers.Serializer):
+    """En tip iz seznama ``tipi`` ob ustvarjanju projekta."""
+    tip = serializers.IntegerField()
+    stevilo_ponovitev = serializers.IntegerField(min_value=1, default=1)
+
+class TipiProjektaSerializer(serializers.Serializer):
+    """Preveri seznam ``tipi`` pred paketnim vnosom (vsi tipi obstajajo, nobeden ni podvojen)."""
+    tipi = TipVnosaSerializer(many=True, allow_empty=False)
+
+    def validate_tipi(self, tipi):
+        ids = [tip_data['tip'] for tip_data in tipi]
+        podvojeni = sorted({tip_id for tip_id in ids if ids.count(tip_id) > 1})
+        if podvojeni:
+            raise serializers.ValidationError(f'Tip {podvojeni[0]} je v seznamu večkrat')
+        manjkajoci = sorted(set(ids) - set(Tip.objects.filter(id__in=ids).values_list('id', flat=True)))
+        if manjkajoci:
+            raise serializers.ValidationError(f'Tip {manjkajoci[0]} ne obstaja')
+        return tipi
 
 class SegmentSerializer(serializers.ModelSerializer):
     class Meta:
@@ -60,6 +97,17 @@ class LogSpremembSerializer(serializers.ModelSerializer):
         model = LogSprememb
         fields = '__all__'
 
+class IzvozniPoselSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = IzvozniPosel
+        fields = [
+            'id', 'projekt', 'format', 'status', 'napredek', 'ime_datoteke', 'napaka',
+            'created_at', 'updated_at', 'koncano_at'
+        ]
+        read_only_fields = [
+            'status', 'napredek', 'ime_datoteke', 'napaka', 'created_at', 'updated_at', 'koncano_at'
+        ]
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -0,0 +1,98 @@
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .export_cache import invalidate_project
+from .models import Projekt, SerijskaStevilka, Odgovor, Tip, Segment, Vprasanje
+from .progress import recompute_on_commit
+from .template_cache import invalidate_template
+
+
+_paket = threading.local()
+
+
+def _po_potrditvi(projekt_id):
+    transaction.on_commit(lambda: invalidate_project(projekt_id))
+
+
+@contextmanager
+def paketna_sprememba_predloge():
+    """Znotraj bloka signali segmentov in vprašanj ne zavržejo predloge.
+
+    Za paketne spremembe, po katerih klicatelj sam enkrat zavrže predlogo in
+    izračuna napredek tipa (npr. import_template).
+    """
+    prej = getattr(_paket, 'aktiven', False)
+    _paket.aktiven = True
+    try:
+        yield
+    finally:
+        _paket.aktiven = prej
+
+
+def _kaskadno(origin, model):
+    """Ali je izbris posledica brisanja nadrejenega objekta (npr. segmenta)."""
+    return origin is not None and not isinstance(origin, model) and getattr(origin, 'model', None) is not model
+
+
+@receiver(post_save, sender=Odgovor)
+def odgovor_shranjen(sender, instance, **kwargs):
+    """Ob spremembi odgovora zavrzi izvoze njegovega projekta."""
+    projekt_id = SerijskaStevilka.objects.filter(
+        id=instance.serijska_stevilka_id
+    ).values_list('projekt_id', flat=True).first()
+    if projekt_id is not None:
+        _po_potrditvi(projekt_id)
+
+
+# Za izbris odgovora se namenoma ne prijavimo na post_delete, ker bi to onemogočilo
+# hitro kaskadno brisanje odgovorov; zanj poskrbi OdgovorViewSet.perform_destroy.
+@receiver(post_save, sender=SerijskaStevilka)
+def serijska_shranjena(sender, instance, **kwargs):
+    """Nova ali premaknjena serijska številka spremeni števce napredka projekta."""
+    recompute_on_commit(projekt_id=instance.projekt_id)
+
+
+@receiver(post_delete, sender=SerijskaStevilka)
+def serijska_izbrisana(sender, instance, **kwargs):
+    _po_potrditvi(instance.projekt_id)
+    recompute_on_commit(projekt_id=instance.projekt_id)
+
+
+@receiver(post_delete, sender=Projekt)
+def projekt_izbrisan(sender, instance, **kwargs):
+    _po_potrditvi(instance.id)
+
+
+@receiver([post_save, post_delete], sender=Tip)
+def tip_spremenjen(sender, instance, created=False, **kwargs):
+    # Nov tip že ima svežo verzijo predloge
+    if not created:
+        invalidate_template(instance.id)
+
+
+@receiver([post_save, post_delete], sender=Segment)
+def segment_spremenjen(sender, instance, origin=None, **kwargs):
+    """Ob spremembi segmenta zavrzi predlogo tipa; izbris odnese tudi vprašanja."""
+    if getattr(_paket, 'aktiven', False) or _kaskadno(origin, Segment):
+        return
+    invalidate_template(instance.tip_id)
+    if origin is not None:
+        recompute_on_commit(tip_id=instance.tip_id)
+
+
+@receiver([post_save, post_delete], sender=Vprasanje)
+def vprasanje_spremenjeno(sender, instance, origin=None, **kwargs):
+    """Ob spremembi vprašanja zavrzi predlogo tipa njegovega segmenta in preštej napredek.
+
+    Kaskadne izbrise (segment, tip) pokrijejo signali nadrejenih objektov.
+    """
+    if getattr(_paket, 'aktiven', False) or _kaskadno(origin, Vprasanje):
+        return
+    tip_id = Segment.objects.filter(id=instance.segment_id).values_list('tip_id', flat=True).first()
+    if tip_id is not None:
+        invalidate_template(tip_id)
+        recompute_on_commit(tip_id=tip_id)
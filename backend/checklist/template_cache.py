@@ -0,0 +1,86 @@
+"""Predpomnilnik predlog: drevo Tip -> Segment -> Vprasanje.
+
+Predloga tipa se spreminja redko, bere pa ob vsakem odpiranju kontrolnega
+seznama in izvozu. Shrani se v predpomnilnik ``predloge`` pod ključem iz id-ja
+tipa in žetona ``Tip.verzija_predloge``. Ob spremembi tipa, segmenta ali
+vprašanja (signali, uvoz predloge) se žeton v bazi zamenja, zato stare vnose
+preprosto nihče več ne prebere. Ker je žeton v bazi, nova verzija velja za vse
+procese hkrati in šele ob potrditvi transakcije, tudi če ima vsak proces svoj
+lokalni predpomnilnik. Žeton je naključen in ne števec, da obnovljena baza ne
+more znova oživiti drevesa iz drugega stanja.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import Segment, Tip, Vprasanje
+
+
+class Predloga:
+    """Segmenti in vprašanja enega tipa.
+
+    Segmenti so urejeni po id-ju, vprašanja po segmentu in id-ju.
+    """
+
+    def __init__(self, segmenti, vprasanja):
+        self.segmenti = segmenti
+        self.vprasanja = vprasanja
+        self.vprasanja_po_segmentu = {segment.id: [] for segment in segmenti}
+        for vprasanje in vprasanja:
+            self.vprasanja_po_segmentu.setdefault(vprasanje.segment_id, []).append(vprasanje)
+
+
+def _predpomnilnik():
+    return caches[settings.TEMPLATE_CACHE_ALIAS]
+
+
+def _kljuc_drevesa(tip_id, verzija):
+    return f'predloga:{tip_id}:{verzija}'
+
+
+def _verzije(tip_ids):
+    verzije = dict(Tip.objects.filter(id__in=tip_ids).values_list('id', 'verzija_predloge'))
+    return {tip_id: verzije.get(tip_id) for tip_id in tip_ids}
+
+
+def get_templates(tip_ids):
+    """Vrni slovar tip_id -> Predloga; verzije prebere z eno poizvedbo, manjkajoče predloge naloži z dvema."""
+    tip_ids = list(dict.fromkeys(int(tip_id) for tip_id in tip_ids))
+    if not tip_ids:
+        return {}
+
+    predpomnilnik = _predpomnilnik()
+    kljuci = {
+        tip_id: _kljuc_drevesa(tip_id, verzija) for tip_id, verzija in _verzije(tip_ids).items()
+    }
+    drevesa = predpomnilnik.get_many(kljuci.values())
+
+    manjkajoci = [tip_id for tip_id in tip_ids if kljuci[tip_id] not in drevesa]
+    if manjkajoci:
+        nova = {tip_id: ([], []) for tip_id in manjkajoci}
+        tip_segmenta = {}
+        for segment in Segment.objects.filter(tip_id__in=manjkajoci).order_by('id'):
+            nova[segment.tip_id][0].append(segment)
+            tip_segmenta[segment.id] = segment.tip_id
+        for vprasanje in Vprasanje.objects.filter(segment__tip_id__in=manjkajoci).order_by('segment_id', 'id'):
+            nova[tip_segmenta[vprasanje.segment_id]][1].append(vprasanje)
+        predpomnilnik.set_many({kljuci[tip_id]: drevo for tip_id, drevo in nova.items()})
+        drevesa.update({kljuci[tip_id]: drevo for tip_id, drevo in nova.items()})
+
+    return {tip_id: Predloga(*drevesa[kljuci[tip_id]]) for tip_id in tip_ids}
+
+
+def get_template(tip_id):
+    """Vrni Predlogo enega tipa."""
+    return get_templates([tip_id])[int(tip_id)]
+
+
+def invalidate_template(tip_id):
+    """Zamenjaj verzijo predloge tipa.
+
+    Zamenjava je del trenutne transakcije: ista povezava novo verzijo vidi
+    takoj, ostale šele po potrditvi, zato drevo, ki ga medtem naložijo iz
+    starega stanja, ostane pod staro verzijo.
+    """
+    Tip.objects.filter(id=tip_id).update(verzija_predloge=uuid.uuid4())
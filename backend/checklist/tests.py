@@ -1,3 +1,1358 @@
-from django.test import TestCase
+import datetime
+import gzip
+import io
+import json
+import logging
+import os
+import shutil
+import tempfile
+import zipfile
+from unittest import mock
 
-# Create your tests here.
+import openpyxl
+from django.contrib.auth.models import User
+from pypdf import PdfReader
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from .archive import iter_archive_json, write_archive
+from .exporters import write_xlsx
+from .middleware import ponastavi_metrike
+from .models import (
+    Tip, Projekt, ProjektTip, Segment, Vprasanje, SerijskaStevilka, Odgovor, LogSprememb, IzvozniPosel,
+    NapredekSerijske, NapredekProjekta, razcleni_spremembo
+)
+from .optimization import serializer_plan
+from .progress import recompute_progress
+from .serializers import ProjektSerializer
+
+
+def ustvari_projekt(projekt_id, st_segmentov, st_vprasanj, st_ponovitev, tip=None):
+    """Ustvari projekt s tipom, segmenti, vprašanji in odgovori na vsa vprašanja."""
+    if tip is None:
+        tip = Tip.objects.create(naziv=f'Tip {projekt_id}')
+        for s in range(st_segmentov):
+            segment = Segment.objects.create(tip=tip, naziv=f'Segment {s}')
+            Vprasanje.objects.bulk_create([
+                Vprasanje(segment=segment, vprasanje=f'Vprašanje {s}.{v}', tip='boolean')
+                for v in range(st_vprasanj)
+            ])
+    projekt = Projekt.objects.create(id=projekt_id, osebna_stevilka='123', datum=datetime.date(2025, 1, 1))
+    projekt_tip = ProjektTip.objects.create(projekt=projekt, tip=tip, stevilo_ponovitev=st_ponovitev)
+    serijske = SerijskaStevilka.objects.bulk_create([
+        SerijskaStevilka(projekt=projekt, projekt_tip=projekt_tip, stevilka=f'{projekt_id}-{tip.id}-{i + 1}')
+        for i in range(st_ponovitev)
+    ])
+    vprasanja = list(Vprasanje.objects.filter(segment__tip=tip))
+    Odgovor.objects.bulk_create([
+        Odgovor(vprasanje=vprasanje, serijska_stevilka=st, odgovor='Da')
+        for st in serijske for vprasanje in vprasanja
+    ])
+    return projekt
+
+
+class ExportTestCase(TestCase):
+    """Izvozi se shranjujejo v začasen predpomnilnik, ki se po testu pobriše."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='tester', password='geslo')
+        self.client.force_login(self.user)
+        self.cache_dir = tempfile.mkdtemp()
+        nastavitve = override_settings(EXPORT_CACHE_DIR=self.cache_dir)
+        nastavitve.enable()
+        self.addCleanup(nastavitve.disable)
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+
+
+class ExportQueryCountTests(ExportTestCase):
+
+    def stevilo_poizvedb(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_export_xlsx_query_count_is_constant(self):
+        majhen = ustvari_projekt('P1', st_segmentov=1, st_vprasanj=2, st_ponovitev=1)
+        velik = ustvari_projekt('P2', st_segmentov=5, st_vprasanj=20, st_ponovitev=15)
+
+        majhen_st = self.stevilo_poizvedb(f'/api/projekti/{majhen.id}/export-xlsx/')
+        velik_st = self.stevilo_poizvedb(f'/api/projekti/{velik.id}/export-xlsx/')
+
+        self.assertEqual(majhen_st, velik_st)
+
+
+class ExportCacheTests(ExportTestCase):
+    def izvozi(self, projekt):
+        response = self.client.get(f'/api/projekti/{projekt.id}/export-xlsx/')
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_unchanged_project_is_served_from_cache(self):
+        projekt = ustvari_projekt('P1', st_segmentov=2, st_vprasanj=3, st_ponovitev=2)
+        prvi = self.izvozi(projekt)
+
+        with mock.patch('checklist.exporters.write_xlsx') as write_xlsx:
+            drugi = self.izvozi(projekt)
+        write_xlsx.assert_not_called()
+        self.assertEqual(prvi, drugi)
+
+    def test_answer_change_invalidates_cached_export(self):
+        projekt = ustvari_projekt('P1', st_segmentov=1, st_vprasanj=2, st_ponovitev=1)
+        self.izvozi(projekt)
+        odgovor = Odgovor.objects.filter(serijska_stevilka__projekt=projekt).first()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/odgovori/batch/', [{
+                'vprasanje': odgovor.vprasanje_id,
+                'serijska_stevilka': odgovor.serijska_stevilka_id,
+                'odgovor': 'NE',
+            }], content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+        with mock.patch('checklist.exporters.write_xlsx', wraps=write_xlsx) as render:
+            self.izvozi(projekt)
+        render.assert_called_once()
+
+    @override_settings(EXPORT_CACHE_MAX_BYTES=1)
+    def test_cache_size_is_capped(self):
+        prvi = ustvari_projekt('P1', st_segmentov=1, st_vprasanj=2, st_ponovitev=1)
+        drugi = ustvari_projekt('P2', st_segmentov=1, st_vprasanj=2, st_ponovitev=1)
+        self.izvozi(prvi)
+        self.izvozi(drugi)
+        self.assertLessEqual(len(os.listdir(self.cache_dir)), 1)
+
+
+class PdfRenderTests(ExportTestCase):
+    @override_settings(PDF_WORKERS=2, PDF_SERIJSKE_NA_DEL=1)
+    def test_parallel_render_merges_parts_in_order(self):
+        projekt = ustvari_projekt('P1', st_segmentov=1, st_vprasanj=2, st_ponovitev=3)
+        response = self.client.get(f'/api/projekti/{projekt.id}/export-pdf/')
+        self.assertEqual(response.status_code, 200)
+
+        pdf = PdfReader(io.BytesIO(b''.join(response.streaming_content)))
+        besedilo = '\n'.join(stran.extract_text() for stran in pdf.pages)
+        stevilke = SerijskaStevilka.objects.filter(projekt=projekt).order_by('id').values_list('stevilka', flat=True)
+        pozicije = [besedilo.index(f'Serijska številka: {stevilka}') for stevilka in stevilke]
+        self.assertEqual(pozicije, sorted(pozicije))
+        self.assertEqual(besedilo.count('Kontrolni seznam'), 1)
+
+    def test_render_modes_produce_same_text(self):
+        projekt = ustvari_projekt('P1', st_segmentov=2, st_vprasanj=2, st_ponovitev=2)
+        Vprasanje.objects.filter(segment__tip__projekttip__projekt=projekt).update(
+            vprasanje='Ali je sestav pravilno pritrjen in so vsi vijaki zategnjeni s predpisanim momentom?'
+        )
+        besedila = {}
+        for nacin in ('natancno', 'hitro'):
+            response = self.client.get(f'/api/projekti/{projekt.id}/export-pdf/?nacin={nacin}')
+            self.assertEqual(response.status_code, 200)
+            pdf = PdfReader(io.BytesIO(b''.join(response.streaming_content)))
+            besedilo = ' '.join(' '.join(stran.extract_text() for stran in pdf.pages).split())
+            # Hitri način ima eno tabelo na serijsko številko, zato manj vrstic glave
+            besedila[nacin] = besedilo.replace('Segment Vprašanje Odgovor Datum odgovora ', '')
+        self.assertEqual(besedila['natancno'], besedila['hitro'])
+
+        response = self.client.get(f'/api/projekti/{projekt.id}/export-pdf/?nacin=neznan')
+        self.assertEqual(response.status_code, 400)
+
+
+# Končne točke, katerih število poizvedb ne sme rasti s količino podatkov.
+# Vrednosti v {} se izpolnijo iz podatki_projekta().
+KONCNE_TOCKE = [
+    ('GET', '/api/projekti/'),
+    ('GET', '/api/projekti/?paginate=false'),
+    ('GET', '/api/projekti/?page_size=2'),
+    ('GET', '/api/projekti/{projekt}/'),
+    ('GET', '/api/projekti/{projekt}/tipi/'),
+    ('GET', '/api/projekti/{projekt}/segmenti/'),
+    ('GET', '/api/projekti/{projekt}/snapshot/'),
+    ('GET', '/api/projekti/{projekt}/snapshot/?serijska={serijska}'),
+    ('GET', '/api/projekti/{projekt}/snapshot/?tip_id={tip}'),
+    ('GET', '/api/projekti/{projekt}/snapshot/?tip_id={tip}&serijska={serijska}'),
+    ('GET', '/api/projekti/{projekt}/export-xlsx/'),
+    ('GET', '/api/projekti/{projekt}/export-pdf/'),
+    ('GET', '/api/projekti/{projekt}/export-archive/'),
+    ('GET', '/api/projekti/{projekt}/export-archive/?verzija=2'),
+    ('GET', '/api/projekti/export-json/'),
+    ('GET', '/api/tipi/?paginate=false'),
+    ('GET', '/api/tipi/{tip}/'),
+    ('GET', '/api/segmenti/{segment}/'),
+    ('GET', '/api/vprasanja/{vprasanje}/'),
+    ('GET', '/api/serijske-stevilke/{serijska}/'),
+    ('GET', '/api/segmenti/?tip_id={tip}&paginate=false'),
+    ('GET', '/api/segmenti/?projekt_id={projekt}&paginate=false'),
+    ('GET', '/api/segmenti/{segment}/vprasanja/'),
+    ('GET', '/api/vprasanja/?tip_id={tip}&paginate=false'),
+    ('GET', '/api/vprasanja/{vprasanje}/odgovori/?projekt_id={projekt}'),
+    ('GET', '/api/serijske-stevilke/?projekt={projekt}&paginate=false'),
+    ('GET', '/api/serijske-stevilke/{serijska}/odgovori/'),
+    ('GET', '/api/odgovori/?serijska_stevilka={serijska}&paginate=false'),
+    ('GET', '/api/logi/?projekt={projekt}&paginate=false'),
+    ('GET', '/api/izvozi/?paginate=false'),
+    ('GET', '/api/auth/users/?paginate=false'),
+    ('POST', '/api/odgovori/batch/'),
+]
+
+
+def podatki_projekta(projekt):
+    serijska = SerijskaStevilka.objects.filter(projekt=projekt).order_by('id').first()
+    vprasanje = Vprasanje.objects.filter(segment__tip__projekttip__projekt=projekt).order_by('id').first()
+    return {
+        'projekt': projekt.id,
+        'serijska': serijska.id,
+        'tip': vprasanje.segment.tip_id,
+        'segment': vprasanje.segment_id,
+        'vprasanje': vprasanje.id,
+    }
+
+
+def dodaj_tip(projekt, st_segmentov, st_vprasanj, st_ponovitev):
+    """Dodaj projektu še en tip s segmenti, vprašanji, serijskimi številkami in odgovori."""
+    tip = Tip.objects.create(naziv=f'Dodatni tip {projekt.id}')
+    for s in range(st_segmentov):
+        segment = Segment.objects.create(tip=tip, naziv=f'Dodatni segment {s}')
+        Vprasanje.objects.bulk_create([
+            Vprasanje(segment=segment, vprasanje=f'Dodatno vprašanje {s}.{v}', tip='boolean')
+            for v in range(st_vprasanj)
+        ])
+    projekt_tip = ProjektTip.objects.create(projekt=projekt, tip=tip, stevilo_ponovitev=st_ponovitev)
+    serijske = SerijskaStevilka.objects.bulk_create([
+        SerijskaStevilka(projekt=projekt, projekt_tip=projekt_tip, stevilka=f'{projekt.id}-{tip.id}-{i + 1}')
+        for i in range(st_ponovitev)
+    ])
+    Odgovor.objects.bulk_create([
+        Odgovor(vprasanje=vprasanje, serijska_stevilka=st, odgovor='Da')
+        for st in serijske for vprasanje in Vprasanje.objects.filter(segment__tip=tip)
+    ])
+
+
+@override_settings(EXPORT_IZVAJALNIK='delavec')
+class ExportJobTests(ExportTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.media_dir = tempfile.mkdtemp()
+        nastavitve = override_settings(MEDIA_ROOT=self.media_dir)
+        nastavitve.enable()
+        self.addCleanup(nastavitve.disable)
+        self.addCleanup(shutil.rmtree, self.media_dir, ignore_errors=True)
+        self.projekt = ustvari_projekt('P1', st_segmentov=1, st_vprasanj=2, st_ponovitev=2)
+
+    def oddaj(self, format='xlsx'):
+        response = self.client.post('/api/izvozi/', {'projekt': self.projekt.id, 'format': format},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 202)
+        return response.json()
+
+    def test_submit_returns_202_and_waits_for_worker(self):
+        posel = self.oddaj()
+        self.assertEqual(posel['status'], 'cakajoc')
+        self.assertEqual(IzvozniPosel.objects.get(id=posel['id']).uporabnik, self.user)
+
+    def test_thread_executor_gets_job_after_commit(self):
+        with override_settings(EXPORT_IZVAJALNIK='nit'), \
+                mock.patch('checklist.jobs._get_executor') as executor, \
+                self.captureOnCommitCallbacks(execute=True):
+            posel = self.oddaj()
+        executor.return_value.submit.assert_called_once_with(mock.ANY, posel['id'])
+
+    def test_status_transitions_and_download(self):
+        posel = self.oddaj()
+        response = self.client.get(f'/api/izvozi/{posel["id"]}/download/')
+        self.assertEqual(response.status_code, 409)
+
+        call_command('run_export_worker', enkrat=True, stdout=io.StringIO())
+
+        stanje = self.client.get(f'/api/izvozi/{posel["id"]}/').json()
+        self.assertEqual(stanje['status'], 'koncan')
+        self.assertEqual(stanje['napredek'], 100)
+        response = self.client.get(f'/api/izvozi/{posel["id"]}/download/')
+        self.assertEqual(response.status_code, 200)
+        openpyxl.load_workbook(io.BytesIO(b''.join(response.streaming_content)))
+
+    def test_failed_export_records_error(self):
+        posel = self.oddaj()
+        with mock.patch('checklist.jobs.get_exporter', side_effect=RuntimeError('pokvarjen izvoznik')):
+            call_command('run_export_worker', enkrat=True, stdout=io.StringIO())
+        stanje = IzvozniPosel.objects.get(id=posel['id'])
+        self.assertEqual(stanje.status, 'napaka')
+        self.assertEqual(stanje.napaka, 'pokvarjen izvoznik')
+        self.assertEqual(self.client.get(f'/api/izvozi/{posel["id"]}/download/').status_code, 409)
+
+    def test_claimed_job_is_not_run_twice(self):
+        from .jobs import run_export
+        posel = self.oddaj()
+        self.assertTrue(run_export(posel['id']))
+        self.assertFalse(run_export(posel['id']))
+
+    def test_jobs_are_visible_only_to_owner(self):
+        posel = self.oddaj()
+        drugi = User.objects.create_user(username='drugi', password='geslo')
+        self.client.force_login(drugi)
+        self.assertEqual(self.client.get('/api/izvozi/').json(), [])
+        self.assertEqual(self.client.get(f'/api/izvozi/{posel["id"]}/').status_code, 404)
+        self.assertEqual(self.client.get(f'/api/izvozi/{posel["id"]}/download/').status_code, 404)
+
+        admin = User.objects.create_user(username='admin', password='geslo', is_staff=True)
+        self.client.force_login(admin)
+        self.assertEqual([p['id'] for p in self.client.get('/api/izvozi/').json()], [posel['id']])
+
+    def test_orphaned_jobs_are_failed_or_requeued(self):
+        from .jobs import obnovi_osirotele_posle
+        v_teku = IzvozniPosel.objects.create(projekt=self.projekt, uporabnik=self.user, format='pdf', status='v_teku')
+        cakajoc = IzvozniPosel.objects.create(projekt=self.projekt, uporabnik=self.user, format='xlsx')
+        svez = IzvozniPosel.objects.create(projekt=self.projekt, uporabnik=self.user, format='xlsx', status='v_teku')
+        staro = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+        IzvozniPosel.objects.filter(id__in=[v_teku.id, cakajoc.id]).update(updated_at=staro)
+
+        self.assertEqual(obnovi_osirotele_posle(), [cakajoc.id])
+        v_teku.refresh_from_db()
+        svez.refresh_from_db()
+        self.assertEqual(v_teku.status, 'napaka')
+        self.assertIn('prekinjen', v_teku.napaka)
+        self.assertEqual(svez.status, 'v_teku')
+
+
+class QueryBudgetTests(ExportTestCase):
+    """Število poizvedb vsake končne točke mora biti neodvisno od količine podatkov."""
+
+    def setUp(self):
+        super().setUp()
+        # Nekatere točke (uporabniki, vsi izvozi) so na voljo le osebju
+        self.user.is_staff = True
+        self.user.save()
+
+    def izmeri(self, metoda, url, projekt):
+        with CaptureQueriesContext(connection) as ctx:
+            if metoda == 'POST':
+                odgovori = Odgovor.objects.filter(serijska_stevilka__projekt=projekt)
+                response = self.client.post(url, [
+                    {'vprasanje': o.vprasanje_id, 'serijska_stevilka': o.serijska_stevilka_id, 'odgovor': 'Ne'}
+                    for o in odgovori
+                ], content_type='application/json')
+            else:
+                response = self.client.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertLess(response.status_code, 300, f'{metoda} {url}')
+        return ctx.captured_queries
+
+    def napolni(self, predpona, st_projektov, **velikost):
+        projekti = [ustvari_projekt(f'{predpona}{i}', **velikost) for i in range(st_projektov)]
+        for projekt in projekti:
+            LogSprememb.objects.create(
+                uporabnik=self.user, sprememba=f'Ustvarjen projekt {projekt.id}', nova_vrednost=projekt.id
+            )
+            IzvozniPosel.objects.create(projekt=projekt, uporabnik=self.user, format='xlsx')
+        User.objects.bulk_create([User(username=f'{predpona}-{i}') for i in range(st_projektov)])
+        return projekti[0]
+
+    def test_query_count_does_not_grow_with_data(self):
+        # Majhne podatke izmerimo, preden dodamo velike, da seznami res zrastejo
+        majhen = self.napolni('M', 1, st_segmentov=1, st_vprasanj=1, st_ponovitev=1)
+        malo = {
+            (metoda, predloga): self.izmeri(metoda, predloga.format(**podatki_projekta(majhen)), majhen)
+            for metoda, predloga in KONCNE_TOCKE
+        }
+
+        velik = self.napolni('V', 4, st_segmentov=4, st_vprasanj=5, st_ponovitev=6)
+        dodaj_tip(velik, st_segmentov=2, st_vprasanj=3, st_ponovitev=4)
+        for metoda, predloga in KONCNE_TOCKE:
+            with self.subTest(metoda=metoda, url=predloga):
+                veliko = self.izmeri(metoda, predloga.format(**podatki_projekta(velik)), velik)
+                if len(malo[metoda, predloga]) != len(veliko):
+                    self.fail(
+                        f'{metoda} {predloga}: {len(malo[metoda, predloga])} poizvedb na majhnih in '
+                        f'{len(veliko)} na velikih podatkih. Poizvedbe na velikih podatkih:\n' +
+                        '\n'.join(q['sql'] for q in veliko)
+                    )
+
+    def test_nested_project_types_load_with_one_prefetch(self):
+        self.napolni('P', 3, st_segmentov=1, st_vprasanj=1, st_ponovitev=1)
+        # seja, uporabnik, podpis seznama, projekti, tipi projektov skupaj z nazivi tipov
+        with self.assertNumQueries(5):
+            response = self.client.get('/api/projekti/?paginate=false')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(all(pt['tip_naziv'] for p in response.json() for pt in p['projekt_tipi']))
+
+    def test_serializer_plan(self):
+        nacrt = serializer_plan(ProjektSerializer)
+        # Napredek projekta je en objekt, zato se naloži s stikom
+        self.assertEqual(nacrt['select_related'], ['napredek'])
+        self.assertLessEqual({'id', 'datum', 'napredek__vsa_obvezna'}, nacrt['only'])
+        self.assertNotIn('napredek__updated_at', nacrt['only'])
+        [prefetch] = nacrt['prefetch_related']
+        self.assertEqual(prefetch.prefetch_to, 'projekt_tipi')
+        self.assertEqual(prefetch.queryset.query.select_related, {'tip': {}})
+        # Nastavitve segmentov tipa serializer ne bere, zato jih ne nalagamo
+        self.assertNotIn('nastavitve_segmentov', str(prefetch.queryset.query))
+
+
+class SnapshotTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='tester', password='geslo')
+        self.client.force_login(self.user)
+        self.projekt = ustvari_projekt('P1', st_segmentov=2, st_vprasanj=3, st_ponovitev=2)
+        dodaj_tip(self.projekt, st_segmentov=1, st_vprasanj=2, st_ponovitev=3)
+        self.tipi = list(self.projekt.projekt_tipi.order_by('id').values_list('tip_id', flat=True))
+
+    def snapshot(self, **parametri):
+        response = self.client.get('/api/projekti/P1/snapshot/', parametri)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_payload_shape(self):
+        podatki = self.snapshot()
+        self.assertEqual(set(podatki), {'projekt', 'tipi', 'serijske_stevilke', 'odgovori'})
+        self.assertEqual(podatki['projekt']['id'], 'P1')
+        self.assertEqual([t['id'] for t in podatki['tipi']], self.tipi)
+        self.assertEqual(set(podatki['tipi'][0]), {'id', 'naziv', 'stevilo_ponovitev', 'segmenti'})
+        self.assertEqual([len(s['vprasanja']) for t in podatki['tipi'] for s in t['segmenti']], [3, 3, 2])
+        self.assertEqual(len(podatki['serijske_stevilke']), 5)
+        self.assertEqual(len(podatki['odgovori']), 2 * 6 + 3 * 2)
+
+    def test_filters(self):
+        podatki = self.snapshot(tip_id=self.tipi[1])
+        self.assertEqual([t['id'] for t in podatki['tipi']], [self.tipi[1]])
+        self.assertEqual(len(podatki['serijske_stevilke']), 3)
+        self.assertEqual(len(podatki['odgovori']), 6)
+
+        serijska = SerijskaStevilka.objects.filter(projekt_tip__tip_id=self.tipi[0]).order_by('id').first()
+        podatki = self.snapshot(serijska=serijska.id)
+        self.assertEqual([s['id'] for s in podatki['serijske_stevilke']], [serijska.id])
+        self.assertEqual({o['serijska_stevilka'] for o in podatki['odgovori']}, {serijska.id})
+        self.assertEqual(len(podatki['odgovori']), 6)
+
+    def test_invalid_parameters(self):
+        for parametri in ({'serijska': 'abc'}, {'serijska': '-1'}, {'tip_id': 'abc'}, {'tip_id': 999999}):
+            response = self.client.get('/api/projekti/P1/snapshot/', parametri)
+            self.assertEqual(response.status_code, 400, parametri)
+            self.assertIn('error', response.json())
+
+
+def predloga_xlsx(vrstice):
+    """Ustvari XLSX predlogo vprašanj v pomnilniku."""
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(['segment', 'question', 'type', 'required', 'description', 'options', 'repeatable'])
+    for vrstica in vrstice:
+        sheet.append(vrstica)
+    datoteka = io.BytesIO()
+    workbook.save(datoteka)
+    return SimpleUploadedFile('predloga.xlsx', datoteka.getvalue())
+
+
+class UploadXlsxTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='tester', password='geslo')
+        self.client.force_login(self.user)
+        self.tip = Tip.objects.create(naziv='Tip')
+
+    def nalozi(self, vrstice):
+        response = self.client.post(f'/api/tipi/{self.tip.id}/upload-xlsx/', {'file': predloga_xlsx(vrstice)})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['spremembe']
+
+    def test_reimport_keeps_answers_of_unchanged_questions(self):
+        self.nalozi([
+            ['A', 'Prvo', 'boolean', 'true', '', '', 'false'],
+            ['A', 'Drugo', 'boolean', 'true', '', '', 'false'],
+            ['B', 'Tretje', 'textual', 'false', '', '', 'false'],
+        ])
+        projekt = ustvari_projekt('P1', 0, 0, 1, tip=self.tip)
+        prvo = Vprasanje.objects.get(vprasanje='Prvo')
+
+        spremembe = self.nalozi([
+            ['A', 'Prvo', 'boolean', 'true', '', '', 'false'],
+            ['A', 'Drugo', 'boolean', 'false', 'nov opis', '', 'false'],
+            ['C', 'Četrto', 'boolean', 'true', '', '', 'true'],
+        ])
+
+        self.assertEqual(spremembe['segmenti'], {'dodani': 1, 'izbrisani': 1, 'nespremenjeni': 1})
+        self.assertEqual(
+            spremembe['vprasanja'],
+            {'dodana': 1, 'posodobljena': 1, 'izbrisana': 1, 'nespremenjena': 1}
+        )
+        self.assertTrue(Vprasanje.objects.filter(id=prvo.id).exists())
+        self.assertEqual(Odgovor.objects.filter(vprasanje=prvo, serijska_stevilka__projekt=projekt).count(), 1)
+
+
+class TemplateCacheTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='tester', password='geslo')
+        self.client.force_login(self.user)
+        self.projekt = ustvari_projekt('P1', st_segmentov=2, st_vprasanj=3, st_ponovitev=1)
+        self.tip = self.projekt.projekt_tipi.get().tip
+
+    def predloga_iz_baze(self, url):
+        """Vrni odgovor in število poizvedb nad segmenti in vprašanji."""
+        with CaptureQueriesContext(connection) as poizvedbe:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        tabele = [q['sql'] for q in poizvedbe.captured_queries
+                  if 'FROM "checklist_segment"' in q['sql'] or 'FROM "checklist_vprasanje"' in q['sql']]
+        return response.json(), len(tabele)
+
+    def test_template_reads_skip_database_once_cached(self):
+        for url in (
+            f'/api/segmenti/?tip_id={self.tip.id}&paginate=false',
+            f'/api/vprasanja/?tip_id={self.tip.id}&paginate=false',
+            f'/api/projekti/P1/snapshot/',
+        ):
+            self.predloga_iz_baze(url)
+            _, st_poizvedb = self.predloga_iz_baze(url)
+            self.assertEqual(st_poizvedb, 0, url)
+
+    def test_question_and_upload_invalidate_template(self):
+        url = f'/api/vprasanja/?tip_id={self.tip.id}&paginate=false'
+        self.assertEqual(len(self.predloga_iz_baze(url)[0]), 6)
+
+        segment = Segment.objects.filter(tip=self.tip).first()
+        Vprasanje.objects.create(segment=segment, vprasanje='Novo', tip='boolean')
+        self.assertEqual(len(self.predloga_iz_baze(url)[0]), 7)
+
+        response = self.client.post(f'/api/tipi/{self.tip.id}/upload-xlsx/', {
+            'file': predloga_xlsx([['A', 'Edino', 'boolean', 'true', '', '', 'false']])
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([v['vprasanje'] for v in self.predloga_iz_baze(url)[0]], ['Edino'])
+
+    def test_version_token_is_stored_in_database(self):
+        # Drug proces ima svoj predpomnilnik, skupna je le verzija v bazi
+        prej = Tip.objects.get(id=self.tip.id).verzija_predloge
+        segment = Segment.objects.filter(tip=self.tip).first()
+        Vprasanje.objects.create(segment=segment, vprasanje='Novo', tip='boolean')
+        self.assertNotEqual(Tip.objects.get(id=self.tip.id).verzija_predloge, prej)
+
+    def stevilo_poizvedb_izbrisa(self, st_vprasanj):
+        tip = Tip.objects.create(naziv=f'Izbris {st_vprasanj}')
+        segment = Segment.objects.create(tip=tip, naziv='S')
+        Vprasanje.objects.bulk_create([
+            Vprasanje(segment=segment, vprasanje=f'V{i}', tip='boolean') for i in range(st_vprasanj)
+        ])
+        with CaptureQueriesContext(connection) as ctx, self.captureOnCommitCallbacks(execute=True):
+            segment.delete()
+        return len(ctx.captured_queries)
+
+    def test_segment_cascade_delete_query_count_is_constant(self):
+        self.assertEqual(self.stevilo_poizvedb_izbrisa(2), self.stevilo_poizvedb_izbrisa(40))
+
+    def test_template_import_deletes_without_per_question_queries(self):
+        def uvozi(st_vprasanj):
+            tip = Tip.objects.create(naziv=f'Uvoz {st_vprasanj}')
+            segment = Segment.objects.create(tip=tip, naziv='A')
+            Vprasanje.objects.bulk_create([
+                Vprasanje(segment=segment, vprasanje=f'V{i}', tip='boolean') for i in range(st_vprasanj)
+            ])
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.post(f'/api/tipi/{tip.id}/upload-xlsx/', {
+                    'file': predloga_xlsx([['A', 'Edino', 'boolean', 'true', '', '', 'false']])
+                })
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([v.vprasanje for v in Vprasanje.objects.filter(segment__tip=tip)], ['Edino'])
+            return len(ctx.captured_queries)
+
+        self.assertEqual(uvozi(2), uvozi(40))
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='tester', password='geslo')
+        self.client.force_login(self.user)
+        self.projekt = ustvari_projekt('P1', st_segmentov=2, st_vprasanj=2, st_ponovitev=1)
+        self.tip = self.projekt.projekt_tipi.get().tip
+        self.serijska = SerijskaStevilka.objects.get(projekt=self.projekt)
+
+    def test_unchanged_lists_return_not_modified(self):
+        for url in (
+            '/api/projekti/',
+            f'/api/segmenti/?tip_id={self.tip.id}&paginate=false',
+            f'/api/segmenti/?tip_id={self.tip.id}',
+            f'/api/odgovori/?serijska_stevilka={self.serijska.id}&paginate=false',
+        ):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertIn('Last-Modified', response, url)
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(response.status_code, 304, url)
+            self.assertEqual(response.content, b'', url)
+
+    def test_changes_invalidate_etag(self):
+        urls = {
+            'projekti': '/api/projekti/',
+            'segmenti': f'/api/segmenti/?tip_id={self.tip.id}&paginate=false',
+            'odgovori': f'/api/odgovori/?serijska_stevilka={self.serijska.id}&paginate=false',
+        }
+        etagi = {ime: self.client.get(url)['ETag'] for ime, url in urls.items()}
+
+        self.tip.naziv = 'Preimenovan'
+        self.tip.save()
+        Segment.objects.create(tip=self.tip, naziv='Nov segment')
+        Odgovor.objects.filter(serijska_stevilka=self.serijska).first().delete()
+
+        for ime, url in urls.items():
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etagi[ime])
+            self.assertEqual(response.status_code, 200, ime)
+            self.assertNotEqual(response['ETag'], etagi[ime], ime)
+
+
+class ProjectCreateTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='tester', password='geslo')
+        self.client.force_login(self.user)
+        self.tipi = [Tip.objects.create(naziv=f'Tip {i}').id for i in range(3)]
+
+    def ustvari(self, **podatki):
+        return self.client.post('/api/projekti/', {
+            'id': 'P1', 'osebna_stevilka': '1', 'datum': '2025-01-01', **podatki
+        }, content_type='application/json')
+
+    def test_bulk_types_create_all_serials(self):
+        response = self.ustvari(tipi=[{'tip': self.tipi[0], 'stevilo_ponovitev': 2},
+                                      {'tip': self.tipi[1], 'stevilo_ponovitev': 3}])
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(len(response.json()['serijske_stevilke']), 5)
+        self.assertEqual(
+            sorted(SerijskaStevilka.objects.values_list('stevilka', flat=True)),
+            sorted([f'P1-{self.tipi[0]}-{i}' for i in (1, 2)] + [f'P1-{self.tipi[1]}-{i}' for i in (1, 2, 3)])
+        )
+
+        # Obstoječemu projektu se doda nov tip, ponovljen tip pa se zavrne
+        self.assertEqual(self.ustvari(tip=self.tipi[2]).status_code, 200)
+        response = self.ustvari(tip=self.tipi[0])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(SerijskaStevilka.objects.count(), 6)
+
+    def test_statement_count_does_not_grow_with_serials(self):
+        # P0 napolni predpomnilnik predlog; števci napredka se računajo po 400 serijskih številk
+        stevila = []
+        for projekt_id, ponovitve in (('P0', 1), ('P1', 1), ('P2', 150)):
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.ustvari(id=projekt_id, tipi=[
+                    {'tip': self.tipi[0], 'stevilo_ponovitev': ponovitve},
+                    {'tip': self.tipi[1], 'stevilo_ponovitev': ponovitve},
+                ])
+            self.assertEqual(response.status_code, 200, response.content)
+            vnosi = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "checklist_serijskastevilka"')]
+            self.assertEqual(len(vnosi), 1)
+            stevila.append(len(ctx.captured_queries))
+        self.assertEqual(stevila[1], stevila[2])
+
+    def test_invalid_types_are_rejected_before_writing(self):
+        for tipi, napaka in (
+            ([{'tip': self.tipi[0]}, {'tip': self.tipi[0]}], f'Tip {self.tipi[0]} je v seznamu večkrat'),
+            ([{'tip': 999999}], 'Tip 999999 ne obstaja'),
+            ([{'stevilo_ponovitev': 2}], None),
+            ([{'tip': self.tipi[0], 'stevilo_ponovitev': 0}], None),
+            ([], None),
+        ):
+            response = self.ustvari(tipi=tipi)
+            self.assertEqual(response.status_code, 400, tipi)
+            if napaka:
+                self.assertEqual(response.json()['tipi'], [napaka])
+        self.assertEqual(self.ustvari().status_code, 400)
+        self.assertFalse(Projekt.objects.exists())
+
+
+class PaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='tester', password='geslo')
+        self.client.force_login(self.user)
+
+    def test_lists_are_unpaginated_unless_requested(self):
+        Tip.objects.bulk_create([Tip(naziv=f'Tip {i}') for i in range(3)])
+        for parametri in ({}, {'paginate': 'false'}, {'paginate': 'false', 'page_size': 1}):
+            response = self.client.get('/api/tipi/', parametri)
+            self.assertIsInstance(response.json(), list, parametri)
+            self.assertEqual(len(response.json()), 3)
+
+        stran = self.client.get('/api/tipi/', {'page_size': 2}).json()
+        self.assertEqual(set(stran), {'next', 'previous', 'results'})
+        self.assertEqual(len(stran['results']), 2)
+        naslednja = self.client.get(stran['next']).json()
+        self.assertEqual(len(naslednja['results']), 1)
+        self.assertIsNone(naslednja['next'])
+
+    def test_page_size_is_capped(self):
+        Tip.objects.bulk_create([Tip(naziv=f'Tip {i}') for i in range(1001)])
+        stran = self.client.get('/api/tipi/', {'page_size': 5000}).json()
+        self.assertEqual(len(stran['results']), 1000)
+        self.assertIsNotNone(stran['next'])
+
+    def test_cursor_is_stable_across_inserts(self):
+        def ustvari(st):
+            for i in range(st):
+                LogSprememb.objects.create(uporabnik=self.user, sprememba=f'nastavitve_{i}')
+
+        ustvari(5)
+        vsi = list(LogSprememb.objects.order_by('-id').values_list('id', flat=True))
+        prva = self.client.get('/api/logi/', {'page_size': 2}).json()
+        # Logi so urejeni od najnovejšega (pagination_ordering = '-id')
+        self.assertEqual([log['id'] for log in prva['results']], vsi[:2])
+
+        # Novi zapisi pridejo na začetek; odmik bi ponovil že prikazane, kazalec ne
+        ustvari(3)
+        prebrani = [log['id'] for log in prva['results']]
+        url = prva['next']
+        while url:
+            stran = self.client.get(url).json()
+            prebrani += [log['id'] for log in stran['results']]
+            url = stran['next']
+        self.assertEqual(prebrani, vsi)
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='tester', password='geslo')
+        self.client.force_login(self.user)
+        self.projekt = ustvari_projekt('P1', st_segmentov=2, st_vprasanj=3, st_ponovitev=3)
+
+    def izvozi_in_uvozi(self, url, ime):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        vsebina = b''.join(response.streaming_content)
+        pricakovani = sorted(
+            Odgovor.objects.filter(serijska_stevilka__projekt=self.projekt)
+            .values_list('serijska_stevilka__stevilka', 'vprasanje_id', 'odgovor')
+        )
+        Projekt.objects.get(id='P1').delete()
+
+        response = self.client.post('/api/projekti/import-json/', {'file': SimpleUploadedFile(ime, vsebina)})
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['uvozeno'], {'tipi': 1, 'serijske_stevilke': 3, 'odgovori': 18})
+        self.assertLessEqual({'branje', 'serijske_stevilke', 'odgovori'}, set(response.json()['casi']))
+        self.assertEqual(sorted(
+            Odgovor.objects.filter(serijska_stevilka__projekt_id='P1')
+            .values_list('serijska_stevilka__stevilka', 'vprasanje_id', 'odgovor')
+        ), pricakovani)
+        return vsebina
+
+    def test_v2_round_trip(self):
+        vsebina = self.izvozi_in_uvozi('/api/projekti/P1/export-archive/?verzija=2', 'arhiv.ndjson.gz')
+        zapisi = [json.loads(vrstica) for vrstica in gzip.decompress(vsebina).splitlines()]
+        self.assertEqual(zapisi[0]['zapis'], 'manifest')
+        self.assertEqual(zapisi[0]['version'], '2.0.0')
+
+    def test_v1_archive_with_duplicate_answers_keeps_newest(self):
+        response = self.client.get('/api/projekti/P1/export-archive/?verzija=1')
+        arhiv = json.loads(b''.join(response.streaming_content))
+        prvi, drugi = arhiv['odgovori'][0], arhiv['odgovori'][1]
+        # Stari izvozi so imeli lahko isti par (vprasanje, serijska) večkrat
+        arhiv['odgovori'][1:1] = [
+            {**prvi, 'id': 9001, 'odgovor': 'novejši', 'updated_at': '2030-01-01T00:00:00+00:00'},
+            {**prvi, 'id': 9000, 'odgovor': 'starejši', 'updated_at': '2029-01-01T00:00:00+00:00'},
+            {**drugi, 'id': 9002, 'odgovor': 'višji id'},
+        ]
+        Projekt.objects.get(id='P1').delete()
+
+        response = self.client.post('/api/projekti/import-json/', {
+            'file': SimpleUploadedFile('arhiv.json', json.dumps(arhiv).encode('utf-8'))
+        })
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['uvozeno']['odgovori'], 18)
+        odgovori = Odgovor.objects.filter(serijska_stevilka__projekt_id='P1')
+        self.assertEqual(odgovori.get(vprasanje_id=prvi['vprasanje_id'], serijska_stevilka__stevilka__endswith='-1').odgovor, 'novejši')
+        self.assertEqual(odgovori.get(vprasanje_id=drugi['vprasanje_id'], serijska_stevilka__stevilka__endswith='-1').odgovor, 'višji id')
+
+    def test_write_archive_reports_progress_per_block(self):
+        projekt = ustvari_projekt('VELIK', st_segmentov=5, st_vprasanj=20, st_ponovitev=15)
+        napredek = []
+        out = io.BytesIO()
+        write_archive(projekt, out, napredek.append)
+
+        self.assertEqual(napredek[0], 0.0)
+        self.assertEqual(napredek[-1], 1.0)
+        self.assertEqual(napredek, sorted(napredek))
+        self.assertTrue(any(0 < delez < 1 for delez in napredek))
+        zapisi = [json.loads(vrstica) for vrstica in gzip.decompress(out.getvalue()).splitlines()]
+        self.assertEqual(sum(zapis['zapis'] == 'odgovor' for zapis in zapisi), 1500)
+
+    def test_v1_archive_is_the_default(self):
+        response = self.client.get('/api/projekti/P1/export-archive/')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIn('.json"', response['Content-Disposition'])
+        self.assertEqual(json.loads(b''.join(response.streaming_content))['meta']['version'], '1.0.0')
+
+        vsebina = self.izvozi_in_uvozi('/api/projekti/P1/export-archive/?verzija=1', 'arhiv.json')
+        self.assertEqual(json.loads(vsebina)['meta']['version'], '1.0.0')
+
+    def test_v1_stream_matches_json_dumps(self):
+        tip = self.projekt.projekt_tipi.get().tip
+        Segment.objects.create(tip=tip, naziv='Prazen segment – čšž')
+        Odgovor.objects.filter(
+            id=Odgovor.objects.filter(serijska_stevilka__projekt=self.projekt).order_by('id').first().id
+        ).update(odgovor='Opažena poškodba "ohišja"\nštevilka ½ 日本')
+        prazen = Projekt.objects.create(id='Prazen-č', osebna_stevilka='š1', datum=datetime.date(2025, 1, 1))
+
+        for projekt in (self.projekt, prazen):
+            vsebina = ''.join(iter_archive_json(projekt))
+            arhiv = json.loads(vsebina)
+            self.assertEqual(vsebina, json.dumps(arhiv, indent=2, ensure_ascii=False))
+        self.assertIn('"odgovor": "Opažena poškodba \\"ohišja\\"\\nštevilka ½ 日本"', ''.join(iter_archive_json(self.projekt)))
+        self.assertIn('"vprasanja": []', ''.join(iter_archive_json(self.projekt)))
+        for seznam in ('tipi', 'segmenti', 'serijske_stevilke', 'odgovori', 'spremembe'):
+            self.assertEqual(arhiv[seznam], [])
+
+    def test_existing_project_is_rejected(self):
+        vsebina = b''.join(self.client.get('/api/projekti/P1/export-archive/?verzija=2').streaming_content)
+        response = self.client.post('/api/projekti/import-json/', {'file': SimpleUploadedFile('a.gz', vsebina)})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'Projekt P1 že obstaja')
+
+    def test_zip_of_filtered_projects(self):
+        ustvari_projekt('P2', st_segmentov=1, st_vprasanj=2, st_ponovitev=2)
+        stari = ustvari_projekt('P3', st_segmentov=1, st_vprasanj=2, st_ponovitev=2)
+        Projekt.objects.filter(id=stari.id).update(datum=datetime.date(2020, 1, 1))
+
+        response = self.client.get('/api/projekti/export-archives/?datum_od=2024-01-01&id=P1,P3&id=P2')
+        self.assertEqual(response.status_code, 200)
+        zip_datoteka = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertIsNone(zip_datoteka.testzip())
+        manifest = json.loads(zip_datoteka.read('manifest.json'))
+        self.assertEqual([p['projekt_id'] for p in manifest['projekti']], ['P1', 'P2'])
+        prvi = gzip.decompress(zip_datoteka.read(manifest['projekti'][0]['datoteka'])).splitlines()
+        self.assertEqual(json.loads(prvi[0])['projekt_id'], 'P1')
+        self.assertEqual(sum(json.loads(v)['zapis'] == 'odgovor' for v in prvi), 18)
+
+        self.assertEqual(self.client.get('/api/projekti/export-archives/?osebna_stevilka=nihce').status_code, 404)
+        self.assertEqual(self.client.get('/api/projekti/export-archives/?datum_od=vceraj').status_code, 400)
+
+    def test_zip_member_names_are_unique_for_colliding_ids(self):
+        ustvari_projekt('P:1', st_segmentov=1, st_vprasanj=1, st_ponovitev=1)
+        zdaj = datetime.datetime(2025, 1, 1, 12, 0, tzinfo=datetime.timezone.utc)
+        with mock.patch('checklist.archive.timezone.now', return_value=zdaj):
+            response = self.client.get('/api/projekti/export-archives/?id=P1,P:1')
+            vsebina = b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        zip_datoteka = zipfile.ZipFile(io.BytesIO(vsebina))
+        imena = zip_datoteka.namelist()
+        self.assertEqual(len(imena), len(set(imena)))
+        manifest = json.loads(zip_datoteka.read('manifest.json'))
+        self.assertEqual(
+            [p['datoteka'] for p in manifest['projekti']],
+            ['Projekt_P1_arhiv_20250101_120000.ndjson.gz', 'Projekt_P1_arhiv_20250101_120000_2.ndjson.gz']
+        )
+        for projekt in manifest['projekti']:
+            prvi = json.loads(gzip.decompress(zip_datoteka.read(projekt['datoteka'])).splitlines()[0])
+            self.assertEqual(prvi['projekt_id'], projekt['projekt_id'])
+
+    def test_answer_to_question_of_other_tip_is_rejected(self):
+        tuje = ustvari_projekt('P2', st_segmentov=1, st_vprasanj=1, st_ponovitev=1)
+        tuje_vprasanje = Vprasanje.objects.get(segment__tip__projekttip__projekt=tuje)
+        vrstice = gzip.decompress(
+            b''.join(self.client.get('/api/projekti/P1/export-archive/?verzija=2').streaming_content)
+        ).decode().splitlines()
+        zapisi = [json.loads(vrstica) for vrstica in vrstice]
+        next(z for z in zapisi if z['zapis'] == 'odgovor')['vprasanje_id'] = tuje_vprasanje.id
+        Projekt.objects.get(id='P1').delete()
+
+        vsebina = gzip.compress('\n'.join(json.dumps(z) for z in zapisi).encode())
+        response = self.client.post('/api/projekti/import-json/', {'file': SimpleUploadedFile('a.gz', vsebina)})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(f'vprašanje {tuje_vprasanje.id}', response.json()['error'])
+        self.assertFalse(Projekt.objects.filter(id='P1').exists())
+
+
+class MigrationTestCase(TransactionTestCase):
+    """Pripravi podatke z modeli stanja ``migrate_from`` in migriraj na ``migrate_to``.
+
+    Podrazred definira ``pripravi(apps)``; po testu se baza vrne na zadnjo migracijo.
+    """
+    migrate_from = None
+    migrate_to = None
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate([('checklist', self.migrate_from)])
+        self.pripravi(executor.loader.project_state([('checklist', self.migrate_from)]).apps)
+
+        executor = MigrationExecutor(connection)
+        executor.migrate([('checklist', self.migrate_to)])
+        self.apps = executor.loader.project_state([('checklist', self.migrate_to)]).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def pripravi(self, apps):
+        raise NotImplementedError
+
+
+def ustvari_star_projekt(apps, projekt_id, st_vprasanj=1):
+    """Ustvari projekt z eno serijsko številko z modeli iz stanja migracije."""
+    tip = apps.get_model('checklist', 'Tip').objects.create(naziv=f'Tip {projekt_id}')
+    segment = apps.get_model('checklist', 'Segment').objects.create(tip=tip, naziv='Segment')
+    vprasanja = [
+        apps.get_model('checklist', 'Vprasanje').objects.create(segment=segment, vprasanje=f'V{i}', tip='boolean')
+        for i in range(st_vprasanj)
+    ]
+    projekt = apps.get_model('checklist', 'Projekt').objects.create(
+        id=projekt_id, osebna_stevilka='1', datum=datetime.date(2025, 1, 1)
+    )
+    projekt_tip = apps.get_model('checklist', 'ProjektTip').objects.create(projekt=projekt, tip=tip)
+    serijska = apps.get_model('checklist', 'SerijskaStevilka').objects.create(
+        projekt=projekt, projekt_tip=projekt_tip, stevilka=f'{projekt_id}-1'
+    )
+    return serijska, vprasanja
+
+
+class LogSpremembTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='tester', password='geslo')
+        self.client.force_login(self.user)
+        self.projekt = ustvari_projekt('P1', st_segmentov=1, st_vprasanj=2, st_ponovitev=1)
+        self.odgovor = Odgovor.objects.filter(serijska_stevilka__projekt=self.projekt).first()
+
+    def test_razcleni_spremembo(self):
+        for sprememba, pricakovano in (
+            ('projekt_P1', ('projekt', 'P1')),
+            ('projekt_P_1_uvoz', ('projekt', 'P_1')),
+            ('serijska_stevilka_12', ('serijska_stevilka', '12')),
+            ('serijska_stevilka_12_odgovor', ('serijska_stevilka', '12')),
+            ('odgovor_7', ('odgovor', '7')),
+            ('odgovor_x', ('', '')),
+            ('nastavitve', ('', '')),
+        ):
+            self.assertEqual(razcleni_spremembo(sprememba), pricakovano, sprememba)
+
+    def test_save_only_parses(self):
+        with self.assertNumQueries(1):
+            log = LogSprememb.objects.create(uporabnik=self.user, sprememba=f'odgovor_{self.odgovor.id}')
+        self.assertEqual((log.entity_type, log.entity_id, log.projekt_id), ('odgovor', str(self.odgovor.id), None))
+        with self.assertNumQueries(1):
+            LogSprememb.objects.create(uporabnik=self.user, sprememba='projekt_P1', projekt=self.projekt)
+
+    def test_api_create_resolves_projekt(self):
+        for sprememba in ('projekt_P1_uvoz', f'serijska_stevilka_{self.odgovor.serijska_stevilka_id}',
+                          f'odgovor_{self.odgovor.id}'):
+            response = self.client.post('/api/logi/', {'uporabnik': self.user.id, 'sprememba': sprememba})
+            self.assertEqual(response.status_code, 201, response.content)
+            self.assertEqual(response.json()['projekt'], 'P1', sprememba)
+        response = self.client.post('/api/logi/', {'uporabnik': self.user.id, 'sprememba': 'odgovor_999999'})
+        self.assertIsNone(response.json()['projekt'])
+
+    def test_filters(self):
+        prvi = LogSprememb.objects.create(uporabnik=self.user, sprememba=f'odgovor_{self.odgovor.id}',
+                                          projekt=self.projekt)
+        LogSprememb.objects.create(uporabnik=self.user, sprememba='projekt_P1', projekt=self.projekt)
+        LogSprememb.objects.create(uporabnik=self.user, sprememba=f'serijska_stevilka_{self.odgovor.id}')
+        LogSprememb.objects.filter(id=prvi.id).update(cas=datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc))
+
+        def ids(parametri):
+            response = self.client.get('/api/logi/', {'paginate': 'false', **parametri})
+            self.assertEqual(response.status_code, 200, response.content)
+            return [log['sprememba'] for log in response.json()]
+
+        self.assertEqual(ids({'entity_type': 'odgovor', 'entity_id': self.odgovor.id}), [prvi.sprememba])
+        self.assertEqual(ids({'projekt': 'P1'}), ['projekt_P1', prvi.sprememba])
+        self.assertEqual(ids({'projekt': 'P1', 'od': '2025-01-01T00:00:00Z'}), ['projekt_P1'])
+        self.assertEqual(ids({'do': '2025-01-01T00:00:00Z'}), [prvi.sprememba])
+
+        response = self.client.get('/api/logi/', {'entity_id': self.odgovor.id})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('entity_type', response.json()['error'])
+
+
+class LogSpremembMigrationTests(MigrationTestCase):
+    migrate_from = '0001_initial'
+    migrate_to = '0002_logsprememb_entiteta'
+
+    def pripravi(self, apps):
+        uporabnik = apps.get_model('auth', 'User').objects.create(username='tester')
+        serijska, (vprasanje,) = ustvari_star_projekt(apps, 'P1')
+        odgovor = apps.get_model('checklist', 'Odgovor').objects.create(
+            vprasanje=vprasanje, serijska_stevilka=serijska, odgovor='Da'
+        )
+        LogSprememb = apps.get_model('checklist', 'LogSprememb')
+        for sprememba in ('projekt_P1_uvoz', f'serijska_stevilka_{serijska.id}', f'odgovor_{odgovor.id}',
+                          'odgovor_999', 'projekt_izbrisan', 'nastavitve'):
+            LogSprememb.objects.create(uporabnik=uporabnik, sprememba=sprememba)
+        self.serijska_id, self.odgovor_id = serijska.id, odgovor.id
+
+    def test_backfill(self):
+        LogSprememb = self.apps.get_model('checklist', 'LogSprememb')
+        self.assertEqual(
+            list(LogSprememb.objects.order_by('id').values_list('entity_type', 'entity_id', 'projekt_id')),
+            [
+                ('projekt', 'P1', 'P1'),
+                ('serijska_stevilka', str(self.serijska_id), 'P1'),
+                ('odgovor', str(self.odgovor_id), 'P1'),
+                ('odgovor', '999', None),
+                ('projekt', 'izbrisan', None),
+                ('', '', None),
+            ]
+        )
+
+
+class AnswerUpsertTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='tester', password='geslo')
+        self.client.force_login(self.user)
+        self.projekt = ustvari_projekt('P1', st_segmentov=1, st_vprasanj=3, st_ponovitev=2)
+        self.vprasanja = list(Vprasanje.objects.filter(segment__tip__projekttip__projekt=self.projekt).order_by('id'))
+        self.serijske = list(SerijskaStevilka.objects.filter(projekt=self.projekt).order_by('id'))
+
+    def shrani(self, odgovori):
+        return self.client.post('/api/odgovori/batch/', [
+            {'vprasanje': v.id, 'serijska_stevilka': s.id, 'odgovor': besedilo} for v, s, besedilo in odgovori
+        ], content_type='application/json')
+
+    def test_batch_reports_inserted_updated_and_unchanged(self):
+        Odgovor.objects.filter(serijska_stevilka=self.serijske[1]).delete()
+        response = self.shrani([
+            (self.vprasanja[0], self.serijske[0], 'Da'),
+            (self.vprasanja[1], self.serijske[0], 'Ne'),
+            (self.vprasanja[0], self.serijske[1], 'Da'),
+            (self.vprasanja[1], self.serijske[1], 'Ne'),
+        ])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json(), {'vstavljeni': 2, 'posodobljeni': 1, 'nespremenjeni': 1})
+        self.assertEqual(Odgovor.objects.filter(serijska_stevilka=self.serijske[1]).count(), 2)
+        self.assertEqual(
+            Odgovor.objects.get(vprasanje=self.vprasanja[1], serijska_stevilka=self.serijske[0]).odgovor, 'Ne'
+        )
+
+    def test_batch_statement_count_does_not_grow_with_size(self):
+        tip = self.projekt.projekt_tipi.get().tip
+        velik = ustvari_projekt('P2', st_segmentov=0, st_vprasanj=0, st_ponovitev=10, tip=tip)
+        Vprasanje.objects.bulk_create([
+            Vprasanje(segment=self.vprasanja[0].segment, vprasanje=f'Dodatno {i}', tip='boolean') for i in range(47)
+        ])
+        vprasanja = list(Vprasanje.objects.filter(segment__tip=tip))
+        recompute_progress()
+        self.shrani([(self.vprasanja[0], self.serijske[0], 'ogrevanje')])
+        # Oba paketa vstavljata in posodabljata
+        Odgovor.objects.filter(vprasanje=self.vprasanja[1], serijska_stevilka=self.serijske[1]).delete()
+
+        stevila = []
+        for odgovori in (
+            [(v, s, 'Ne') for v in self.vprasanja[:2] for s in self.serijske],
+            [(v, s, 'Ne') for v in vprasanja for s in SerijskaStevilka.objects.filter(projekt=velik)],
+        ):
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.shrani(odgovori)
+            self.assertEqual(response.status_code, 201)
+            stevila.append(len(ctx.captured_queries))
+        self.assertEqual(response.json()['vstavljeni'] + response.json()['posodobljeni'], 500)
+        self.assertEqual(stevila[0], stevila[1])
+        self.assertLessEqual(stevila[1], 20)
+
+    def test_single_post_upserts(self):
+        podatki = {'vprasanje': self.vprasanja[0].id, 'serijska_stevilka': self.serijske[0].id}
+        Odgovor.objects.filter(**{f'{k}_id': v for k, v in podatki.items()}).delete()
+
+        response = self.client.post('/api/odgovori/', {**podatki, 'odgovor': 'Da'})
+        self.assertEqual(response.status_code, 201, response.content)
+        response = self.client.post('/api/odgovori/', {**podatki, 'odgovor': 'Ne'})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['odgovor'], 'Ne')
+        self.assertEqual(Odgovor.objects.filter(**{f'{k}_id': v for k, v in podatki.items()}).count(), 1)
+
+        response = self.client.post('/api/odgovori/', {**podatki, 'vprasanje': 999999, 'odgovor': 'Da'})
+        self.assertEqual(response.status_code, 400)
+
+
+class AnswerDedupMigrationTests(MigrationTestCase):
+    migrate_from = '0002_logsprememb_entiteta'
+    migrate_to = '0003_odgovor_unikaten'
+
+    def pripravi(self, apps):
+        Odgovor = apps.get_model('checklist', 'Odgovor')
+        serijska, (prvo, drugo) = ustvari_star_projekt(apps, 'P1', st_vprasanj=2)
+        cas = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+        odgovori = [
+            Odgovor.objects.create(vprasanje=prvo, serijska_stevilka=serijska, odgovor=besedilo)
+            for besedilo in ('star', 'najnovejši', 'vmesni')
+        ]
+        for odgovor, minute in zip(odgovori, (0, 30, 10)):
+            Odgovor.objects.filter(id=odgovor.id).update(updated_at=cas + datetime.timedelta(minutes=minute))
+        # Pri enakem času obdrži višji id
+        enaka = [Odgovor.objects.create(vprasanje=drugo, serijska_stevilka=serijska, odgovor=b) for b in ('a', 'b')]
+        Odgovor.objects.filter(id__in=[o.id for o in enaka]).update(updated_at=cas)
+        self.ohranjeni = {odgovori[1].id, enaka[1].id}
+
+    def test_latest_duplicate_survives(self):
+        Odgovor = self.apps.get_model('checklist', 'Odgovor')
+        self.assertEqual(set(Odgovor.objects.values_list('id', flat=True)), self.ohranjeni)
+        self.assertEqual(sorted(Odgovor.objects.values_list('odgovor', flat=True)), ['b', 'najnovejši'])
+
+
+class ProgressTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='tester', password='geslo')
+        self.client.force_login(self.user)
+        # 2 segmenta po 3 vprašanja, 3 serijske številke, vsi odgovori "Da"
+        self.projekt = ustvari_projekt('P1', st_segmentov=2, st_vprasanj=3, st_ponovitev=3)
+        self.vprasanja = list(Vprasanje.objects.filter(segment__tip__projekttip__projekt=self.projekt).order_by('id'))
+        Vprasanje.objects.filter(id=self.vprasanja[0].id).update(obvezno=False)
+        recompute_progress()
+        self.serijska = SerijskaStevilka.objects.filter(projekt=self.projekt).order_by('id').first()
+
+    def stevci(self, model, pk):
+        return model.objects.filter(pk=pk).values('odgovorjeni', 'odgovorjeni_obvezni', 'vsa_obvezna').get()
+
+    def preveri_ujemanje_z_izracunom(self):
+        """Sprotno vzdrževani števci se morajo ujemati s ponovnim izračunom."""
+        sprotni = (
+            list(NapredekSerijske.objects.order_by('pk').values()),
+            list(NapredekProjekta.objects.order_by('pk').values('pk', 'serijske_stevilke', 'odgovorjeni',
+                                                               'odgovorjeni_obvezni', 'vsa_obvezna')),
+        )
+        recompute_progress()
+        izracunani = (
+            list(NapredekSerijske.objects.order_by('pk').values()),
+            list(NapredekProjekta.objects.order_by('pk').values('pk', 'serijske_stevilke', 'odgovorjeni',
+                                                               'odgovorjeni_obvezni', 'vsa_obvezna')),
+        )
+        for sprotna, izracunana in zip(sprotni[0], izracunani[0]):
+            for polje in ('odgovorjeni', 'odgovorjeni_obvezni', 'vsa_obvezna'):
+                self.assertEqual(sprotna[polje], izracunana[polje], (sprotna, izracunana))
+        self.assertEqual(sprotni[1], izracunani[1])
+
+    def test_recompute(self):
+        self.assertEqual(self.stevci(NapredekSerijske, self.serijska.id),
+                         {'odgovorjeni': 6, 'odgovorjeni_obvezni': 5, 'vsa_obvezna': 5})
+        self.assertEqual(self.stevci(NapredekProjekta, 'P1'),
+                         {'odgovorjeni': 18, 'odgovorjeni_obvezni': 15, 'vsa_obvezna': 15})
+
+    def test_batch_updates_counters_incrementally(self):
+        response = self.client.post('/api/odgovori/batch/', [
+            {'vprasanje': self.vprasanja[0].id, 'serijska_stevilka': self.serijska.id, 'odgovor': ''},
+            {'vprasanje': self.vprasanja[1].id, 'serijska_stevilka': self.serijska.id, 'odgovor': ''},
+            {'vprasanje': self.vprasanja[2].id, 'serijska_stevilka': self.serijska.id, 'odgovor': 'Ne'},
+        ], content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.stevci(NapredekSerijske, self.serijska.id),
+                         {'odgovorjeni': 4, 'odgovorjeni_obvezni': 4, 'vsa_obvezna': 5})
+        self.assertEqual(self.stevci(NapredekProjekta, 'P1')['odgovorjeni'], 16)
+        self.assertIsNotNone(NapredekSerijske.objects.get(pk=self.serijska.id).zadnja_aktivnost)
+        self.preveri_ujemanje_z_izracunom()
+
+    def test_single_answer_endpoints(self):
+        odgovor = Odgovor.objects.get(vprasanje=self.vprasanja[1], serijska_stevilka=self.serijska)
+        self.assertEqual(self.client.delete(f'/api/odgovori/{odgovor.id}/').status_code, 204)
+        self.assertEqual(self.stevci(NapredekSerijske, self.serijska.id)['odgovorjeni_obvezni'], 4)
+
+        response = self.client.post('/api/odgovori/', {
+            'vprasanje': self.vprasanja[1].id, 'serijska_stevilka': self.serijska.id, 'odgovor': 'Ne'
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.stevci(NapredekSerijske, self.serijska.id)['odgovorjeni_obvezni'], 5)
+
+        # Premik odgovora na neobvezno vprašanje
+        neobvezen = Odgovor.objects.get(vprasanje=self.vprasanja[0], serijska_stevilka=self.serijska)
+        self.assertEqual(self.client.delete(f'/api/odgovori/{neobvezen.id}/').status_code, 204)
+        response = self.client.patch(
+            f'/api/odgovori/{response.json()["id"]}/', {'vprasanje': self.vprasanja[0].id},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.stevci(NapredekSerijske, self.serijska.id),
+                         {'odgovorjeni': 5, 'odgovorjeni_obvezni': 4, 'vsa_obvezna': 5})
+        self.preveri_ujemanje_z_izracunom()
+
+    def test_template_change_recomputes_totals(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f'/api/vprasanja/{self.vprasanja[0].id}/', {'obvezno': True}, content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.stevci(NapredekProjekta, 'P1'),
+                         {'odgovorjeni': 18, 'odgovorjeni_obvezni': 18, 'vsa_obvezna': 18})
+
+    def test_new_project_and_endpoints(self):
+        tip = self.projekt.projekt_tipi.get().tip_id
+        response = self.client.post('/api/projekti/', {
+            'id': 'P2', 'osebna_stevilka': '1', 'datum': '2025-01-01', 'tip': tip, 'stevilo_ponovitev': 2
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.stevci(NapredekProjekta, 'P2'),
+                         {'odgovorjeni': 0, 'odgovorjeni_obvezni': 0, 'vsa_obvezna': 10})
+
+        projekti = {p['id']: p for p in self.client.get('/api/projekti/?paginate=false').json()}
+        self.assertEqual(projekti['P1']['napredek']['odgovorjeni_obvezni'], 15)
+        self.assertEqual(projekti['P2']['napredek']['serijske_stevilke'], 2)
+
+        podrobno = self.client.get('/api/projekti/P1/napredek/').json()
+        self.assertEqual(podrobno['napredek']['vsa_obvezna'], 15)
+        self.assertEqual([s['stevilka'] for s in podrobno['serijske_stevilke']], ['P1-%d-%d' % (tip, i) for i in (1, 2, 3)])
+
+    def test_command(self):
+        NapredekSerijske.objects.all().delete()
+        NapredekProjekta.objects.all().delete()
+        call_command('recompute_progress', projekt=['P1'], stdout=io.StringIO())
+        self.assertEqual(self.stevci(NapredekProjekta, 'P1')['odgovorjeni'], 18)
+        self.assertEqual(NapredekSerijske.objects.count(), 3)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='tester', password='geslo')
+        self.client.force_login(self.user)
+        self.projekt = ustvari_projekt('P1', st_segmentov=2, st_vprasanj=3, st_ponovitev=3)
+        ustvari_projekt('P2', st_segmentov=1, st_vprasanj=2, st_ponovitev=1)
+        self.vprasanje = Vprasanje.objects.filter(segment__tip__projekttip__projekt=self.projekt).order_by('id').first()
+        self.serijska = SerijskaStevilka.objects.filter(projekt=self.projekt).order_by('id').first()
+
+    def isci(self, **parametri):
+        response = self.client.get('/api/search/', parametri)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def odgovori(self, besedilo):
+        response = self.client.post('/api/odgovori/batch/', [
+            {'vprasanje': self.vprasanje.id, 'serijska_stevilka': self.serijska.id, 'odgovor': besedilo},
+        ], content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_diacritics_and_prefix(self):
+        self.odgovori('Opažena poškodba ohišja')
+        for q in ('poskodba', 'POŠKODBA', 'ohis', 'opazena posk'):
+            rezultat = self.isci(q=q)
+            self.assertEqual(rezultat['count'], 1, q)
+        zadetek = rezultat['results'][0]
+        self.assertEqual(zadetek['vrsta'], 'odgovor')
+        self.assertEqual(zadetek['projekt_id'], 'P1')
+        self.assertEqual(zadetek['serijska_stevilka'], self.serijska.stevilka)
+        self.assertEqual(zadetek['vprasanje_id'], self.vprasanje.id)
+        self.assertIn('«poškodba»', zadetek['izsek'])
+
+    def test_index_follows_writes(self):
+        self.odgovori('Opažena poškodba')
+        self.odgovori('Brez napak')
+        self.assertEqual(self.isci(q='poskodba')['count'], 0)
+        self.assertEqual(self.isci(q='napak')['count'], 1)
+
+        self.client.patch(f'/api/vprasanja/{self.vprasanje.id}/', {'opis': 'Preveri tesnilo'},
+                          content_type='application/json')
+        self.assertEqual([z['id'] for z in self.isci(q='tesnilo', vrsta='vprasanje')['results']],
+                         [self.vprasanje.id])
+
+        self.assertEqual(self.client.delete('/api/projekti/P1/').status_code, 204)
+        self.assertEqual(self.isci(q='napak')['count'], 0)
+        self.assertEqual(self.isci(q='P1')['count'], 0)
+        self.assertEqual({z['vrsta'] for z in self.isci(q='P2')['results']}, {'projekt', 'serijska_stevilka'})
+
+    def test_filters_ranking_and_pagination(self):
+        self.assertEqual(self.isci(q='da')['count'], 20)
+        rezultat = self.isci(q='da', vrsta='odgovor', projekt='P1', page_size=5)
+        self.assertEqual(rezultat['count'], 18)
+        self.assertEqual(len(rezultat['results']), 5)
+        self.assertIsNotNone(rezultat['next'])
+        self.assertEqual({z['projekt_id'] for z in rezultat['results']}, {'P1'})
+
+        self.odgovori('Da, vendar je ohišje počeno')
+        rezultat = self.isci(q='ohisje poceno da')
+        self.assertEqual(rezultat['results'][0]['id'], Odgovor.objects.get(
+            vprasanje=self.vprasanje, serijska_stevilka=self.serijska).id)
+        # Krajši dokument z iskano besedo je bolj relevanten
+        rezultat = self.isci(q='P1-')
+        self.assertEqual(rezultat['results'][0]['vrsta'], 'projekt')
+
+    def test_invalid_queries(self):
+        self.assertEqual(self.client.get('/api/search/', {'q': ' "*- '}).status_code, 400)
+        self.assertEqual(self.client.get('/api/search/', {'q': 'da', 'vrsta': 'tip'}).status_code, 400)
+        self.assertEqual(self.isci(q='da" OR "ne')['count'], 0)
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM checklist_iskanje')
+        self.assertEqual(self.isci(q='da')['count'], 0)
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        self.assertEqual(self.isci(q='da')['count'], 20)
+        self.assertEqual(self.isci(q='vprasanje', vrsta='vprasanje')['count'], 8)
+
+
+class StartupTests(TestCase):
+    def test_worker_startup_does_not_import_heavy_exporters(self):
+        out = io.StringIO()
+        call_command('startup_benchmark', ponovitve=1, json=True, stdout=out)
+        self.assertEqual(json.loads(out.getvalue())['tezki_moduli'], [])
+
+    def test_download_template_loads_exporter_on_demand(self):
+        tip = Tip.objects.create(naziv='Tip')
+        self.client.force_login(User.objects.create_user(username='tester', password='geslo'))
+        response = self.client.get(f'/api/tipi/{tip.id}/download-template/')
+        self.assertEqual(response.status_code, 200)
+        workbook = openpyxl.load_workbook(io.BytesIO(response.content))
+        self.assertEqual(workbook.sheetnames, ['Vzorec', 'Navodila'])
+
+
+class SyntheticDataCommandTests(TestCase):
+    def test_generate_and_benchmark(self):
+        call_command(
+            'generate_synthetic_data', tipi=2, segmenti=2, vprasanja=3, projekti=2, serijske=4,
+            stdout=io.StringIO()
+        )
+        self.assertEqual(Projekt.objects.filter(id__startswith='SYN-').count(), 2)
+        self.assertEqual(Odgovor.objects.count(), 2 * 4 * 2 * 3)
+
+        out = io.StringIO()
+        call_command('benchmark_endpoints', ponovitve=1, brez_izvozov=True, samo=['projekt'], stdout=out)
+        porocilo = json.loads(out.getvalue())
+        self.assertTrue(porocilo['koncne_tocke'])
+        for tocka in porocilo['koncne_tocke']:
+            self.assertEqual(tocka['status'], 200, tocka['ime'])
+            self.assertGreater(tocka['poizvedbe'], 0)
+
+
+
+@override_settings(METRIKE_ZAHTEV=True)
+class PerformanceMiddlewareTests(TestCase):
+    def setUp(self):
+        ponastavi_metrike()
+        ustvari_projekt('MET', st_segmentov=1, st_vprasanj=2, st_ponovitev=2)
+        self.user = User.objects.create_user(username='admin', password='geslo', is_staff=True)
+        self.client.force_login(self.user)
+
+    def test_server_timing_and_metrics(self):
+        for _ in range(3):
+            response = self.client.get('/api/projekti/MET/snapshot/')
+            self.assertEqual(response.status_code, 200)
+        self.assertRegex(
+            response['Server-Timing'],
+            r'^db;dur=[\d.]+;desc="[1-9]\d* poizvedb", render;dur=[\d.]+, total;dur=[\d.]+$'
+        )
+
+        povzetek = self.client.get('/api/metrics/').json()
+        snapshot = povzetek['GET projekt-snapshot']
+        self.assertEqual(snapshot['stevilo'], 3)
+        self.assertGreater(snapshot['poizvedbe']['p50'], 0)
+        self.assertLessEqual(snapshot['cas_ms']['p50'], snapshot['cas_ms']['max'])
+
+        self.assertEqual(self.client.delete('/api/metrics/').status_code, 204)
+        self.assertNotIn('GET projekt-snapshot', self.client.get('/api/metrics/').json())
+
+    def test_metrics_require_staff(self):
+        self.client.force_login(User.objects.create_user(username='tester', password='geslo'))
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+
+    def test_request_metric_is_logged_at_debug_without_propagation(self):
+        with self.assertNoLogs('checklist.middleware', level='INFO'):
+            self.client.get('/api/projekti/MET/snapshot/')
+        with self.assertLogs('checklist.middleware', level='DEBUG') as dnevnik:
+            self.client.get('/api/projekti/MET/snapshot/')
+        self.assertIn('"pot": "GET projekt-snapshot"', dnevnik.output[0])
+        self.assertFalse(logging.getLogger('checklist.middleware').propagate)
+
+    @override_settings(METRIKE_ZAHTEV=False)
+    def test_disabled_metrics_skip_header_and_recording(self):
+        response = self.client.get('/api/projekti/MET/snapshot/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Server-Timing', response)
+        self.assertNotIn('GET projekt-snapshot', self.client.get('/api/metrics/').json())
+
+
+class SqliteBackendTests(TestCase):
+    def test_connection_pragmas(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+        self.assertGreater(connection.features.max_query_params, 999)
@@ -3,7 +3,8 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     TipViewSet, ProjektViewSet, SegmentViewSet, VprasanjeViewSet,
     SerijskaStevilkaViewSet, OdgovorViewSet, NastavitevViewSet,
-    ProfilViewSet, LogSpremembViewSet, LoginView, LogoutView, RegisterView, CsrfView, UserView, UserViewSet, ChangePasswordView
+    ProfilViewSet, LogSpremembViewSet, IzvozniPoselViewSet, LoginView, LogoutView, RegisterView, CsrfView, UserView, UserViewSet, ChangePasswordView,
+    MetricsView, SearchView
 )
 
 router = DefaultRouter()
@@ -16,6 +17,7 @@ router.register(r'odgovori', OdgovorViewSet)
 router.register(r'nastavitve', NastavitevViewSet)
 router.register(r'profili', ProfilViewSet)
 router.register(r'logi', LogSpremembViewSet)
+router.register(r'izvozi', IzvozniPoselViewSet)
 router.register(r'auth/users', UserViewSet, basename='user')
 
 urlpatterns = [
@@ -26,5 +28,7 @@ urlpatterns = [
     path('auth/change-password/', ChangePasswordView.as_view(), name='change-password'),
     path('auth/csrf/', CsrfView.as_view(), name='csrf'),
     path('auth/user/', UserView.as_view(), name='user'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+    path('search/', SearchView.as_view(), name='search'),
     path('segmenti/<int:pk>/vprasanja/', SegmentViewSet.as_view({'get': 'vprasanja'}), name='segment-vprasanja'),
 ] 
\ No newline at end of file
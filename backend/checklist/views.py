@@ -1,46 +1,51 @@
 from django.shortcuts import render
-from rest_framework import viewsets, permissions, status
+from rest_framework import viewsets, mixins, permissions, status, serializers
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
 from django.contrib.auth.models import User
 from django.contrib.auth import login, logout
 from rest_framework.views import APIView
 from .models import (
     Tip, Projekt, Segment, Vprasanje, SerijskaStevilka,
-    Odgovor, Nastavitev, Profil, LogSprememb, ProjektTip
+    Odgovor, Nastavitev, Profil, LogSprememb, ProjektTip, IzvozniPosel, NapredekSerijske,
+    projekt_entitete, razcleni_spremembo
 )
 from .serializers import (
     TipSerializer, ProjektSerializer, SegmentSerializer, VprasanjeSerializer,
     SerijskaStevilkaSerializer, OdgovorSerializer, NastavitevSerializer,
-    ProfilSerializer, LogSpremembSerializer, UserSerializer
+    ProfilSerializer, LogSpremembSerializer, UserSerializer, IzvozniPoselSerializer,
+    NapredekProjektaSerializer, NapredekSerijskeSerializer, TipiProjektaSerializer
 )
+from .matrix import load_answer_matrix
+from .pagination import SearchPagination, is_unpaginated
+from .mixins import ConditionalListMixin, OptimizedQuerysetMixin
+from .template_cache import get_template, get_templates
+from .registry import (
+    ExportError, PDF_NACINI, get_exporter, get_importer, get_template_writer, xlsx_filename, pdf_filename
+)
+from .export_cache import open_export, invalidate_project
+from .archive import ArchiveError, iter_archive_json, iter_archive_ndjson_gz, iter_archives_zip, archive_filename
+from .answers import validate_answers, upsert_answers
+from .progress import apply_answer_changes, recompute_progress
+from .search import VRSTE, SearchResults, fts_query
+from .jobs import submit_export
+from .middleware import povzetek_metrik, ponastavi_metrike
 from rest_framework.permissions import AllowAny
 from django.views.decorators.csrf import ensure_csrf_cookie
 from django.utils.decorators import method_decorator
-import pandas as pd
+import datetime
 import io
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse, FileResponse
 from django.db import transaction
+from django.conf import settings
 import json
 from django.utils import timezone
-from django.db.models import Q
-import openpyxl.styles
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib import colors
-import os
-
-# Registracija pisave DejaVu, ki podpira slovenske znake
-FONT_PATH = os.path.join(os.path.dirname(__file__), 'fonts', 'DejaVuSans.ttf')
-pdfmetrics.registerFont(TTFont('DejaVu', FONT_PATH))
+from django.db.models import Q, Prefetch
 
 # Create your views here.
 
-class TipViewSet(viewsets.ModelViewSet):
+class TipViewSet(OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Tip.objects.all()
     serializer_class = TipSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -48,61 +53,9 @@ class TipViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['GET'], url_path='download-template')
     def download_template(self, request, pk=None):
         """Prenesi vzorčno XLSX datoteko za uvoz vprašanj."""
-        # Ustvarimo vzorčne podatke
-        data = {
-            'segment': ['Pokrov igralnega mesta', 'Pokrov igralnega mesta', 'Maska sistema', 'Maska sistema'],
-            'question': [
-                'Ali je monitor brez poškodb?', 
-                'Pravilno zapiranje nastavljen zaklep', 
-                'BA ustnik pritjen',
-                'Serijska številka (PT projekta)'
-            ],
-            'type': ['boolean', 'boolean', 'boolean', 'text'],
-            'required': ['true', 'true', 'true', 'true'],
-            'description': [
-                'Preveri stanje monitorja', 
-                'Preveri delovanje zaklepa', 
-                'Preveri pritrditev ustnika',
-                'Vnesi serijsko številko PT projekta'
-            ],
-            'options': ['', '', '', ''],
-            'repeatable': ['true', 'true', 'false', 'false']  # Dodano polje za ponovljivost
-        }
-        
-        # Ustvarimo DataFrame
-        df = pd.DataFrame(data)
-        
-        # Ustvarimo Excel datoteko v pomnilniku
         excel_file = io.BytesIO()
-        
-        # Dodamo list z navodili
-        with pd.ExcelWriter(excel_file, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='Vzorec')
-            
-            # Dodamo list z navodili
-            navodila = pd.DataFrame({
-                'Polje': ['segment', 'question', 'type', 'required', 'description', 'options', 'repeatable'],
-                'Opis': [
-                    'Ime segmenta vprašanj',
-                    'Besedilo vprašanja',
-                    'Tip vprašanja (boolean, text, number, multiple_choice)',
-                    'Ali je odgovor obvezen (true/false)',
-                    'Dodatni opis vprašanja',
-                    'Možni odgovori za multiple_choice tip (ločeni z vejico)',
-                    'Ali se vprašanje lahko ponovi (true/false)'
-                ],
-                'Primer': [
-                    'Pokrov igralnega mesta',
-                    'Ali je monitor brez poškodb?',
-                    'boolean',
-                    'true',
-                    'Preveri stanje monitorja',
-                    'Da,Ne,n/a',
-                    'true'
-                ]
-            })
-            navodila.to_excel(writer, index=False, sheet_name='Navodila')
-        
+        get_template_writer()(excel_file)
+
         # Pripravimo odgovor
         excel_file.seek(0)
         response = HttpResponse(
@@ -131,59 +84,13 @@ class TipViewSet(viewsets.ModelViewSet):
             )
 
         try:
-            # Branje XLSX datoteke
-            print(f"Berem datoteko: {xlsx_file.name}, velikost: {xlsx_file.size} bajtov")
-            df = pd.read_excel(xlsx_file)
-            print(f"Prebrane vrstice: {len(df)}")
-            print(f"Stolpci: {list(df.columns)}")
-            print(f"Tipi podatkov:\n{df.dtypes}")
-            
-            # Pretvorba NaN vrednosti v None in čiščenje podatkov
-            df = df.replace({pd.NA: None})
-            df = df.fillna('')  # Prazne vrednosti namesto NaN
-            
-            # Pretvorba boolean vrednosti
-            if 'required' in df.columns:
-                df['required'] = df['required'].map(lambda x: str(x).lower() == 'true')
-            if 'repeatable' in df.columns:
-                df['repeatable'] = df['repeatable'].map(lambda x: str(x).lower() == 'true')
-            
-            # Shranjevanje podatkov v bazo
-            with transaction.atomic():
-                # Izbrišemo obstoječe segmente za ta tip
-                tip.tip_segmenti.all().delete()
-                
-                # Ustvarimo slovar za sledenje segmentom
-                segmenti = {}
-                
-                # Iteriramo čez vsako vrstico
-                for _, row in df.iterrows():
-                    segment_naziv = row['segment']
-                    
-                    # Pridobimo ali ustvarimo segment
-                    if segment_naziv not in segmenti:
-                        segment = Segment.objects.create(
-                            tip=tip,
-                            naziv=segment_naziv
-                        )
-                        segmenti[segment_naziv] = segment
-                    else:
-                        segment = segmenti[segment_naziv]
-                    
-                    # Ustvarimo vprašanje
-                    Vprasanje.objects.create(
-                        segment=segment,
-                        vprasanje=row['question'],
-                        tip=row['type'],
-                        repeatability=row['repeatable'] if 'repeatable' in row else False,
-                        obvezno=row['required'],
-                        opis=row['description'] if pd.notna(row['description']) else '',
-                        moznosti=row['options'] if pd.notna(row['options']) else ''
-                    )
-            
+            # Branje XLSX datoteke in usklajevanje z obstoječimi vprašanji
+            st_vrstic, povzetek = get_importer('predloga')(tip, xlsx_file)
+
             return Response({
                 'sporočilo': 'Podatki uspešno uvoženi',
-                'število_vrstic': len(df)
+                'število_vrstic': st_vrstic,
+                'spremembe': povzetek
             }, status=status.HTTP_200_OK)
             
         except Exception as e:
@@ -198,150 +105,48 @@ class TipViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-class ProjektViewSet(viewsets.ModelViewSet):
+class ProjektViewSet(ConditionalListMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Projekt.objects.all()
     serializer_class = ProjektSerializer
     permission_classes = [permissions.IsAuthenticated]
+    etag_povezave = ('projekt_tipi', 'projekt_tipi__tip', 'napredek')
+    akcije_iz_serializerja = ('list', 'retrieve', 'export_json')
+    optimizacija = {
+        'tipi': {'prefetch_related': (Prefetch(
+            'projekt_tipi',
+            queryset=ProjektTip.objects.select_related('tip').prefetch_related(Prefetch(
+                'serijske_stevilke',
+                queryset=SerijskaStevilka.objects.only('id', 'projekt_tip_id', 'stevilka').order_by('id')
+            ))
+        ),)},
+        'snapshot': {
+            'select_related': ('napredek',),
+            'prefetch_related': (
+                Prefetch('projekt_tipi', queryset=ProjektTip.objects.select_related('tip').order_by('id')),
+            ),
+        },
+    }
 
     @action(detail=True, methods=['GET'], url_path='export-archive')
     def export_archive(self, request, pk=None):
-        """Izvozi celoten projekt v arhivski JSON format."""
+        """Izvozi celoten projekt v arhiv.
+
+        Privzeto vrne JSON format v1.0.0, z ``?verzija=2`` pa arhiv v2 (gzip
+        stisnjen NDJSON). Arhiv se generira sproti po kosih, zato poraba
+        pomnilnika ni odvisna od števila odgovorov in prvi bajti prispejo takoj.
+        """
         try:
-            print(f"Začenjam izvoz projekta {pk}")
             projekt = self.get_object()
-            print(f"Projekt najden: {projekt.id}")
-            
-            # Osnovni podatki o izvozu
-            export_data = {
-                "meta": {
-                    "version": "1.0.0",
-                    "export_date": timezone.now().isoformat(),
-                    "application": "Kontrolni Seznam",
-                },
-                "projekt": {
-                    "id": projekt.id,
-                    "osebna_stevilka": projekt.osebna_stevilka,
-                    "datum": projekt.datum.isoformat(),
-                    "created_at": projekt.created_at.isoformat(),
-                    "updated_at": projekt.updated_at.isoformat(),
-                },
-                "tipi": [],
-                "segmenti": [],
-                "serijske_stevilke": [],
-                "odgovori": [],
-                "spremembe": []
-            }
-            
-            print("Dodajam podatke o tipih")
-            # Dodaj podatke o tipih
-            for projekt_tip in projekt.projekt_tipi.all():
-                print(f"Obdelujem tip: {projekt_tip.tip.id}")
-                tip_data = {
-                    "id": projekt_tip.tip.id,
-                    "naziv": projekt_tip.tip.naziv,
-                    "stevilo_ponovitev": projekt_tip.stevilo_ponovitev,
-                    "created_at": projekt_tip.created_at.isoformat(),
-                }
-                export_data["tipi"].append(tip_data)
-                
-                print(f"Dodajam segmente za tip {projekt_tip.tip.id}")
-                # Dodaj segmente za ta tip
-                for segment in Segment.objects.filter(tip=projekt_tip.tip):
-                    print(f"Obdelujem segment: {segment.id}")
-                    segment_data = {
-                        "id": segment.id,
-                        "naziv": segment.naziv,
-                        "tip_id": segment.tip.id,
-                        "vprasanja": []
-                    }
-                    
-                    # Dodaj vprašanja za segment
-                    for vprasanje in segment.vprasanja.all():
-                        print(f"Obdelujem vprašanje: {vprasanje.id}")
-                        vprasanje_data = {
-                            "id": vprasanje.id,
-                            "vprasanje": vprasanje.vprasanje,
-                            "tip": vprasanje.tip,
-                            "obvezno": vprasanje.obvezno,
-                            "opis": vprasanje.opis,
-                            "moznosti": vprasanje.moznosti,
-                            "repeatability": vprasanje.repeatability
-                        }
-                        segment_data["vprasanja"].append(vprasanje_data)
-                    
-                    export_data["segmenti"].append(segment_data)
-            
-            print("Dodajam serijske številke")
-            # Dodaj serijske številke
-            for st in projekt.serijske_stevilke.all():
-                print(f"Obdelujem serijsko številko: {st.id}")
-                st_data = {
-                    "id": st.id,
-                    "stevilka": st.stevilka,
-                    "tip_id": st.projekt_tip.tip.id,
-                    "created_at": st.created_at.isoformat()
-                }
-                export_data["serijske_stevilke"].append(st_data)
-                
-                print(f"Dodajam odgovore za serijsko številko {st.id}")
-                # Dodaj odgovore za to serijsko številko
-                for odgovor in st.odgovori.all():
-                    print(f"Obdelujem odgovor: {odgovor.id}")
-                    odgovor_data = {
-                        "id": odgovor.id,
-                        "vprasanje_id": odgovor.vprasanje.id,
-                        "serijska_stevilka_id": st.id,
-                        "odgovor": odgovor.odgovor,
-                        "created_at": odgovor.created_at.isoformat(),
-                        "updated_at": odgovor.updated_at.isoformat()
-                    }
-                    
-                    # Pridobi podatke o uporabniku iz LogSprememb
-                    log = LogSprememb.objects.filter(
-                        sprememba__contains=f"odgovor_{odgovor.id}"
-                    ).order_by('-cas').first()
-                    
-                    if log:
-                        odgovor_data["uporabnik"] = {
-                            "osebna_stevilka": log.uporabnik.username,
-                            "ime": log.uporabnik.first_name,
-                            "priimek": log.uporabnik.last_name
-                        }
-                    
-                    export_data["odgovori"].append(odgovor_data)
-            
-            print("Dodajam zgodovino sprememb")
-            # Dodaj zgodovino sprememb
-            for log in LogSprememb.objects.filter(
-                Q(sprememba__contains=f"projekt_{projekt.id}") |
-                Q(sprememba__contains=f"serijska_stevilka_{','.join(str(ss.id) for ss in projekt.serijske_stevilke.all())}")
-            ):
-                print(f"Obdelujem log: {log.id}")
-                log_data = {
-                    "id": log.id,
-                    "cas": log.cas.isoformat(),
-                    "sprememba": log.sprememba,
-                    "stara_vrednost": log.stara_vrednost,
-                    "nova_vrednost": log.nova_vrednost,
-                    "uporabnik": log.uporabnik.username
-                }
-                export_data["spremembe"].append(log_data)
-            
-            print("Ustvarjam JSON response")
-            # Ustvari JSON response
-            response = HttpResponse(
-                json.dumps(export_data, indent=2, ensure_ascii=False),
-                content_type='application/json'
-            )
-            
-            # Generiraj ime datoteke
-            filename = f"Projekt_{projekt.id}_arhiv_{timezone.now().strftime('%Y%m%d_%H%M%S')}.json"
-            filename = "".join(c for c in filename if c.isalnum() or c in (' ', '-', '_', '.'))
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
-            
-            print("Izvoz uspešno zaključen")
+
+            if request.query_params.get('verzija') == '2':
+                response = StreamingHttpResponse(iter_archive_ndjson_gz(projekt), content_type='application/gzip')
+                ime_datoteke = archive_filename(projekt)
+            else:
+                response = StreamingHttpResponse(iter_archive_json(projekt), content_type='application/json')
+                ime_datoteke = archive_filename(projekt, koncnica='json')
+            response['Content-Disposition'] = f'attachment; filename="{ime_datoteke}"'
             return response
-            
+
         except Exception as e:
             print(f"Napaka pri izvozu: {str(e)}")
             import traceback
@@ -352,7 +157,7 @@ class ProjektViewSet(viewsets.ModelViewSet):
     def export_json(self, request):
         """Izvozi vse projekte v JSON format."""
         try:
-            projekti = self.get_queryset()
+            projekti = self.filter_queryset(self.get_queryset())
             serializer = self.get_serializer(projekti, many=True)
             
             # Ustvarimo JSON response
@@ -369,65 +174,121 @@ class ProjektViewSet(viewsets.ModelViewSet):
         except Exception as e:
             return Response({'error': str(e)}, status=500)
 
+    @action(detail=False, methods=['GET'], url_path='export-archives')
+    def export_archives(self, request):
+        """Izvozi arhive v2 izbranih projektov kot en zip.
+
+        Filtri: ``datum_od`` in ``datum_do`` (YYYY-MM-DD), ``osebna_stevilka``,
+        ``tip`` (id tipa) in ``id`` (lahko večkrat ali ločeni z vejico). Brez
+        filtrov se izvozijo vsi projekti. Zip se generira sproti, projekt za projektom.
+        """
+        try:
+            projekti = Projekt.objects.all()
+            for parameter, polje in (('datum_od', 'datum__gte'), ('datum_do', 'datum__lte')):
+                vrednost = request.query_params.get(parameter)
+                if vrednost:
+                    try:
+                        projekti = projekti.filter(**{polje: datetime.date.fromisoformat(vrednost)})
+                    except ValueError:
+                        return Response({'error': f'Neveljaven datum {parameter}: {vrednost}'}, status=400)
+            if request.query_params.get('osebna_stevilka'):
+                projekti = projekti.filter(osebna_stevilka=request.query_params['osebna_stevilka'])
+            if request.query_params.get('tip'):
+                if not request.query_params['tip'].isdigit():
+                    return Response({'error': f"Neveljaven tip: {request.query_params['tip']}"}, status=400)
+                projekti = projekti.filter(projekt_tipi__tip_id=request.query_params['tip']).distinct()
+            ids = [i for vrednost in request.query_params.getlist('id') for i in vrednost.split(',') if i]
+            if ids:
+                projekti = projekti.filter(id__in=ids)
+
+            if not projekti.exists():
+                return Response({'error': 'Ni projektov za izbrane filtre'}, status=status.HTTP_404_NOT_FOUND)
+
+            response = StreamingHttpResponse(
+                iter_archives_zip(projekti.order_by('id').values_list('id', flat=True).iterator(chunk_size=500)),
+                content_type='application/zip'
+            )
+            response['Content-Disposition'] = (
+                f'attachment; filename="projekti_arhiv_{timezone.now().strftime("%Y%m%d_%H%M%S")}.zip"'
+            )
+            return response
+
+        except Exception as e:
+            print(f"Napaka pri izvozu: {str(e)}")
+            import traceback
+            print(traceback.format_exc())
+            return Response({'error': str(e)}, status=500)
+
     def create(self, request, *args, **kwargs):
+        """Ustvari projekt ali mu dodaj tipe in generiraj serijske številke.
+
+        Tipe lahko podamo posamično (``tip``, ``stevilo_ponovitev``) ali kot
+        seznam ``tipi`` z enakimi ključi. Vse serijske številke se ustvarijo
+        z enim paketnim vnosom v isti transakciji.
+        """
         try:
             projekt_id = request.data.get('id')
-            tip_id = request.data.get('tip')
-            stevilo_ponovitev = request.data.get('stevilo_ponovitev', 1)
+            tipi = request.data.get('tipi')
+            if tipi is None:
+                tipi = [{
+                    'tip': request.data.get('tip'),
+                    'stevilo_ponovitev': request.data.get('stevilo_ponovitev', 1)
+                }]
+
+            vnos = TipiProjektaSerializer(data={'tipi': tipi})
+            if not vnos.is_valid():
+                return Response(vnos.errors, status=status.HTTP_400_BAD_REQUEST)
+            tipi = vnos.validated_data['tipi']
 
-            # Preveri če projekt že obstaja
-            projekt = Projekt.objects.filter(id=projekt_id).first()
-            
-            if projekt:
-                # Projekt obstaja, dodaj nov tip
-                if ProjektTip.objects.filter(projekt=projekt, tip_id=tip_id).exists():
-                    return Response(
-                        {'error': f'Projekt {projekt_id} že ima tip {tip_id}'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                
-                # Ustvari nov ProjektTip
-                projekt_tip = ProjektTip.objects.create(
-                    projekt=projekt,
-                    tip_id=tip_id,
-                    stevilo_ponovitev=stevilo_ponovitev
-                )
-                
-                # Generiraj serijske številke
-                for i in range(stevilo_ponovitev):
-                    SerijskaStevilka.objects.create(
+            with transaction.atomic():
+                # Preveri če projekt že obstaja
+                projekt = Projekt.objects.filter(id=projekt_id).first()
+
+                if projekt:
+                    # Projekt obstaja, preveri da tipov še nima
+                    obstojeci = ProjektTip.objects.filter(
                         projekt=projekt,
-                        projekt_tip=projekt_tip,
-                        stevilka=f"{projekt_id}-{tip_id}-{i+1}"
-                    )
-                
-                return Response(self.serializer_class(projekt).data)
-            else:
-                # Ustvari nov projekt
-                with transaction.atomic():
+                        tip_id__in=[tip_data['tip'] for tip_data in tipi]
+                    ).values_list('tip_id', flat=True).first()
+                    if obstojeci is not None:
+                        return Response(
+                            {'error': f'Projekt {projekt_id} že ima tip {obstojeci}'},
+                            status=status.HTTP_400_BAD_REQUEST
+                        )
+                else:
+                    # Ustvari nov projekt
                     projekt = Projekt.objects.create(
                         id=projekt_id,
                         osebna_stevilka=request.data.get('osebna_stevilka'),
                         datum=request.data.get('datum')
                     )
-                    
-                    # Ustvari ProjektTip
-                    projekt_tip = ProjektTip.objects.create(
+
+                # Ustvari ProjektTip-e
+                projekt_tipi = ProjektTip.objects.bulk_create([
+                    ProjektTip(
                         projekt=projekt,
-                        tip_id=tip_id,
-                        stevilo_ponovitev=stevilo_ponovitev
+                        tip_id=tip_data['tip'],
+                        stevilo_ponovitev=tip_data['stevilo_ponovitev']
                     )
-                    
-                    # Generiraj serijske številke
-                    for i in range(stevilo_ponovitev):
-                        SerijskaStevilka.objects.create(
-                            projekt=projekt,
-                            projekt_tip=projekt_tip,
-                            stevilka=f"{projekt_id}-{tip_id}-{i+1}"
-                        )
-                    
-                    return Response(self.serializer_class(projekt).data)
-                    
+                    for tip_data in tipi
+                ])
+
+                # Generiraj serijske številke
+                serijske_stevilke = SerijskaStevilka.objects.bulk_create([
+                    SerijskaStevilka(
+                        projekt=projekt,
+                        projekt_tip=projekt_tip,
+                        stevilka=f"{projekt_id}-{projekt_tip.tip_id}-{i+1}"
+                    )
+                    for projekt_tip in projekt_tipi
+                    for i in range(projekt_tip.stevilo_ponovitev)
+                ])
+                recompute_progress(projekt_ids=[projekt.id])
+
+            data = self.serializer_class(projekt).data
+            data['serijske_stevilke'] = SerijskaStevilkaSerializer(serijske_stevilke, many=True).data
+            return Response(data)
+
         except Exception as e:
             return Response(
                 {'error': str(e)},
@@ -443,7 +304,7 @@ class ProjektViewSet(viewsets.ModelViewSet):
             'projekt_id': projekt.id,
             'tipi': [
                 {
-                    'tip_id': pt.tip.id,
+                    'tip_id': pt.tip_id,
                     'tip_naziv': pt.tip.naziv,
                     'stevilo_ponovitev': pt.stevilo_ponovitev,
                     'serijske_stevilke': [
@@ -453,137 +314,96 @@ class ProjektViewSet(viewsets.ModelViewSet):
             ]
         })
 
+    @action(detail=True, methods=['GET'])
+    def napredek(self, request, pk=None):
+        """Vrni izpolnjenost projekta in vseh njegovih serijskih številk."""
+        projekt = self.get_object()
+        serijske = NapredekSerijske.objects.filter(projekt=projekt).select_related('serijska_stevilka').order_by('pk')
+        return Response({
+            'projekt_id': projekt.id,
+            'napredek': NapredekProjektaSerializer(projekt.napredek).data if hasattr(projekt, 'napredek') else None,
+            'serijske_stevilke': NapredekSerijskeSerializer(serijske, many=True).data,
+        })
+
     @action(detail=True, methods=['get'])
     def segmenti(self, request, pk=None):
         projekt = self.get_object()
-        segmenti = projekt.segmenti.all()
+        tip_ids = ProjektTip.objects.filter(projekt=projekt).values_list('tip_id', flat=True)
+        segmenti = sorted(
+            (segment for predloga in get_templates(tip_ids).values() for segment in predloga.segmenti),
+            key=lambda segment: segment.id
+        )
         serializer = SegmentSerializer(segmenti, many=True)
         return Response(serializer.data)
 
+    @action(detail=True, methods=['GET'])
+    def snapshot(self, request, pk=None):
+        """Vrni celoten kontrolni seznam projekta v enem odgovoru.
+
+        Vsebuje drevo Tip -> Segment -> Vprašanje in trenutne odgovore za vse
+        serijske številke projekta ali samo za ``?serijska=<id>``. Z ``?tip_id=``
+        se omejimo na en tip projekta.
+        """
+        projekt = self.get_object()
+        projekt_tipi = list(projekt.projekt_tipi.all())
+
+        tip_id = request.query_params.get('tip_id', None)
+        if tip_id is not None:
+            projekt_tipi = [pt for pt in projekt_tipi if str(pt.tip_id) == tip_id]
+            if not projekt_tipi:
+                return Response({'error': f'Projekt {projekt.id} nima tipa {tip_id}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        serijska_id = request.query_params.get('serijska', None)
+        if serijska_id is not None and not serijska_id.isdigit():
+            return Response({'error': f'Neveljavna serijska številka: {serijska_id}'}, status=status.HTTP_400_BAD_REQUEST)
+        matrika = load_answer_matrix(
+            projekt,
+            tip_ids=[pt.tip_id for pt in projekt_tipi],
+            serijske_ids=[serijska_id] if serijska_id is not None else None,
+            serijske_po_tipu=True
+        )
+
+        segmenti_po_tipih = {}
+        for segment in matrika.segmenti:
+            segment_data = SegmentSerializer(segment).data
+            segment_data['vprasanja'] = VprasanjeSerializer(
+                matrika.vprasanja_po_segmentu.get(segment.id, []), many=True
+            ).data
+            segmenti_po_tipih.setdefault(segment.tip_id, []).append(segment_data)
+
+        return Response({
+            'projekt': self.get_serializer(projekt).data,
+            'tipi': [
+                {
+                    'id': pt.tip.id,
+                    'naziv': pt.tip.naziv,
+                    'stevilo_ponovitev': pt.stevilo_ponovitev,
+                    'segmenti': segmenti_po_tipih.get(pt.tip_id, [])
+                } for pt in projekt_tipi
+            ],
+            'serijske_stevilke': SerijskaStevilkaSerializer(matrika.serijske_stevilke, many=True).data,
+            'odgovori': OdgovorSerializer(matrika.odgovori(), many=True).data
+        })
+
     @action(detail=True, methods=['GET'], url_path='export-xlsx')
     def export_xlsx(self, request, pk=None):
-        """Izvozi odgovore projekta v XLSX format."""
+        """Izvozi odgovore projekta v XLSX format.
+
+        Sinhron izvoz zaseda spletni proces do konca izrisa, zato ostaja le kot
+        rezervna pot za skripte; uporabniški vmesnik izvaža prek /api/izvozi/.
+        """
         try:
-            # 1. Pridobi projekt in njegove podatke
             projekt = self.get_object()
-            projekt_tip = projekt.projekt_tipi.first()
-            if not projekt_tip:
-                return Response({'error': 'Projekt nima določenega tipa'}, status=400)
-
-            # 2. Pridobi serijske številke
-            serijske_stevilke = SerijskaStevilka.objects.filter(projekt=projekt)
-            if not serijske_stevilke.exists():
-                return Response({'error': 'Projekt nima serijskih številk'}, status=400)
-
-            # 3. Pridobi segmente
-            segmenti = Segment.objects.filter(tip_id=projekt_tip.tip.id)
-            if not segmenti.exists():
-                return Response({'error': 'Ni najdenih segmentov za ta tip projekta'}, status=400)
-
-            # 4. Ustvari Excel datoteko
-            excel_file = io.BytesIO()
-            writer = pd.ExcelWriter(excel_file, engine='openpyxl')
-
-            # 5. Pripravi podatke za glavo
-            header_data = [
-                ['Kontrolni seznam', '', '', '', ''],
-                ['', '', '', '', ''],
-                ['Projekt', f"{projekt.id} - {projekt_tip.tip.naziv}", '', '', ''],
-                ['Osebna številka', projekt.osebna_stevilka, '', 'Ime in priimek', ''],
-                ['Datum', projekt.datum.strftime('%Y-%m-%d'), '', 'Podpis', ''],
-                ['Število ponovitev', projekt_tip.stevilo_ponovitev, '', '', ''],
-                ['', '', '', '', '']
-            ]
-
-            # 6. Pripravi podatke za vsako serijsko številko
-            data = []
-            
-            # Za vsako serijsko številko
-            for st in serijske_stevilke:
-                # Dodaj serijsko številko kot naslov sekcije
-                data.append(['', '', '', '', ''])
-                data.append([f'Serijska številka: {st.stevilka}', '', '', '', ''])
-                data.append(['Segment', 'Vprašanje', 'Odgovor', 'Datum odgovora', ''])
-
-                # Za vsak segment
-                for segment in segmenti:
-                    current_segment = None
-                    
-                    # Za vsako vprašanje v segmentu
-                    for vprasanje in Vprasanje.objects.filter(segment=segment):
-                        odgovor = Odgovor.objects.filter(
-                            vprasanje=vprasanje,
-                            serijska_stevilka=st
-                        ).first()
-
-                        # Dodaj segment samo prvič ko se pojavi
-                        segment_naziv = segment.naziv if current_segment != segment.naziv else ''
-                        current_segment = segment.naziv
-
-                        data.append([
-                            segment_naziv,
-                            vprasanje.vprasanje,
-                            odgovor.odgovor if odgovor else '',
-                            odgovor.created_at.strftime('%Y-%m-%d %H:%M:%S') if odgovor else '',
-                            ''
-                        ])
-
-            # 7. Ustvari DataFrame in zapiši v Excel
-            header_df = pd.DataFrame(header_data)
-            data_df = pd.DataFrame(data)
-
-            # Zapiši podatke v Excel
-            header_df.to_excel(writer, sheet_name='Kontrolni seznam', index=False, header=False)
-            data_df.to_excel(writer, sheet_name='Kontrolni seznam', startrow=len(header_data), index=False, header=False)
-
-            # 8. Oblikovanje
-            worksheet = writer.sheets['Kontrolni seznam']
-            
-            # Nastavi širino stolpcev
-            worksheet.column_dimensions['A'].width = 25  # Segment
-            worksheet.column_dimensions['B'].width = 40  # Vprašanje
-            worksheet.column_dimensions['C'].width = 15  # Odgovor
-            worksheet.column_dimensions['D'].width = 20  # Datum odgovora
-            worksheet.column_dimensions['E'].width = 15  # Dodatni stolpec
-            
-            # Oblikuj naslov
-            cell = worksheet['A1']
-            cell.font = openpyxl.styles.Font(size=14, bold=True)
-            
-            # Oblikuj glavo
-            for row in range(3, 7):
-                for col in ['A', 'B', 'D']:
-                    cell = worksheet[f'{col}{row}']
-                    cell.font = openpyxl.styles.Font(bold=True)
-            
-            # Oblikuj sekcije serijskih številk
-            row_num = len(header_data) + 1
-            while row_num < worksheet.max_row:
-                if worksheet[f'A{row_num}'].value and 'Serijska številka' in str(worksheet[f'A{row_num}'].value):
-                    for col in ['A', 'B', 'C', 'D']:
-                        cell = worksheet[f'{col}{row_num}']
-                        cell.font = openpyxl.styles.Font(bold=True)
-                        cell.fill = openpyxl.styles.PatternFill(start_color='E0E0E0', end_color='E0E0E0', fill_type='solid')
-                row_num += 1
-
-            # Shrani Excel
-            writer.close()
-            excel_file.seek(0)
-
-            # 9. Pripravi response
-            response = HttpResponse(
-                excel_file.read(),
+            # Nespremenjen projekt se vrne neposredno iz predpomnilnika na disku
+            return FileResponse(
+                open_export('xlsx', projekt, get_exporter('xlsx')),
+                as_attachment=True,
+                filename=xlsx_filename(projekt),
                 content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
             )
 
-            # Ustvari ime datoteke
-            filename = f"projekt_{projekt.id}_odgovori.xlsx"
-            filename = "".join(c for c in filename if c.isalnum() or c in (' ', '-', '_', '.'))
-
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
-
-            return response
-
+        except ExportError as e:
+            return Response({'error': str(e)}, status=400)
         except Exception as e:
             print(f"Napaka pri izvozu: {str(e)}")
             import traceback
@@ -592,88 +412,19 @@ class ProjektViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['POST'], url_path='import-json')
     def import_json(self, request):
-        """Uvozi projekte iz JSON datoteke."""
+        """Uvozi projekt iz arhiva v2 (gzip NDJSON) ali v1 (JSON)."""
         try:
             if 'file' not in request.FILES:
                 return Response({'error': 'Ni datoteke'}, status=status.HTTP_400_BAD_REQUEST)
 
-            file = request.FILES['file']
-            data = json.load(file)
-
-            print("Prejeti JSON podatki:")
-            print(json.dumps(data, indent=2))
-
-            with transaction.atomic():
-                # Najprej preverimo, če projekt že obstaja
-                if Projekt.objects.filter(id=data['projekt']['id']).exists():
-                    return Response(
-                        {'error': f'Projekt {data["projekt"]["id"]} že obstaja'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-
-                # Ustvarimo projekt z originalnimi časovnimi žigi
-                projekt = Projekt.objects.create(
-                    id=data['projekt']['id'],
-                    osebna_stevilka=data['projekt']['osebna_stevilka'],
-                    datum=data['projekt']['datum'].split('T')[0],  # Vzamemo samo datum
-                    created_at=data['projekt']['created_at'],
-                    updated_at=data['projekt']['updated_at']
-                )
-                print(f"Ustvarjen projekt: {projekt.id}")
-
-                # Slovar za sledenje serijskim številkam
-                serijske_stevilke_map = {}
-
-                # Dodamo tipe in serijske številke
-                for tip_data in data['tipi']:
-                    print(f"Dodajam tip: {tip_data}")
-                    projekt_tip = ProjektTip.objects.create(
-                        projekt=projekt,
-                        tip_id=tip_data['id'],
-                        stevilo_ponovitev=tip_data['stevilo_ponovitev'],
-                        created_at=tip_data['created_at']
-                    )
-
-                    # Dodamo serijske številke za ta tip
-                    for st_data in [s for s in data['serijske_stevilke'] if s['tip_id'] == tip_data['id']]:
-                        print(f"Dodajam serijsko številko: {st_data}")
-                        serijska = SerijskaStevilka.objects.create(
-                            projekt=projekt,
-                            projekt_tip=projekt_tip,
-                            stevilka=st_data['stevilka'],
-                            created_at=st_data['created_at']
-                        )
-                        # Shranimo preslikavo ID-jev
-                        serijske_stevilke_map[st_data['id']] = serijska
-
-                # Dodamo odgovore
-                for odgovor_data in data['odgovori']:
-                    print(f"Dodajam odgovor: {odgovor_data}")
-                    try:
-                        # Poiščemo serijsko številko iz preslikave
-                        serijska = serijske_stevilke_map[odgovor_data['serijska_stevilka_id']]
-                        
-                        Odgovor.objects.create(
-                            vprasanje_id=odgovor_data['vprasanje_id'],
-                            odgovor=odgovor_data['odgovor'],
-                            serijska_stevilka=serijska,
-                            created_at=odgovor_data['created_at'],
-                            updated_at=odgovor_data['updated_at']
-                        )
-                    except Exception as e:
-                        print(f"Napaka pri ustvarjanju odgovora: {str(e)}")
-                        raise
-
-                # Dodamo zapis v LogSprememb o uvozu
-                LogSprememb.objects.create(
-                    uporabnik=request.user,
-                    sprememba=f"projekt_{projekt.id}_uvoz",
-                    stara_vrednost="",
-                    nova_vrednost=f"Uvoženo iz arhiva {timezone.now().isoformat()}"
-                )
-
-            return Response({'message': 'Projekt uspešno uvožen'}, status=status.HTTP_201_CREATED)
+            projekt, uvozeno, casi = get_importer('arhiv')(request.FILES['file'], request.user)
+            return Response(
+                {'message': 'Projekt uspešno uvožen', 'projekt': projekt.id, 'uvozeno': uvozeno, 'casi': casi},
+                status=status.HTTP_201_CREATED
+            )
 
+        except ArchiveError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             print(f"Napaka pri uvozu: {str(e)}")
             import traceback
@@ -682,182 +433,47 @@ class ProjektViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['GET'], url_path='export-pdf')
     def export_pdf(self, request, pk=None):
-        """Izvozi odgovore projekta v PDF format."""
+        """Izvozi odgovore projekta v PDF format.
+
+        ``?nacin=hitro|natancno`` izbere izris tabel, privzeto nastavitev PDF_NACIN.
+        Kot pri XLSX je sinhron izvoz le rezervna pot; vmesnik uporablja /api/izvozi/.
+        """
         try:
-            # 1. Pridobi projekt in njegove podatke
             projekt = self.get_object()
-            projekt_tip = projekt.projekt_tipi.first()
-            if not projekt_tip:
-                return Response({'error': 'Projekt nima določenega tipa'}, status=400)
-
-            # 2. Pridobi serijske številke
-            serijske_stevilke = SerijskaStevilka.objects.filter(projekt=projekt)
-            if not serijske_stevilke.exists():
-                return Response({'error': 'Projekt nima serijskih številk'}, status=400)
-
-            # 3. Pridobi segmente
-            segmenti = Segment.objects.filter(tip_id=projekt_tip.tip.id)
-            if not segmenti.exists():
-                return Response({'error': 'Ni najdenih segmentov za ta tip projekta'}, status=400)
-
-            # 4. Pripravi PDF
-            response = HttpResponse(content_type='application/pdf')
-            filename = f"projekt_{projekt.id}_odgovori.pdf"
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
-
-            # Ustvari PDF dokument
-            doc = SimpleDocTemplate(
-                response,
-                pagesize=A4,
-                rightMargin=30,
-                leftMargin=30,
-                topMargin=30,
-                bottomMargin=30
+            nacin = request.query_params.get('nacin', settings.PDF_NACIN)
+            if nacin not in PDF_NACINI:
+                return Response(
+                    {'error': f'Neznan način izrisa: {nacin}. Dovoljeni: {", ".join(PDF_NACINI)}'},
+                    status=400
+                )
+            render_pdf = get_exporter('pdf')
+            return FileResponse(
+                open_export(
+                    'pdf',
+                    projekt,
+                    lambda projekt, out: render_pdf(projekt, out, nacin=nacin),
+                    varianta=nacin
+                ),
+                as_attachment=True,
+                filename=pdf_filename(projekt),
+                content_type='application/pdf'
             )
 
-            # Pripravi stile
-            styles = getSampleStyleSheet()
-            styles.add(ParagraphStyle(
-                name='NaslovSlovenski',
-                fontName='DejaVu',
-                fontSize=16,
-                spaceAfter=20,
-                alignment=1,  # Center
-                leading=20
-            ))
-            styles.add(ParagraphStyle(
-                name='PodnaslovSlovenski',
-                fontName='DejaVu',
-                fontSize=12,
-                spaceAfter=10,
-                alignment=1,  # Center
-                leading=16
-            ))
-            styles.add(ParagraphStyle(
-                name='NormalSlovenski',
-                fontName='DejaVu',
-                fontSize=10,
-                spaceAfter=5,
-                leading=14
-            ))
-            styles.add(ParagraphStyle(
-                name='TabelaGlava',
-                fontName='DejaVu',
-                fontSize=9,
-                textColor=colors.white,
-                alignment=1,  # Center
-                leading=12
-            ))
-            styles.add(ParagraphStyle(
-                name='TabelaVsebina',
-                fontName='DejaVu',
-                fontSize=9,
-                alignment=0,  # Left
-                leading=12
-            ))
-
-            # Seznam elementov za PDF
-            elements = []
-
-            # Dodaj naslov in podatke o projektu
-            elements.append(Paragraph('Kontrolni seznam', styles['NaslovSlovenski']))
-            elements.append(Paragraph(f'Projekt: {projekt.id} - {projekt_tip.tip.naziv}', styles['PodnaslovSlovenski']))
-            
-            # Podatki o projektu v tabeli
-            podatki_projekta = [
-                ['Osebna številka:', projekt.osebna_stevilka, 'Datum:', projekt.datum.strftime("%d.%m.%Y")],
-                ['Število ponovitev:', str(projekt_tip.stevilo_ponovitev), 'Ime in priimek:', '_' * 20],
-                ['', '', 'Podpis:', '_' * 20]
-            ]
-            
-            t_podatki = Table(podatki_projekta, colWidths=[100, 150, 100, 150])
-            t_podatki.setStyle(TableStyle([
-                ('FONT', (0, 0), (-1, -1), 'DejaVu'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('TOPPADDING', (0, 0), (-1, -1), 5),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-            ]))
-            elements.append(t_podatki)
-            elements.append(Spacer(1, 20))
-
-            # Za vsako serijsko številko
-            for st in serijske_stevilke:
-                elements.append(Paragraph(f'Serijska številka: {st.stevilka}', styles['PodnaslovSlovenski']))
-                
-                # Za vsak segment
-                for segment in segmenti:
-                    vprasanja = Vprasanje.objects.filter(segment=segment)
-                    if not vprasanja.exists():
-                        continue
-
-                    # Podatki za tabelo
-                    table_data = [[
-                        Paragraph('Segment', styles['TabelaGlava']),
-                        Paragraph('Vprašanje', styles['TabelaGlava']),
-                        Paragraph('Odgovor', styles['TabelaGlava']),
-                        Paragraph('Datum odgovora', styles['TabelaGlava'])
-                    ]]
-                    
-                    current_segment = None
-                    for vprasanje in vprasanja:
-                        odgovor = Odgovor.objects.filter(
-                            vprasanje=vprasanje,
-                            serijska_stevilka=st
-                        ).first()
-
-                        # Dodaj segment samo prvič ko se pojavi
-                        segment_naziv = segment.naziv if current_segment != segment.naziv else ''
-                        current_segment = segment.naziv
-
-                        table_data.append([
-                            Paragraph(segment_naziv, styles['TabelaVsebina']),
-                            Paragraph(vprasanje.vprasanje, styles['TabelaVsebina']),
-                            Paragraph(odgovor.odgovor if odgovor else '', styles['TabelaVsebina']),
-                            Paragraph(odgovor.created_at.strftime('%d.%m.%Y %H:%M') if odgovor else '', styles['TabelaVsebina'])
-                        ])
-
-                    # Ustvari tabelo
-                    if len(table_data) > 1:  # Če imamo podatke poleg glave
-                        t = Table(table_data, colWidths=[100, 220, 80, 100])
-                        t.setStyle(TableStyle([
-                            ('FONT', (0, 0), (-1, -1), 'DejaVu'),
-                            ('FONTSIZE', (0, 0), (-1, -1), 9),
-                            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-                            ('BOX', (0, 0), (-1, -1), 1, colors.black),
-                            ('TOPPADDING', (0, 0), (-1, -1), 5),
-                            ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-                            ('LEFTPADDING', (0, 0), (-1, -1), 5),
-                            ('RIGHTPADDING', (0, 0), (-1, -1), 5),
-                        ]))
-                        elements.append(t)
-                        elements.append(Spacer(1, 15))
-
-                elements.append(Spacer(1, 20))
-
-            # Generiraj PDF
-            doc.build(elements)
-            return response
-
+        except ExportError as e:
+            return Response({'error': str(e)}, status=400)
         except Exception as e:
             print(f"Napaka pri izvozu PDF: {str(e)}")
             import traceback
             print(traceback.format_exc())
             return Response({'error': str(e)}, status=500)
 
-class SegmentViewSet(viewsets.ModelViewSet):
+class SegmentViewSet(ConditionalListMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Segment.objects.all()
     serializer_class = SegmentSerializer
     permission_classes = [permissions.IsAuthenticated]
 
-    def get_queryset(self):
-        queryset = Segment.objects.all()
+    def _tip_id(self):
+        """Vrni tip, na katerega se omeji seznam, ali None za vse segmente."""
         tip_id = self.request.query_params.get('tip_id', None)
         projekt_id = self.request.query_params.get('projekt_id', None)
         
@@ -867,24 +483,40 @@ class SegmentViewSet(viewsets.ModelViewSet):
                 projekt_id=projekt_id
             ).first()
             
-            if projekt_tip:
-                # Filtriramo segmente samo za ta tip
-                queryset = queryset.filter(tip_id=projekt_tip.tip_id)
-        elif tip_id is not None:
-            # Če nimamo projekt_id, filtriramo samo po tip_id
+            # Filtriramo segmente samo za ta tip
+            return projekt_tip.tip_id if projekt_tip else None
+        # Če nimamo projekt_id, filtriramo samo po tip_id
+        return tip_id
+
+    def get_queryset(self):
+        queryset = Segment.objects.all()
+        tip_id = self._tip_id()
+        if tip_id is not None:
             queryset = queryset.filter(tip_id=tip_id)
-        
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        tip_id = self._tip_id()
+        if tip_id is None or not str(tip_id).isdigit() or not is_unpaginated(request):
+            return super().list(request, *args, **kwargs)
+
+        # Celoten seznam segmentov tipa beremo iz predpomnilnika predlog, iz njega tudi podpis za ETag
+        segmenti = get_template(tip_id).segmenti
+        zadnja_sprememba = max((segment.updated_at for segment in segmenti), default=None)
+        return self.conditional_response(
+            request, lambda: Response(self.get_serializer(segmenti, many=True).data),
+            {'st': len(segmenti), 'zadnja': zadnja_sprememba}, zadnja_sprememba
+        )
+
     @action(detail=True, methods=['get'])
     def vprasanja(self, request, pk=None):
         """Vrni vprašanja za segment."""
         segment = self.get_object()
-        vprasanja = Vprasanje.objects.filter(segment=segment)
+        vprasanja = get_template(segment.tip_id).vprasanja_po_segmentu.get(segment.id, [])
         serializer = VprasanjeSerializer(vprasanja, many=True)
         return Response(serializer.data)
 
-class VprasanjeViewSet(viewsets.ModelViewSet):
+class VprasanjeViewSet(OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Vprasanje.objects.all()
     serializer_class = VprasanjeSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -909,6 +541,14 @@ class VprasanjeViewSet(viewsets.ModelViewSet):
         
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        tip_id = request.query_params.get('tip_id', None)
+        if tip_id is not None and tip_id.isdigit() and is_unpaginated(request):
+            # projekt_id ob tip_id seznama ne omeji dodatno, zato zadošča predloga tipa
+            vprasanja = sorted(get_template(tip_id).vprasanja, key=lambda v: v.id)
+            return Response(self.get_serializer(vprasanja, many=True).data)
+        return super().list(request, *args, **kwargs)
+
     @action(detail=True, methods=['get'])
     def odgovori(self, request, pk=None):
         vprasanje = self.get_object()
@@ -930,7 +570,7 @@ class VprasanjeViewSet(viewsets.ModelViewSet):
         serializer = OdgovorSerializer(odgovori, many=True)
         return Response(serializer.data)
 
-class SerijskaStevilkaViewSet(viewsets.ModelViewSet):
+class SerijskaStevilkaViewSet(OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = SerijskaStevilka.objects.all()
     serializer_class = SerijskaStevilkaSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -960,44 +600,93 @@ class SerijskaStevilkaViewSet(viewsets.ModelViewSet):
         serializer = OdgovorSerializer(odgovori, many=True)
         return Response(serializer.data)
 
-class OdgovorViewSet(viewsets.ModelViewSet):
+class OdgovorViewSet(ConditionalListMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Odgovor.objects.all()
     serializer_class = OdgovorSerializer
     permission_classes = [permissions.IsAuthenticated]
+    # perform_destroy potrebuje projekt serijske številke za razveljavitev izvozov
+    optimizacija = {'destroy': {'select_related': ('serijska_stevilka',)}}
+
+    def _vprasanja_serijske(self, serijska_stevilka_id):
+        """Vrni id-je vprašanj predloge tipa serijske številke (enkrat na zahtevo)."""
+        if not hasattr(self, '_vprasanja'):
+            tip_id = SerijskaStevilka.objects.filter(pk=serijska_stevilka_id).values_list(
+                'projekt_tip__tip_id', flat=True
+            ).first()
+            self._vprasanja = [v.id for v in get_template(tip_id).vprasanja] if tip_id is not None else []
+        return self._vprasanja
 
     def get_queryset(self):
         queryset = Odgovor.objects.all()
         serijska_stevilka_id = self.request.query_params.get('serijska_stevilka', None)
         
         if serijska_stevilka_id is not None:
-            # Pridobi serijsko številko
-            serijska_stevilka = SerijskaStevilka.objects.filter(id=serijska_stevilka_id).first()
-            if serijska_stevilka:
-                # Filtriraj odgovore po serijski številki in vprašanjih za ta tip projekta
-                queryset = queryset.filter(
-                    serijska_stevilka=serijska_stevilka,
-                    vprasanje__segment__tip=serijska_stevilka.projekt_tip.tip
-                )
+            # Filtriraj odgovore po serijski številki in vprašanjih za tip njenega projekta;
+            # vprašanja tipa so v predpomnilniku predlog, zato ni stika čez vprašanje in segment
+            queryset = queryset.filter(
+                serijska_stevilka_id=serijska_stevilka_id,
+                vprasanje_id__in=self._vprasanja_serijske(serijska_stevilka_id)
+            )
         
         return queryset
 
     @action(detail=False, methods=['POST'], url_path='batch')
     def batch_create(self, request):
+        """Shrani paket odgovorov; obstoječi odgovor za isti par vprašanje/serijska se posodobi.
+
+        Odgovor je 201 s števci ``vstavljeni``, ``posodobljeni`` in ``nespremenjeni``
+        (pred paketnim shranjevanjem je bil to seznam shranjenih odgovorov).
+        """
         try:
-            odgovori = request.data
-            serializer = self.get_serializer(data=odgovori, many=True)
-            serializer.is_valid(raise_exception=True)
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            odgovori = validate_answers(request.data)
+            rezultat = upsert_answers(odgovori)
+            return Response(rezultat, status=status.HTTP_201_CREATED)
+        except ValidationError as e:
+            return Response(e.detail, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-class NastavitevViewSet(viewsets.ModelViewSet):
+    def create(self, request, *args, **kwargs):
+        """Shrani en odgovor; obstoječi odgovor za isti par vprašanje/serijska se posodobi.
+
+        Vrne shranjen odgovor, s 201 za nov odgovor in 200 za posodobljenega.
+        """
+        try:
+            odgovori = validate_answers([request.data])
+            rezultat = upsert_answers(odgovori)
+        except ValidationError as e:
+            return Response(e.detail, status=status.HTTP_400_BAD_REQUEST)
+        (vprasanje_id, serijska_stevilka_id), = odgovori
+        odgovor = Odgovor.objects.get(vprasanje_id=vprasanje_id, serijska_stevilka_id=serijska_stevilka_id)
+        return Response(
+            self.get_serializer(odgovor).data,
+            status=status.HTTP_201_CREATED if rezultat['vstavljeni'] else status.HTTP_200_OK
+        )
+
+    def perform_update(self, serializer):
+        staro = serializer.instance
+        prej = (staro.vprasanje_id, staro.serijska_stevilka_id, staro.odgovor)
+        with transaction.atomic():
+            odgovor = serializer.save()
+            if prej[:2] == (odgovor.vprasanje_id, odgovor.serijska_stevilka_id):
+                spremembe = [(*prej, odgovor.odgovor)]
+            else:
+                spremembe = [(*prej, None), (odgovor.vprasanje_id, odgovor.serijska_stevilka_id, None, odgovor.odgovor)]
+            apply_answer_changes(spremembe)
+
+    def perform_destroy(self, instance):
+        projekt_id = instance.serijska_stevilka.projekt_id
+        with transaction.atomic():
+            super().perform_destroy(instance)
+            apply_answer_changes([(instance.vprasanje_id, instance.serijska_stevilka_id, instance.odgovor, None)])
+        transaction.on_commit(lambda: invalidate_project(projekt_id))
+
+class NastavitevViewSet(OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Nastavitev.objects.all()
     serializer_class = NastavitevSerializer
     permission_classes = [permissions.IsAuthenticated]
 
-class ProfilViewSet(viewsets.ModelViewSet):
+class ProfilViewSet(OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Profil.objects.all()
     serializer_class = ProfilSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -1016,10 +705,86 @@ class ProfilViewSet(viewsets.ModelViewSet):
             )
         return Profil.objects.all()
 
-class LogSpremembViewSet(viewsets.ModelViewSet):
+class LogSpremembViewSet(OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = LogSprememb.objects.all()
     serializer_class = LogSpremembSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_ordering = '-id'
+
+    def get_queryset(self):
+        """Filtriraj po entiteti ali projektu in časovnem obdobju.
+
+        Vsi filtri se preslikajo v obsežne poizvedbe po sestavljenih indeksih
+        (entity_type, entity_id, cas) oz. (projekt, entity_type, cas).
+        """
+        queryset = LogSprememb.objects.all()
+        params = self.request.query_params
+
+        entity_type = params.get('entity_type', None)
+        entity_id = params.get('entity_id', None)
+        projekt_id = params.get('projekt', None)
+
+        if entity_id is not None and entity_type is None:
+            # Id-ji različnih entitet se prekrivajo, indeks pa se začne z entity_type
+            raise ValidationError({'error': 'Filter entity_id zahteva tudi entity_type'})
+        if entity_type is not None:
+            queryset = queryset.filter(entity_type=entity_type)
+            if entity_id is not None:
+                queryset = queryset.filter(entity_id=entity_id)
+        if projekt_id is not None:
+            queryset = queryset.filter(projekt_id=projekt_id)
+
+        cas_polje = serializers.DateTimeField()
+        if params.get('od'):
+            queryset = queryset.filter(cas__gte=cas_polje.to_internal_value(params['od']))
+        if params.get('do'):
+            queryset = queryset.filter(cas__lt=cas_polje.to_internal_value(params['do']))
+
+        return queryset.order_by('-id')
+
+    def perform_create(self, serializer):
+        podatki = serializer.validated_data
+        if podatki.get('projekt') is not None:
+            serializer.save()
+            return
+        if podatki.get('entity_type'):
+            entity_type, entity_id = podatki['entity_type'], podatki.get('entity_id', '')
+        else:
+            entity_type, entity_id = razcleni_spremembo(podatki['sprememba'])
+        serializer.save(projekt=projekt_entitete(entity_type, entity_id))
+
+class IzvozniPoselViewSet(OptimizedQuerysetMixin, mixins.CreateModelMixin, mixins.RetrieveModelMixin,
+                          mixins.ListModelMixin, viewsets.GenericViewSet):
+    """Izvozi v ozadju: oddaja posla, spremljanje stanja in prenos datoteke."""
+    queryset = IzvozniPosel.objects.all()
+    serializer_class = IzvozniPoselSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_ordering = '-id'
+
+    def get_queryset(self):
+        queryset = IzvozniPosel.objects.all()
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(uporabnik=self.request.user)
+        return queryset.order_by('-id')
+
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return response
+
+    def perform_create(self, serializer):
+        posel = serializer.save(uporabnik=self.request.user)
+        submit_export(posel)
+
+    @action(detail=True, methods=['GET'])
+    def download(self, request, pk=None):
+        posel = self.get_object()
+        if posel.status != 'koncan' or not posel.datoteka:
+            return Response(
+                {'error': f'Izvoz ni pripravljen (stanje: {posel.status})'},
+                status=status.HTTP_409_CONFLICT
+            )
+        return FileResponse(posel.datoteka.open('rb'), as_attachment=True, filename=posel.ime_datoteke)
 
 class LoginView(APIView):
     permission_classes = [permissions.AllowAny]
@@ -1104,10 +869,11 @@ class UserView(APIView):
             'is_superuser': user.is_superuser
         })
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(OptimizedQuerysetMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAdminUser]
+    pagination_ordering = 'username'
 
     def get_queryset(self):
         return User.objects.all().order_by('username')
@@ -1117,6 +883,46 @@ class UserViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(request.user)
         return Response(serializer.data)
 
+class MetricsView(APIView):
+    """Percentili časov in poizvedb po poteh, ki jih beleži PerformanceMiddleware.
+
+    Meritve so v pomnilniku procesa, zato vsak delavec vrne svoje.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(povzetek_metrik())
+
+    def delete(self, request):
+        ponastavi_metrike()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class SearchView(APIView):
+    """Iskanje po projektih, serijskih številkah, vprašanjih in odgovorih.
+
+    ``?q=`` je besedilo (zadnja beseda se ujema kot predpona), ``?vrsta=`` omeji
+    vrste zadetkov (lahko večkrat), ``?projekt=`` pa projekt. Zadetki so
+    razvrščeni po relevantnosti (bm25) in paginirani po straneh.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        poizvedba = fts_query(request.query_params.get('q', ''))
+        if poizvedba is None:
+            return Response({'error': 'Iskalni niz je obvezen'}, status=status.HTTP_400_BAD_REQUEST)
+        vrste = request.query_params.getlist('vrsta')
+        neznane = [vrsta for vrsta in vrste if vrsta not in VRSTE]
+        if neznane:
+            return Response(
+                {'error': f'Neznana vrsta: {", ".join(neznane)}. Dovoljene: {", ".join(VRSTE)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        zadetki = SearchResults(poizvedba, vrste=vrste, projekt_id=request.query_params.get('projekt') or None)
+        paginator = SearchPagination()
+        stran = paginator.paginate_queryset(zadetki, request, view=self)
+        return paginator.get_paginated_response(stran)
+
 class ChangePasswordView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
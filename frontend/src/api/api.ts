@@ -55,6 +55,9 @@ axiosInstance.interceptors.response.use(
   }
 );
 
+// Seznami so na strežniku paginirani le na zahtevo (?page_size=, ?cursor=); ti klici izrecno zahtevajo celoten seznam
+const NEPAGINIRANO = { params: { paginate: 'false' } };
+
 // Inicializacija CSRF tokena
 export const initializeCsrf = async (): Promise<void> => {
   await axiosInstance.get('/csrf/');
@@ -111,7 +114,7 @@ export interface Profil {
 }
 
 export const getTipi = async (): Promise<Tip[]> => {
-  const response = await axiosInstance.get<Tip[]>('/tipi/');
+  const response = await axiosInstance.get<Tip[]>('/tipi/', NEPAGINIRANO);
   return response.data;
 };
 
@@ -136,15 +139,31 @@ export interface ProjektTip {
   stevilo_ponovitev: number;
 }
 
+export interface NapredekProjekta {
+  serijske_stevilke: number;
+  odgovorjeni: number;
+  odgovorjeni_obvezni: number;
+  vsa_obvezna: number;
+  zadnja_aktivnost: string | null;
+}
+
 export interface Projekt {
   id: string;
   osebna_stevilka: string;
   datum: string;
   projekt_tipi?: ProjektTip[];
+  napredek?: NapredekProjekta | null;
 }
 
+// Izpolnjenost obveznih vprašanj, npr. "12/20 (60 %)"
+export const formatNapredek = (napredek?: NapredekProjekta | null): string => {
+  if (!napredek || napredek.vsa_obvezna === 0) return '-';
+  const odstotek = Math.round((napredek.odgovorjeni_obvezni / napredek.vsa_obvezna) * 100);
+  return `${napredek.odgovorjeni_obvezni}/${napredek.vsa_obvezna} (${odstotek} %)`;
+};
+
 export const getProjekti = async (): Promise<any[]> => {
-  const response = await axiosInstance.get('/projekti/');
+  const response = await axiosInstance.get('/projekti/', NEPAGINIRANO);
   return response.data;
 };
 
@@ -209,7 +228,7 @@ export const getSerijskeStevilke = async (projektId: string, tipId?: number): Pr
   const url = tipId 
     ? `/serijske-stevilke/?projekt=${projektId}&tip_id=${tipId}`
     : `/serijske-stevilke/?projekt=${projektId}`;
-  const response = await axiosInstance.get<SerijskaStevilka[]>(url);
+  const response = await axiosInstance.get<SerijskaStevilka[]>(url, NEPAGINIRANO);
   return response.data;
 };
 
@@ -244,7 +263,7 @@ export interface Odgovor {
 
 // Segmenti in vprašanja
 export const getSegmenti = async (tipId: number, projektId: string): Promise<Segment[]> => {
-  const response = await axiosInstance.get(`/segmenti/?tip_id=${tipId}&projekt_id=${projektId}`);
+  const response = await axiosInstance.get(`/segmenti/?tip_id=${tipId}&projekt_id=${projektId}`, NEPAGINIRANO);
   return response.data;
 };
 
@@ -254,18 +273,40 @@ export const getSegment = async (id: number): Promise<Segment> => {
 };
 
 export const getVprasanja = async (tipId: number, projektId: string): Promise<Vprasanje[]> => {
-  // Najprej pridobimo segmente za ta tip in projekt
-  const segmenti = await getSegmenti(tipId, projektId);
-  
-  // Nato pridobimo vprašanja za vsak segment
-  const vprasanjaPromises = segmenti.map(segment => 
-    axiosInstance.get(`/segmenti/${segment.id}/vprasanja/?tip_id=${tipId}&projekt_id=${projektId}`)
-  );
-  
-  const vprasanjaResponses = await Promise.all(vprasanjaPromises);
-  const vprasanja = vprasanjaResponses.flatMap(response => response.data);
-  
-  return vprasanja;
+  // Vprašanja vseh segmentov pridobimo z enim klicem na posnetek projekta
+  const snapshot = await getSnapshot(projektId, tipId);
+  return snapshot.tipi.flatMap(tip => tip.segmenti.flatMap(segment => segment.vprasanja ?? []));
+};
+
+// Posnetek kontrolnega seznama: drevo tip -> segment -> vprašanje in odgovori
+export interface SnapshotOdgovor {
+  id: number;
+  vprasanje: number;
+  serijska_stevilka: number;
+  odgovor: string;
+  created_at: string;
+  updated_at: string;
+}
+
+export interface ChecklistSnapshot {
+  projekt: Projekt;
+  tipi: {
+    id: number;
+    naziv: string;
+    stevilo_ponovitev: number;
+    segmenti: Segment[];
+  }[];
+  serijske_stevilke: SerijskaStevilka[];
+  odgovori: SnapshotOdgovor[];
+}
+
+export const getSnapshot = async (projektId: string, tipId?: number, serijskaId?: number): Promise<ChecklistSnapshot> => {
+  const params = new URLSearchParams();
+  if (tipId !== undefined) params.append('tip_id', String(tipId));
+  if (serijskaId !== undefined) params.append('serijska', String(serijskaId));
+  const query = params.toString();
+  const response = await axiosInstance.get<ChecklistSnapshot>(`/projekti/${projektId}/snapshot/${query ? `?${query}` : ''}`);
+  return response.data;
 };
 
 // Odgovori
@@ -280,7 +321,7 @@ export const saveOdgovor = async (odgovor: Odgovor): Promise<any> => {
 };
 
 export const getOdgovori = async (serijskaStevilkaId: number): Promise<Odgovor[]> => {
-  const response = await axiosInstance.get<Odgovor[]>(`/odgovori/?serijska_stevilka=${serijskaStevilkaId}`);
+  const response = await axiosInstance.get<Odgovor[]>(`/odgovori/?serijska_stevilka=${serijskaStevilkaId}`, NEPAGINIRANO);
   return response.data;
 };
 
@@ -295,7 +336,7 @@ export const saveOdgovori = async (odgovori: Odgovor[]): Promise<any> => {
 
 // Nastavitve
 export const getNastavitve = async (): Promise<Nastavitve> => {
-  const response = await axiosInstance.get<Nastavitve>('/nastavitve/');
+  const response = await axiosInstance.get<Nastavitve>('/nastavitve/', NEPAGINIRANO);
   return response.data;
 };
 
@@ -306,7 +347,7 @@ export const updateNastavitve = async (data: Nastavitve): Promise<Nastavitve> =>
 
 // Profili
 export const getProfili = async (): Promise<Profil[]> => {
-  const response = await axiosInstance.get<Profil[]>('/profili/');
+  const response = await axiosInstance.get<Profil[]>('/profili/', NEPAGINIRANO);
   return response.data;
 };
 
@@ -390,7 +431,7 @@ export interface User {
 }
 
 export const getUsers = async (): Promise<User[]> => {
-  const response = await axiosInstance.get('/auth/users/');
+  const response = await axiosInstance.get('/auth/users/', NEPAGINIRANO);
   return response.data;
 };
 
@@ -403,23 +444,64 @@ export const deleteUser = async (userId: number): Promise<void> => {
   await axiosInstance.delete(`/auth/users/${userId}/`);
 };
 
-export const exportToXlsx = async (projektId: string): Promise<Blob> => {
-  const response = await axiosInstance.get(`/projekti/${projektId}/export-xlsx/`, {
-    responseType: 'blob'
-  });
+// Izvozi v ozadju
+export interface IzvozniPosel {
+  id: number;
+  projekt: string;
+  format: 'xlsx' | 'pdf' | 'archive';
+  status: 'cakajoc' | 'v_teku' | 'koncan' | 'napaka';
+  napredek: number;
+  ime_datoteke: string;
+  napaka: string;
+}
+
+export const submitExport = async (projektId: string, format: IzvozniPosel['format']): Promise<IzvozniPosel> => {
+  const response = await axiosInstance.post<IzvozniPosel>('/izvozi/', { projekt: projektId, format });
+  return response.data;
+};
+
+export const getExportJob = async (id: number): Promise<IzvozniPosel> => {
+  const response = await axiosInstance.get<IzvozniPosel>(`/izvozi/${id}/`);
   return response.data;
 };
 
-export const exportToPdf = async (projektId: string): Promise<Blob> => {
-  const response = await axiosInstance.get(`/projekti/${projektId}/export-pdf/`, {
+export const downloadExport = async (id: number): Promise<Blob> => {
+  const response = await axiosInstance.get(`/izvozi/${id}/download/`, {
     responseType: 'blob'
   });
   return response.data;
 };
 
+// Odda posel, spremlja njegovo stanje in vrne pripravljeno datoteko
+export const exportInBackground = async (
+  projektId: string,
+  format: IzvozniPosel['format'],
+  onProgress?: (napredek: number) => void
+): Promise<Blob> => {
+  let posel = await submitExport(projektId, format);
+  while (posel.status === 'cakajoc' || posel.status === 'v_teku') {
+    await new Promise(resolve => setTimeout(resolve, 1000));
+    posel = await getExportJob(posel.id);
+    onProgress?.(posel.napredek);
+  }
+  if (posel.status === 'napaka') {
+    throw new Error(posel.napaka || 'Izvoz ni uspel');
+  }
+  return downloadExport(posel.id);
+};
+
 // Uvoz in izvoz projektov
 export const exportProjectsToJson = async (projektId: string): Promise<Blob> => {
   const response = await axiosInstance.get(`/projekti/${projektId}/export-archive/`, {
+    params: { verzija: 2 },
+    responseType: 'blob'
+  });
+  return response.data;
+};
+
+export const exportProjectsToZip = async (projektIds: string[]): Promise<Blob> => {
+  const response = await axiosInstance.get('/projekti/export-archives/', {
+    params: { id: projektIds.join(',') },
     responseType: 'blob'
   });
   return response.data;
@@ -435,4 +517,41 @@ export const importProjectsFromJson = async (file: File): Promise<void> => {
   });
 };
 
+// Iskanje
+export type VrstaZadetka = 'odgovor' | 'vprasanje' | 'serijska_stevilka' | 'projekt';
+
+export interface IskalniZadetek {
+  vrsta: VrstaZadetka;
+  id: number | string;
+  projekt_id: string | null;
+  rang: number;
+  izsek: string;
+  serijska_stevilka_id?: number;
+  serijska_stevilka?: string;
+  vprasanje_id?: number;
+  vprasanje?: string;
+  tip_id?: number;
+  osebna_stevilka?: string;
+}
+
+export interface IskalniRezultati {
+  count: number;
+  next: string | null;
+  previous: string | null;
+  results: IskalniZadetek[];
+}
+
+export const search = async (
+  q: string,
+  options: { vrsta?: VrstaZadetka[]; projekt?: string; page?: number; pageSize?: number } = {}
+): Promise<IskalniRezultati> => {
+  const params = new URLSearchParams({ q });
+  options.vrsta?.forEach(vrsta => params.append('vrsta', vrsta));
+  if (options.projekt) params.append('projekt', options.projekt);
+  if (options.page) params.append('page', String(options.page));
+  if (options.pageSize) params.append('page_size', String(options.pageSize));
+  const response = await axiosInstance.get<IskalniRezultati>(`/search/?${params.toString()}`);
+  return response.data;
+};
+
 export default axiosInstance; 
\ No newline at end of file
@@ -13,8 +13,8 @@ const JsonFileUpload: React.FC<JsonFileUploadProps> = ({ onFileSelect }) => {
         const file = event.target.files?.[0];
         if (!file) return;
 
-        if (!file.name.endsWith('.json')) {
-            alert('Prosimo, izberite JSON datoteko.');
+        if (!file.name.endsWith('.json') && !file.name.endsWith('.gz')) {
+            alert('Prosimo, izberite arhiv projekta (.ndjson.gz ali .json).');
             return;
         }
 
@@ -31,7 +31,7 @@ const JsonFileUpload: React.FC<JsonFileUploadProps> = ({ onFileSelect }) => {
     return (
         <Box sx={{ textAlign: 'center', p: 2 }}>
             <input
-                accept=".json"
+                accept=".json,.gz"
                 style={{ display: 'none' }}
                 id="json-file-upload"
                 type="file"
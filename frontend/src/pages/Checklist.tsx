@@ -25,20 +25,15 @@ import {
   SpeedDialAction,
 } from '@mui/material';
 import {
-  getVprasanja,
-  getSegmenti,
+  getSnapshot,
   saveOdgovor,
-  getOdgovori,
   Vprasanje,
   Segment,
   Odgovor,
   createSerijskaStevilka,
-  getProjekt,
   Projekt,
   SerijskaStevilka,
-  getSerijskeStevilke,
-  exportToXlsx,
-  exportToPdf,
+  exportInBackground,
   createProjekt,
   saveOdgovori,
 } from '../api/api';
@@ -80,11 +75,10 @@ const Checklist: React.FC = () => {
         setLoading(true);
         setError(null);
 
-        // Najprej pridobimo projekt
-        let projektData;
+        // Projekt, segmente, vprašanja, serijske številke in odgovore pridobimo v eni zahtevi
+        let snapshot;
         try {
-          projektData = await getProjekt(projektId);
-          setProjekt(projektData);
+          snapshot = await getSnapshot(projektId, parseInt(tipId));
         } catch (error) {
           if (axios.isAxiosError(error) && error.response?.status === 404) {
             setError('Projekt ne obstaja. Ustvarite nov projekt.');
@@ -92,6 +86,8 @@ const Checklist: React.FC = () => {
           }
           throw error;
         }
+        const projektData = snapshot.projekt;
+        setProjekt(projektData);
         
         // Nastavimo število ponovitev iz projekta
         if (projektData.projekt_tipi && projektData.projekt_tipi.length > 0) {
@@ -101,17 +97,13 @@ const Checklist: React.FC = () => {
           }
         }
         
-        // Pridobi segmente in vprašanja
-        const [segmentiData, vprasanjaData] = await Promise.all([
-          getSegmenti(parseInt(tipId), projektId),
-          getVprasanja(parseInt(tipId), projektId)
-        ]);
-        
+        // Segmenti in vprašanja
+        const segmentiData = snapshot.tipi.flatMap(tip => tip.segmenti);
         setSegments(segmentiData);
-        setQuestions(vprasanjaData);
+        setQuestions(segmentiData.flatMap(segment => segment.vprasanja ?? []));
         
         // Pridobi ali ustvari serijske številke
-        const existingSerijskeStevilke = await getSerijskeStevilke(projektId, parseInt(tipId));
+        const existingSerijskeStevilke = snapshot.serijske_stevilke;
         if (existingSerijskeStevilke.length === 0) {
           // Ustvari nove serijske številke
           const newSerijskeStevilke = await Promise.all(
@@ -124,19 +116,12 @@ const Checklist: React.FC = () => {
         } else {
           setSerijskeStevilke(existingSerijskeStevilke);
           
-          // Naloži obstoječe odgovore za vse serijske številke
+          // Obstoječi odgovori za vse serijske številke so že v posnetku
+          const stevilkePoId = new Map(existingSerijskeStevilke.map(stevilka => [stevilka.id, stevilka.stevilka]));
           const allAnswers: { [key: string]: string } = {};
-          const odgovoriPromises = existingSerijskeStevilke.map(stevilka => 
-            getOdgovori(stevilka.id)
-          );
-          
-          const odgovoriResults = await Promise.all(odgovoriPromises);
-          odgovoriResults.forEach((odgovori, index) => {
-            const stevilka = existingSerijskeStevilke[index];
-            odgovori.forEach(odgovor => {
-              const odgovorKey = `${odgovor.vprasanje_id}-${stevilka.stevilka}`;
-              allAnswers[odgovorKey] = odgovor.odgovor;
-            });
+          snapshot.odgovori.forEach(odgovor => {
+            const odgovorKey = `${odgovor.vprasanje}-${stevilkePoId.get(odgovor.serijska_stevilka)}`;
+            allAnswers[odgovorKey] = odgovor.odgovor;
           });
           
           setAnswers(allAnswers);
@@ -269,7 +254,7 @@ const Checklist: React.FC = () => {
 
   const handleExportXlsx = async () => {
     try {
-      const blob = await exportToXlsx(projektId);
+      const blob = await exportInBackground(projektId, 'xlsx');
       const url = window.URL.createObjectURL(blob);
       const link = document.createElement('a');
       link.href = url;
@@ -287,7 +272,7 @@ const Checklist: React.FC = () => {
 
   const handleExportPdf = async () => {
     try {
-      const blob = await exportToPdf(projektId);
+      const blob = await exportInBackground(projektId, 'pdf');
       const url = window.URL.createObjectURL(blob);
       const link = document.createElement('a');
       link.href = url;
@@ -67,8 +67,10 @@ import {
   getProjekti,
   deleteProjekt,
   exportProjectsToJson,
+  exportProjectsToZip,
   importProjectsFromJson,
   createProjekt,
+  formatNapredek,
 } from '../api/api';
 import FileUpload from '../components/FileUpload';
 import JsonFileUpload from '../components/JsonFileUpload';
@@ -867,18 +869,20 @@ const Settings: React.FC = () => {
         return;
       }
 
-      // Izvozi vsak izbran projekt posebej
-      for (const projectId of selectedProjects) {
-        const blob = await exportProjectsToJson(projectId);
-        const url = window.URL.createObjectURL(blob);
-        const a = document.createElement('a');
-        a.href = url;
-        a.download = `projekt_${projectId}_arhiv.json`;
-        document.body.appendChild(a);
-        a.click();
-        window.URL.revokeObjectURL(url);
-        document.body.removeChild(a);
-      }
+      // En projekt kot arhiv, več projektov v enem zip-u
+      const blob = selectedProjects.length === 1
+        ? await exportProjectsToJson(selectedProjects[0])
+        : await exportProjectsToZip(selectedProjects);
+      const url = window.URL.createObjectURL(blob);
+      const a = document.createElement('a');
+      a.href = url;
+      a.download = selectedProjects.length === 1
+        ? `projekt_${selectedProjects[0]}_arhiv.ndjson.gz`
+        : 'projekti_arhiv.zip';
+      document.body.appendChild(a);
+      a.click();
+      window.URL.revokeObjectURL(url);
+      document.body.removeChild(a);
       
       toast.success('Projekti uspešno izvoženi');
     } catch (error) {
@@ -991,6 +995,7 @@ const Settings: React.FC = () => {
               <TableCell>ID</TableCell>
               <TableCell>Osebna številka</TableCell>
               <TableCell>Datum</TableCell>
+              <TableCell>Izpolnjenost</TableCell>
               <TableCell>Akcije</TableCell>
             </TableRow>
           </TableHead>
@@ -1012,6 +1017,7 @@ const Settings: React.FC = () => {
                 <TableCell>{projekt.id}</TableCell>
                 <TableCell>{projekt.osebna_stevilka}</TableCell>
                 <TableCell>{projekt.datum}</TableCell>
+                <TableCell>{formatNapredek(projekt.napredek)}</TableCell>
                 <TableCell>
                   <IconButton
                     color="error"